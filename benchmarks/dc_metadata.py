@@ -0,0 +1,81 @@
+"""Mede a vazão da produção do elemento ``metadata`` dos formatos Dublin Core,
+em registros por segundo, com a função compilada por
+``oaipmh.formatters.dublincore.compile_metadata_maker`` e com os produtores
+de elementos de cada campo, como anteriormente registrados em cada formato.
+
+Os recursos são produzidos à partir do acervo sintético de
+``benchmarks.stubserver``.
+
+Uso::
+
+    python -m benchmarks.dc_metadata --records 5000 --repeat 5
+"""
+import argparse
+import time
+
+from lxml import etree
+from xylose.scielodocument import Article
+
+from oaipmh import articlemeta, repository
+from oaipmh.formatters import oai_dc, oai_dc_openaire
+
+from benchmarks import stubserver
+
+
+FIELDS_MAKERS = [oai_dc.make_title, oai_dc.make_creator,
+        oai_dc.make_contributor, oai_dc.make_description, oai_dc.make_subject,
+        oai_dc.make_publisher, oai_dc.make_date, oai_dc.make_type,
+        oai_dc.make_source, oai_dc.make_format, oai_dc.make_identifier,
+        oai_dc.make_rights, oai_dc.make_language]
+
+
+def make_metadata_by_element(resource):
+    metadata = etree.Element('metadata')
+    oai_rec = etree.SubElement(metadata, '{%s}dc' % oai_dc.OAIDC,
+        nsmap={'oai_dc': oai_dc.OAIDC, 'dc': oai_dc.DC, 'xsi': oai_dc.XSI},
+        attrib=oai_dc.ATTRIB
+    )
+    for maker in FIELDS_MAKERS:
+        for element in maker(resource):
+            oai_rec.append(element)
+    return metadata
+
+
+def get_resources(records):
+    corpus = stubserver.Corpus(documents=records)
+    return [repository.asdict(
+                articlemeta.ArticleResourceFacade(Article(doc)).to_resource())
+            for doc in corpus.documents]
+
+
+def measure(make_metadata, resources, repeat):
+    """Maior vazão, em registros por segundo, entre ``repeat`` execuções.
+    """
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for resource in resources:
+            etree.tostring(make_metadata(resource))
+        best = max(best, len(resources) / (time.perf_counter() - start))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    resources = get_resources(args.records)
+
+    print('%-22s %14s' % ('maker', 'records/s'))
+    for label, make_metadata in [
+            ('by element', make_metadata_by_element),
+            ('oai_dc', oai_dc.make_metadata),
+            ('oai_dc_openaire', oai_dc_openaire.make_metadata)]:
+        print('%-22s %14.0f' % (label,
+            measure(make_metadata, resources, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Mede a quantidade de viagens ao backend e a latência de uma página de
+``ArticleMeta.list`` em função do tamanho da página e do modo de obtenção
+dos documentos.
+
+Utiliza o servidor Thrift local de ``benchmarks.stubserver``.
+
+Uso::
+
+    python -m benchmarks.documents_fetch --latency 2 --sizes 20 50 100
+"""
+import argparse
+import time
+
+from oaipmh import articlemeta
+
+from benchmarks import stubserver
+
+
+def get_modes():
+    return [
+        ('one by one', {'bulk': False}),
+        ('one by one, pooled', {'bulk': False, 'pool_size': 1}),
+        ('concurrent', {'bulk': False, 'fetch_workers': 8}),
+        ('concurrent, pooled', {'bulk': False, 'fetch_workers': 8,
+                                'pool_size': 8}),
+        ('bulk', {'bulk': True}),
+    ]
+
+
+def measure(handler, domain, client_kwargs, size, repeat):
+    client = articlemeta.get_articlemeta_client('scl', domain=domain,
+            **client_kwargs)
+    ds = articlemeta.ArticleMeta(client)
+
+    timings = []
+    handler.reset()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        resources = list(ds.list(0, size))
+        timings.append(time.perf_counter() - start)
+        assert len(resources) == size
+
+    calls = sum(handler.calls.values()) / repeat
+    return calls, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=2.0,
+            help='latência por chamada, em milissegundos')
+    parser.add_argument('--sizes', type=int, nargs='+',
+            default=[20, 50, 100])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = stubserver.Corpus(documents=max(args.sizes))
+    handler = stubserver.ArticleMetaHandler(corpus,
+            latency=args.latency / 1000)
+    domain = stubserver.start(handler)
+
+    print('%-20s %6s %12s %12s' % ('mode', 'size', 'round trips',
+            'ms/page'))
+    for label, client_kwargs in get_modes():
+        for size in args.sizes:
+            calls, elapsed = measure(handler, domain, client_kwargs, size,
+                    args.repeat)
+            print('%-20s %6d %12.0f %12.1f' % (label, size, calls,
+                    elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Mede a latência da serialização das respostas Identify e de erro, por
+meio dos pipelines de filtros e dos templates pré-serializados.
+
+Uso::
+
+    python -m benchmarks.envelopes -n 20000
+"""
+import argparse
+import timeit
+
+import plumber
+
+import oaipmh
+from oaipmh import serializers
+from oaipmh.repository import asdict
+
+
+def get_data():
+    settings = oaipmh.parse_settings({})
+    return {
+            'repository': asdict(oaipmh.get_repository_meta(settings)),
+            'request': {'verb': 'ListRecords', 'metadataPrefix': 'oai_dc',
+                        'set': '0001-3765'},
+            }
+
+
+def serialize_with_pipeline(body, data):
+    ppl = plumber.Pipeline(serializers.root, serializers.responsedate,
+            serializers.request, body, serializers.tobytes)
+    return next(ppl.run(data, rewrap=True))
+
+
+def get_cases():
+    return [
+        ('Identify', serializers.identify, serializers.serialize_identify),
+        ('badVerb', serializers.badverb, serializers.serialize_bad_verb),
+        ('badArgument', serializers.badargument,
+            serializers.serialize_bad_argument),
+        ('badResumptionToken', serializers.badresumptiontoken,
+            serializers.serialize_bad_resumption_token),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    data = get_data()
+    print('%-20s %14s %14s' % ('response', 'pipeline (µs)', 'template (µs)'))
+    for label, body, serialize in get_cases():
+        pipeline = timeit.timeit(lambda: serialize_with_pipeline(body, data),
+                number=args.number)
+        template = timeit.timeit(lambda: serialize(data), number=args.number)
+        print('%-20s %14.2f %14.2f' % (label, pipeline / args.number * 1e6,
+            template / args.number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
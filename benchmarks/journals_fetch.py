@@ -0,0 +1,64 @@
+"""Mede a quantidade de viagens ao backend e a latência da obtenção de todos
+os periódicos de uma coleção por meio de ``ArticleMeta.list_journals``, em
+função da quantidade de periódicos e do modo de obtenção.
+
+Utiliza o servidor Thrift local de ``benchmarks.stubserver``.
+
+Uso::
+
+    python -m benchmarks.journals_fetch --latency 2 --journals 100 1000 5000
+"""
+import argparse
+import time
+
+from oaipmh import articlemeta
+
+from benchmarks import stubserver
+
+
+def get_modes():
+    return [
+        ('sequential', {'fetch_workers': 1, 'pool_size': 1}),
+        ('concurrent', {'fetch_workers': 8, 'pool_size': 8}),
+        ('concurrent x32', {'fetch_workers': 32, 'pool_size': 32}),
+    ]
+
+
+def measure(handler, domain, client_kwargs, journals):
+    client = articlemeta.get_articlemeta_client('scl', domain=domain,
+            **client_kwargs)
+    ds = articlemeta.ArticleMeta(client)
+
+    handler.reset()
+    start = time.perf_counter()
+    result = list(ds.list_journals(0, journals))
+    elapsed = time.perf_counter() - start
+    assert len(result) == journals
+
+    return sum(handler.calls.values()), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=2.0,
+            help='latência por chamada, em milissegundos')
+    parser.add_argument('--journals', type=int, nargs='+',
+            default=[100, 1000, 5000])
+    args = parser.parse_args()
+
+    corpus = stubserver.Corpus(documents=0, journals=max(args.journals))
+    handler = stubserver.ArticleMetaHandler(corpus,
+            latency=args.latency / 1000)
+    domain = stubserver.start(handler)
+
+    print('%-16s %8s %12s %12s' % ('mode', 'journals', 'round trips',
+            'total (ms)'))
+    for label, client_kwargs in get_modes():
+        for journals in args.journals:
+            calls, elapsed = measure(handler, domain, client_kwargs, journals)
+            print('%-16s %8d %12d %12.1f' % (label, journals, calls,
+                    elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main()
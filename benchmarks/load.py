@@ -0,0 +1,251 @@
+"""Mede a vazão de requisições da aplicação, de ponta a ponta, sob uma
+combinação configurável de verbos OAI-PMH.
+
+O serviço ArticleMeta é substituído pelo servidor Thrift local de
+``benchmarks.stubserver``, com latência e tamanho do acervo configuráveis,
+e a aplicação de ``oaipmh.main`` é executada pelo gunicorn, configurada por
+variáveis de ambiente. O gerador de carga mantém ``--concurrency`` clientes
+HTTP com conexões persistentes e relata as requisições por segundo, as
+latências p50/p95/p99, no total e por verbo, e a quantidade de chamadas ao
+ArticleMeta por requisição.
+
+Com ``--url``, a carga é dirigida a uma aplicação já em execução; neste caso
+as chamadas ao ArticleMeta não são contabilizadas.
+
+Uso::
+
+    python -m benchmarks.load --documents 5000 --latency 2 --workers 4 \\
+        --concurrency 16 --duration 30 \\
+        --mix ListRecords=5,GetRecord=3,ListIdentifiers=2,Identify=1
+    python -m benchmarks.load --url http://127.0.0.1:6543/ --duration 10
+"""
+import argparse
+import collections
+import http.client
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks import stubserver
+
+
+DEFAULT_MIX = ('ListRecords=5,GetRecord=3,ListIdentifiers=2,Identify=1,'
+               'ListSets=1')
+
+
+Sample = collections.namedtuple('Sample', 'verb elapsed ok')
+
+
+def parse_mix(mix):
+    """Converte ``'ListRecords=5,GetRecord=3'`` em uma lista de pares
+    ``(verbo, peso)``.
+    """
+    pairs = []
+    for item in mix.split(','):
+        verb, _, weight = item.partition('=')
+        pairs.append((verb.strip(), float(weight or 1)))
+    return pairs
+
+
+class RequestFactory:
+    """Produz as URLs das requisições de cada verbo, com argumentos sorteados
+    do acervo sintético.
+    """
+    def __init__(self, corpus, metadata_prefix='oai_dc', seed=None):
+        self.identifiers = [doc['code'] for doc in corpus.documents]
+        self.sets = [journal['code'] for journal in corpus.journals]
+        self.metadata_prefix = metadata_prefix
+        self.random = random.Random(seed)
+
+    def __call__(self, verb):
+        args = {'verb': verb}
+        if verb == 'GetRecord':
+            args['identifier'] = self.random.choice(self.identifiers)
+            args['metadataPrefix'] = self.metadata_prefix
+        elif verb in ('ListRecords', 'ListIdentifiers'):
+            # ``check_listidentifiers_args`` não admite ``metadataPrefix``.
+            if verb == 'ListRecords':
+                args['metadataPrefix'] = self.metadata_prefix
+            # metade das listagens é restrita a um periódico.
+            if self.random.random() < 0.5:
+                args['set'] = self.random.choice(self.sets)
+        return '/?' + urlencode(args)
+
+
+def percentile(values, p):
+    """Percentil ``p`` de ``values``, já ordenados, pelo método do posto mais
+    próximo.
+    """
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, int(round(p / 100 * len(values))) - 1))
+    return values[rank]
+
+
+def run_client(host, port, factory, verbs, weights, deadline, samples, lock):
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    rng = random.Random()
+    local = []
+    try:
+        while time.monotonic() < deadline:
+            verb = rng.choices(verbs, weights)[0]
+            with lock:
+                path = factory(verb)
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                ok = False
+            local.append(Sample(verb, time.perf_counter() - start, ok))
+    finally:
+        conn.close()
+        with lock:
+            samples.extend(local)
+
+
+def generate_load(url, factory, mix, concurrency, duration):
+    """Executa ``concurrency`` clientes durante ``duration`` segundos e
+    retorna as amostras e o tempo decorrido.
+    """
+    parts = urlsplit(url)
+    verbs = [verb for verb, _ in mix]
+    weights = [weight for _, weight in mix]
+    samples = []
+    lock = threading.Lock()
+    start = time.monotonic()
+    deadline = start + duration
+    threads = [threading.Thread(target=run_client, args=(parts.hostname,
+                   parts.port or 80, factory, verbs, weights, deadline,
+                   samples, lock), daemon=True)
+               for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.monotonic() - start
+
+
+def wait_until_ready(url, timeout=30):
+    parts = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port,
+                    timeout=5)
+            conn.request('GET', '/?verb=Identify')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.2)
+    raise SystemExit('application did not start at %s' % url)
+
+
+def start_gunicorn(domain, workers, threads, listslen):
+    """Inicia a aplicação no gunicorn, em um subprocesso, e retorna o
+    processo e a URL da aplicação.
+    """
+    port = stubserver.get_free_port()
+    env = dict(os.environ,
+            OAIPMH_ARTICLEMETA_DOMAIN=domain,
+            OAIPMH_LISTSLEN=str(listslen),
+            # o servidor Thrift local encerra conexões ociosas após 3s.
+            OAIPMH_ARTICLEMETA_POOLIDLETIMEOUT='2')
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn',
+            '--bind', '127.0.0.1:%d' % port, '--workers', str(workers),
+            '--threads', str(threads), '--log-level', 'warning',
+            'benchmarks.wsgi:application'], env=env,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return process, 'http://127.0.0.1:%d/' % port
+
+
+def report(samples, elapsed, calls=None):
+    by_verb = collections.defaultdict(list)
+    errors = 0
+    for sample in samples:
+        by_verb[sample.verb].append(sample.elapsed)
+        errors += not sample.ok
+    by_verb['all'] = [sample.elapsed for sample in samples]
+
+    print('%d requests in %.1fs: %.1f requests/s, %d errors' % (len(samples),
+        elapsed, len(samples) / elapsed if elapsed else 0.0, errors))
+    print('%-20s %8s %10s %10s %10s' % ('verb', 'requests', 'p50 (ms)',
+        'p95 (ms)', 'p99 (ms)'))
+    for verb in sorted(by_verb, key=lambda v: (v == 'all', v)):
+        values = sorted(by_verb[verb])
+        print('%-20s %8d %10.1f %10.1f %10.1f' % (verb, len(values),
+            percentile(values, 50) * 1000, percentile(values, 95) * 1000,
+            percentile(values, 99) * 1000))
+
+    if calls is not None and samples:
+        print('backend calls per request: %.2f' % (
+            sum(calls.values()) / len(samples)))
+        for name, count in sorted(calls.items()):
+            print('    %-28s %.2f' % (name, count / len(samples)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='aplicação já em execução')
+    parser.add_argument('--documents', type=int, default=5000)
+    parser.add_argument('--journals', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=2.0,
+            help='latência por chamada ao ArticleMeta, em milissegundos')
+    parser.add_argument('--no-bulk', action='store_true',
+            help='o ArticleMeta não implementa ``get_articles``')
+    parser.add_argument('--workers', type=int, default=2,
+            help='processos do gunicorn')
+    parser.add_argument('--threads', type=int, default=4,
+            help='threads por processo do gunicorn')
+    parser.add_argument('--listslen', type=int, default=100,
+            help='registros por página das listagens')
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+            help='pesos dos verbos, e.g. "%s"' % DEFAULT_MIX)
+    parser.add_argument('--metadata-prefix', default='oai_dc')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30,
+            help='duração da medição, em segundos')
+    parser.add_argument('--warmup', type=float, default=5,
+            help='duração do aquecimento, em segundos, não contabilizado')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    corpus = stubserver.Corpus(args.documents, args.journals)
+    factory = RequestFactory(corpus, args.metadata_prefix, args.seed)
+
+    handler = process = None
+    url = args.url
+    if url is None:
+        handler = stubserver.ArticleMetaHandler(corpus,
+                latency=args.latency / 1000, bulk=not args.no_bulk)
+        domain = stubserver.start(handler)
+        process, url = start_gunicorn(domain, args.workers, args.threads,
+                args.listslen)
+
+    try:
+        wait_until_ready(url)
+        if args.warmup:
+            generate_load(url, factory, mix, args.concurrency, args.warmup)
+        if handler is not None:
+            handler.reset()
+        samples, elapsed = generate_load(url, factory, mix,
+                args.concurrency, args.duration)
+        report(samples, elapsed,
+                calls=dict(handler.calls) if handler is not None else None)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
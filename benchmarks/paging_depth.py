@@ -0,0 +1,67 @@
+"""Mede a latência de uma página de registros em função da profundidade da
+colheita, com paginação por offset (``DataStore.list``) e por cursor
+(``DataStore.list_after``).
+
+Os recursos são mantidos em ``oaipmh.datastores.InMemory``.
+
+Uso::
+
+    python -m benchmarks.paging_depth --records 100000 --size 100
+"""
+import argparse
+import time
+
+from oaipmh import datastores
+from oaipmh.entities import Resource
+
+
+def make_resource(i):
+    return Resource(ridentifier='rid%08d' % i,
+            datestamp='%04d-%02d-%02d' % (2000 + i % 17, 1 + i % 12,
+                                          1 + i % 28),
+            setspec=[], title=[], creator=[], subject=[], description=[],
+            publisher=[], contributor=[], date=[], type=[], format=[],
+            identifier=[], source=[], language=[], relation=[], rights=[])
+
+
+def get_depths(records, size, points=5):
+    step = max(size, records // points)
+    return list(range(0, records - size + 1, step))
+
+
+def measure(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=100000,
+            help='quantidade de registros no datastore')
+    parser.add_argument('--size', type=int, default=100,
+            help='quantidade de registros por página')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    ds = datastores.InMemory()
+    for i in range(args.records):
+        ds.add(make_resource(i))
+    keys = sorted(datastores.resource_key(r) for r in ds.data.values())
+
+    print('%10s %14s %14s' % ('depth', 'offset (ms)', 'cursor (ms)'))
+    for depth in get_depths(args.records, args.size):
+        key = keys[depth - 1] if depth else None
+        offset_time = measure(lambda: list(ds.list(depth, args.size)),
+                args.repeat)
+        cursor_time = measure(lambda: list(ds.list_after(key, args.size)),
+                args.repeat)
+        print('%10d %14.2f %14.2f' % (depth, offset_time * 1000,
+            cursor_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
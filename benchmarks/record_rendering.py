@@ -0,0 +1,73 @@
+"""Mede a vazão da serialização de respostas ListRecords, em registros por
+segundo, sem cache de fragmentos e com o cache frio e aquecido.
+
+Os recursos são produzidos à partir do acervo sintético de
+``benchmarks.stubserver``, sem acesso ao backend.
+
+Uso::
+
+    python -m benchmarks.record_rendering --pages 20 --size 100
+"""
+import argparse
+import time
+
+from xylose.scielodocument import Article
+
+import oaipmh
+from oaipmh import articlemeta, cache, repository
+from oaipmh.entities import OAIRequest
+
+from benchmarks import stubserver
+
+
+def get_pages(pages, size):
+    corpus = stubserver.Corpus(documents=pages * size)
+    resources = [articlemeta.ArticleResourceFacade(Article(doc)).to_resource()
+                 for doc in corpus.documents]
+    return [resources[i:i+size] for i in range(0, len(resources), size)]
+
+
+def render(pages, metadata, metadata_format, record_cache):
+    fmt, formatter, augmenter = metadata_format
+    oairequest = OAIRequest(verb='ListRecords', identifier=None,
+            metadataPrefix=fmt.metadataPrefix, set=None,
+            resumptionToken=None, from_=None, until=None)
+    start = time.perf_counter()
+    for page in pages:
+        repository.serialize_list_records(metadata, oairequest,
+                [augmenter(r) for r in page], None,
+                metadata_formatter=formatter, record_cache=record_cache)
+    return time.perf_counter() - start
+
+
+def report(label, prefix, elapsed, records):
+    print('%-12s %-16s %10.0f records/s' % (label, prefix, records / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=20,
+            help='quantidade de páginas serializadas')
+    parser.add_argument('--size', type=int, default=100,
+            help='quantidade de registros por página')
+    args = parser.parse_args()
+
+    settings = oaipmh.parse_settings({})
+    metadata = oaipmh.get_repository_meta(settings)
+    pages = get_pages(args.pages, args.size)
+    records = args.pages * args.size
+
+    for metadata_format in oaipmh.METADATA_FORMATS:
+        prefix = metadata_format[0].metadataPrefix
+        report('no cache', prefix,
+                render(pages, metadata, metadata_format, None), records)
+
+        record_cache = cache.CacheNamespace(cache.TTLCache(records), prefix)
+        for label in ['cold cache', 'warm cache']:
+            report(label, prefix,
+                    render(pages, metadata, metadata_format, record_cache),
+                    records)
+
+
+if __name__ == '__main__':
+    main()
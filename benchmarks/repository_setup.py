@@ -0,0 +1,46 @@
+"""Mede o custo, por requisição, da produção do ``Repository``.
+
+Compara a produção de uma nova instância de ``oaipmh.repository.Repository``
+(e do datastore, cliente ArticleMeta e registro de sets) com o acesso à
+instância compartilhada pelo processo via ``oaipmh.RepositoryProvider``.
+
+Uso::
+
+    python -m benchmarks.repository_setup -n 10000
+"""
+import argparse
+import functools
+import timeit
+
+import oaipmh
+
+
+def get_settings():
+    settings = oaipmh.parse_settings({})
+    settings['repository_meta'] = oaipmh.get_repository_meta(settings)
+    return settings
+
+
+def report(label, total, number):
+    print('%-30s %10.2f µs/req' % (label, total / number * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--number', type=int, default=10000,
+            help='quantidade de requisições simuladas')
+    args = parser.parse_args()
+
+    settings = get_settings()
+    factory = functools.partial(oaipmh.get_repository, settings)
+    provider = oaipmh.RepositoryProvider(factory)
+    provider.get()
+
+    report('build per request', timeit.timeit(factory, number=args.number),
+            args.number)
+    report('shared per process', timeit.timeit(provider.get,
+            number=args.number), args.number)
+
+
+if __name__ == '__main__':
+    main()
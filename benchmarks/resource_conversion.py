@@ -0,0 +1,111 @@
+"""Mede o custo da conversão de documentos do ArticleMeta em ``Resource``,
+em microssegundos por documento, com ``ArticleResourceFacade.to_resource`` e
+``ArticleResourceFacade.to_lazy_resource``, e com os metadados dos
+periódicos mantidos em ``articlemeta.JournalMetadataCache``.
+
+A representação preguiçosa é medida conforme os atributos efetivamente
+acessados: apenas os do cabeçalho (e.g. registros servidos do cache de
+registros), os do formato ``oai_dc`` e todos os atributos.
+
+Os documentos são os de ``tests.fixtures.factories.get_sample_article`` e os
+do acervo sintético de ``benchmarks.stubserver``.
+
+Uso::
+
+    python -m benchmarks.resource_conversion --records 2000 --repeat 5
+"""
+import argparse
+import time
+
+from xylose.scielodocument import Article
+
+from oaipmh import articlemeta, repository
+from oaipmh.formatters import oai_dc
+
+from benchmarks import stubserver
+from tests.fixtures import factories
+
+
+HEADER_FIELDS = ['ridentifier', 'datestamp', 'setspec']
+
+
+def get_articles(records):
+    articles = [factories.get_sample_article(code='S0001-3765200000010%04d'
+                                             % i) for i in range(records)]
+    articles += [Article(doc)
+                 for doc in stubserver.Corpus(documents=records).documents]
+    return articles
+
+
+def eager(article):
+    articlemeta.ArticleResourceFacade(article).to_resource()
+
+
+def eager_journals(journals):
+    def convert(article):
+        articlemeta.ArticleResourceFacade(article, journals).to_resource()
+    return convert
+
+
+def lazy_header(article):
+    data = repository.asdict(
+            articlemeta.ArticleResourceFacade(article).to_lazy_resource())
+    for field in HEADER_FIELDS:
+        data[field]
+
+
+def lazy_oai_dc(article):
+    data = repository.asdict(
+            articlemeta.ArticleResourceFacade(article).to_lazy_resource())
+    for field in HEADER_FIELDS:
+        data[field]
+    oai_dc.make_metadata(data)
+
+
+def eager_oai_dc(article):
+    data = repository.asdict(
+            articlemeta.ArticleResourceFacade(article).to_resource())
+    oai_dc.make_metadata(data)
+
+
+def lazy_all(article):
+    articlemeta.ArticleResourceFacade(article).to_lazy_resource().to_resource()
+
+
+def measure(fn, articles, repeat):
+    """Menor tempo médio por documento, em segundos, entre ``repeat``
+    execuções.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for article in articles:
+            fn(article)
+        elapsed = (time.perf_counter() - start) / len(articles)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=2000,
+            help='documentos de cada origem')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    articles = get_articles(args.records)
+
+    print('%-22s %12s' % ('conversion', 'us/document'))
+    for label, fn in [('eager', eager),
+                      ('eager (journal cache)', eager_journals(
+                          articlemeta.JournalMetadataCache())),
+                      ('lazy (header)', lazy_header),
+                      ('eager + oai_dc', eager_oai_dc),
+                      ('lazy + oai_dc', lazy_oai_dc),
+                      ('lazy (all fields)', lazy_all)]:
+        print('%-22s %12.1f' % (label,
+            measure(fn, articles, args.repeat) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""Mede o custo dos pontos de entrada de ``oaipmh.serializers`` e de
+``make_metadata`` dos formatos ``oai_dc`` e ``oai_dc_openaire``, e sinaliza
+regressões em relação a uma linha de base.
+
+Para cada caso são medidos o tempo por registro, em microssegundos, o pico
+de memória alocada e a quantidade de bytes produzidos por registro. Os
+recursos são produzidos à partir de ``tests.fixtures.factories``, com
+dimensões realistas: muitos autores, resumos longos e vários idiomas. As
+respostas paginadas são medidas com páginas de 20 a 1000 registros.
+
+Os resultados podem ser gravados como JSON, com ``--save``, e comparados a
+uma linha de base, com ``--baseline``. Casos cujo tempo ou pico de memória
+excedam os da linha de base em mais de ``--threshold`` são sinalizados, e o
+comando termina com status 1.
+
+Uso::
+
+    python -m benchmarks.serialization --save baseline.json
+    python -m benchmarks.serialization --baseline baseline.json \\
+        --threshold 0.15
+"""
+import argparse
+import collections
+import datetime
+import json
+import time
+import tracemalloc
+
+import oaipmh
+from oaipmh import repository, serializers
+from oaipmh.formatters import oai_dc, oai_dc_openaire
+from oaipmh.entities import MetadataFormat, Set
+
+from tests.fixtures import factories
+
+
+LANGUAGES = ['en', 'pt', 'es']
+
+
+Result = collections.namedtuple('Result', 'us_per_record peak_bytes bytes')
+
+
+Case = collections.namedtuple('Case', 'name records run')
+
+
+def make_resource(i, authors=30, abstract_words=300, languages=LANGUAGES):
+    words = ['word%d' % (n % 97) for n in range(abstract_words)]
+    return factories.get_sample_resource(
+            ridentifier='S0001-3765%013d' % i,
+            datestamp=datetime.datetime(2017, 6, 14) +
+                datetime.timedelta(seconds=i),
+            setspec=['0001-3765'],
+            title=[(lang, 'Title %d in %s, with some more words' % (i, lang))
+                   for lang in languages],
+            creator=['Surname %d, Given Names %d' % (n, n)
+                     for n in range(authors)],
+            subject=[(lang, 'keyword %d' % n) for lang in languages
+                     for n in range(6)],
+            description=[(lang, ' '.join(words)) for lang in languages],
+            language=list(languages))
+
+
+def get_pages(sizes):
+    largest = max(sizes)
+    resources = [repository.asdict(make_resource(i)) for i in range(largest)]
+    return {size: resources[:size] for size in sizes}
+
+
+def get_envelope(verb, **request):
+    settings = oaipmh.parse_settings({})
+    request = dict(factories.get_sample_request(verb=verb)._asdict(),
+                   **request)
+    return {
+            'repository': repository.asdict(
+                oaipmh.get_repository_meta(settings)),
+            'request': {k.strip('_'): v for k, v in request.items()},
+            }
+
+
+def output_size(output):
+    if isinstance(output, bytes):
+        return len(output)
+    if isinstance(output, str):
+        return len(output.encode('utf-8'))
+    return sum(len(chunk) for chunk in output)
+
+
+def get_cases(sizes):
+    pages = get_pages(sizes)
+    cases = []
+
+    def add(name, records, fn):
+        cases.append(Case(name=name, records=records, run=fn))
+
+    identify = get_envelope('Identify')
+    add('serialize_identify', 1,
+            lambda: serializers.serialize_identify(identify))
+
+    formats = dict(get_envelope('ListMetadataFormats'), formats=[
+        repository.asdict(fmt) for fmt, _, _ in oaipmh.METADATA_FORMATS])
+    add('serialize_list_metadata_formats', 1,
+            lambda: serializers.serialize_list_metadata_formats(formats))
+
+    errors = get_envelope('ListRecords', metadataPrefix='oai_dc')
+    for name in ['serialize_bad_verb', 'serialize_bad_argument',
+                 'serialize_id_does_not_exist',
+                 'serialize_cannot_disseminate_format',
+                 'serialize_bad_resumption_token']:
+        add(name, 1, lambda fn=getattr(serializers, name): fn(errors))
+
+    get_record = dict(get_envelope('GetRecord', metadataPrefix='oai_dc'),
+            resources=pages[min(sizes)][:1])
+    add('serialize_get_record', 1, lambda: serializers.serialize_get_record(
+        get_record, oai_dc.make_metadata))
+
+    for size in sizes:
+        resources = pages[size]
+        sets = [repository.asdict(Set(setSpec='%04d-0000' % n,
+                                      setName='Journal %d' % n))
+                for n in range(size)]
+
+        list_sets = dict(get_envelope('ListSets'), sets=sets,
+                resumptionToken='')
+        add('serialize_list_sets/%d' % size, size,
+                lambda data=list_sets: serializers.serialize_list_sets(data))
+
+        identifiers = dict(get_envelope('ListIdentifiers',
+            metadataPrefix='oai_dc'), resources=resources, resumptionToken='')
+        add('serialize_list_identifiers/%d' % size, size,
+                lambda data=identifiers:
+                    serializers.serialize_list_identifiers(data))
+        add('iter_list_identifiers/%d' % size, size,
+                lambda data=identifiers: serializers.iter_list_identifiers(
+                    dict(data, resumptionToken=lambda: '')))
+
+        records = dict(get_envelope('ListRecords', metadataPrefix='oai_dc'),
+                resources=resources, resumptionToken='')
+        add('serialize_list_records/%d' % size, size,
+                lambda data=records: serializers.serialize_list_records(
+                    data, oai_dc.make_metadata))
+        add('iter_list_records/%d' % size, size,
+                lambda data=records: serializers.iter_list_records(
+                    dict(data, resumptionToken=lambda: ''),
+                    oai_dc.make_metadata))
+
+    resources = pages[max(sizes)]
+    for module in [oai_dc, oai_dc_openaire]:
+        add('%s.make_metadata' % module.__name__.rsplit('.', 1)[-1],
+                len(resources),
+                lambda make_metadata=module.make_metadata: [
+                    serializers.etree.tostring(make_metadata(resource))
+                    for resource in resources])
+    return cases
+
+
+def measure(case, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = output_size(case.run())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    output_size(case.run())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return Result(us_per_record=best * 1e6 / case.records, peak_bytes=peak,
+            bytes=size / case.records)
+
+
+def find_regressions(results, baseline, threshold):
+    """Casos cujo tempo por registro ou pico de memória excedam os de
+    ``baseline`` em mais de ``threshold``, e.g. ``0.1`` para 10%.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = Result(**baseline[name])
+        for metric in ['us_per_record', 'peak_bytes']:
+            current, previous = getattr(result, metric), getattr(expected,
+                    metric)
+            if previous and current > previous * (1 + threshold):
+                regressions.append((name, metric, previous, current))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+            default=[20, 100, 500, 1000], help='registros por página')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', help='grava os resultados como JSON')
+    parser.add_argument('--baseline', help='linha de base, em JSON')
+    parser.add_argument('--threshold', type=float, default=0.15,
+            help='variação tolerada em relação à linha de base')
+    args = parser.parse_args()
+
+    covered = set()
+    results = collections.OrderedDict()
+    print('%-40s %12s %14s %12s' % ('case', 'us/record', 'peak (KiB)',
+        'bytes/record'))
+    for case in get_cases(args.sizes):
+        covered.add(case.name.split('/')[0])
+        result = results[case.name] = measure(case, args.repeat)
+        print('%-40s %12.1f %14.1f %12.0f' % (case.name, result.us_per_record,
+            result.peak_bytes / 1024, result.bytes))
+
+    missing = set(serializers.__all__) - covered
+    if missing:
+        print('not measured: %s' % ', '.join(sorted(missing)))
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as fp:
+            json.dump({name: result._asdict()
+                       for name, result in results.items()}, fp, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as fp:
+            baseline = json.load(fp)
+        regressions = find_regressions(results, baseline, args.threshold)
+        for name, metric, previous, current in regressions:
+            print('REGRESSION %s %s: %.1f -> %.1f (+%.0f%%)' % (name, metric,
+                previous, current, (current / previous - 1) * 100))
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Mede a vazão da carga de recursos em ``oaipmh.sqlitestore.SQLite``, em
+recursos por segundo, e a latência de páginas de ``list`` e ``list_after``.
+
+Os recursos são produzidos à partir do acervo sintético de
+``benchmarks.stubserver``.
+
+Uso::
+
+    python -m benchmarks.sqlite_store --records 20000 --batch 1000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from xylose.scielodocument import Article
+
+from oaipmh import articlemeta, datastores, sqlitestore
+
+from benchmarks import stubserver
+
+
+def get_resources(records):
+    corpus = stubserver.Corpus(documents=records, journals=100)
+    return [articlemeta.ArticleResourceFacade(Article(doc)).to_resource()
+            for doc in corpus.documents]
+
+
+def measure(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=20000)
+    parser.add_argument('--batch', type=int, default=1000,
+            help='recursos por transação')
+    parser.add_argument('--size', type=int, default=100,
+            help='quantidade de registros por página')
+    args = parser.parse_args()
+
+    resources = get_resources(args.records)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = sqlitestore.SQLite(os.path.join(tmpdir, 'oai.db'))
+        elapsed = measure(lambda: store.add_many(resources, args.batch))
+        print('load: %.0f resources/s, %.1f MiB' % (args.records / elapsed,
+            os.path.getsize(os.path.join(tmpdir, 'oai.db')) / 2**20))
+
+        print('%10s %14s %14s' % ('depth', 'offset (ms)', 'cursor (ms)'))
+        keys = [datastores.resource_key(r) for r in store.list(0, args.records)]
+        for depth in range(0, args.records - args.size + 1,
+                max(args.size, args.records // 5)):
+            key = keys[depth - 1] if depth else None
+            offset_time = measure(lambda: list(store.list(depth, args.size)))
+            cursor_time = measure(lambda: list(store.list_after(key,
+                args.size)))
+            print('%10d %14.2f %14.2f' % (depth, offset_time * 1000,
+                cursor_time * 1000))
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
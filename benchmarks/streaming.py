@@ -0,0 +1,79 @@
+"""Mede o tempo até o primeiro byte e o pico de memória alocada durante a
+produção de respostas ListRecords, com e sem streaming, em função de
+``oaipmh.listslen``.
+
+Os recursos são mantidos em ``oaipmh.datastores.InMemory``, produzidos à
+partir do acervo sintético de ``benchmarks.stubserver``.
+
+Uso::
+
+    python -m benchmarks.streaming --sizes 100 500 1000
+"""
+import argparse
+import time
+import tracemalloc
+
+from xylose.scielodocument import Article
+
+import oaipmh
+from oaipmh import articlemeta, datastores, repository, sets
+
+from benchmarks import stubserver
+
+
+def get_datastore(records):
+    ds = datastores.InMemory()
+    for doc in stubserver.Corpus(documents=records).documents:
+        ds.add(articlemeta.ArticleResourceFacade(Article(doc)).to_resource())
+    return ds
+
+
+def get_repository(ds, listslen, streaming):
+    settings = oaipmh.parse_settings({})
+    repo = repository.Repository(oaipmh.get_repository_meta(settings), ds,
+            sets.SetsRegistry(ds, []), listslen, streaming=streaming)
+    for metadata, formatter, augmenter in oaipmh.METADATA_FORMATS:
+        repo.add_metadataformat(metadata, formatter, augmenter)
+    return repo
+
+
+def measure(repo):
+    """Retorna o tempo até o primeiro byte, o tempo total e o pico de
+    memória alocada, em bytes.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    body = repo.handle_request('verb=ListRecords&metadataPrefix=oai_dc')
+    if isinstance(body, bytes):
+        body = [body]
+
+    first_byte = None
+    for chunk in body:
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first_byte, total, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+            default=[100, 500, 1000], help='valores de oaipmh.listslen')
+    args = parser.parse_args()
+
+    ds = get_datastore(max(args.sizes))
+
+    print('%-10s %8s %12s %12s %12s' % ('mode', 'listslen', 'ttfb (ms)',
+        'total (ms)', 'peak (KiB)'))
+    for size in args.sizes:
+        for label, streaming in [('buffered', False), ('streaming', True)]:
+            first_byte, total, peak = measure(get_repository(ds, size,
+                streaming))
+            print('%-10s %8d %12.2f %12.2f %12.0f' % (label, size,
+                first_byte * 1000, total * 1000, peak / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""Servidor Thrift local que imita o serviço ArticleMeta.
+
+Serve um acervo sintético de documentos e periódicos por meio das chamadas
+utilizadas por ``oaipmh.articlemeta.SliceableResultSetThriftClient``,
+com latência configurável e contagem das chamadas recebidas. É utilizado
+pelos benchmarks que precisam medir a quantidade de viagens ao backend
+sem depender da rede.
+
+Uso::
+
+    python -m benchmarks.stubserver --port 11621 --documents 5000 --latency 2
+"""
+import argparse
+import collections
+import json
+import socket
+import threading
+import time
+
+from articlemeta.client import ThriftClient
+from thriftpy.rpc import make_server
+from thriftpy.thrift import TApplicationException
+
+
+THRIFT = ThriftClient.ARTICLEMETA_THRIFT
+
+
+def make_journal(i):
+    issn = '%04d-%04d' % (1000 + i // 10000, i % 10000)
+    return {
+        'code': issn,
+        'collection': 'scl',
+        'processing_date': '2017-01-01',
+        'v100': [{'_': 'Revista Sintética %d' % i}],
+        'v150': [{'_': 'Rev. Sint. %d' % i}],
+        'v400': [{'_': issn}],
+        'v435': [{'_': issn, 't': 'PRINT'}],
+        'v480': [{'_': 'Editora Sintética %d' % i}],
+        'v992': [{'_': 'scl'}],
+    }
+
+
+def make_document(i, journal):
+    issn = journal['code']
+    pid = 'S%s%04d%03d%05d' % (issn, 2000 + i % 17, 1 + i % 4, i)
+    processing_date = '%04d-%02d-%02d' % (2000 + i % 17, 1 + i % 12,
+            1 + i % 28)
+    return {
+        'code': pid,
+        'collection': 'scl',
+        'processing_date': processing_date,
+        'license': 'by/4.0',
+        'title': journal,
+        'issue': {
+            'issue': {
+                'v31': [{'_': str(1 + i % 40)}],
+                'v32': [{'_': str(1 + i % 4)}],
+                'v65': [{'_': processing_date.replace('-', '')}],
+            },
+        },
+        'article': {
+            'v880': [{'_': pid}],
+            'v91': [{'_': processing_date.replace('-', '')}],
+            'v65': [{'_': processing_date.replace('-', '')}],
+            'v40': [{'_': 'pt'}],
+            'v71': [{'_': 'oa'}],
+            'v12': [{'_': 'Título do documento %d' % i, 'l': 'pt'},
+                    {'_': 'Title of document %d' % i, 'l': 'en'}],
+            'v10': [{'s': 'Sobrenome%d' % j, 'n': 'Nome %d' % j}
+                    for j in range(1 + i % 6)],
+            'v83': [{'a': 'Resumo do documento %d. ' % i * 20, 'l': 'pt'},
+                    {'a': 'Abstract of document %d. ' % i * 20, 'l': 'en'}],
+            'v85': [{'k': 'palavra %d' % j, 'l': 'pt'} for j in range(5)] +
+                   [{'k': 'keyword %d' % j, 'l': 'en'} for j in range(5)],
+            'v14': [{'f': '1', 'l': '10'}],
+            'v992': [{'_': 'scl'}],
+        },
+    }
+
+
+def document_key(doc):
+    return (doc['processing_date'], doc['code'])
+
+
+def is_after(doc, keyset_term):
+    """Avalia o termo produzido por ``oaipmh.articlemeta.keyset_filter``.
+    """
+    after, same_date = keyset_term
+    processing_date = after['processing_date']['$gt']
+    code = same_date['code']['$gt']
+    return document_key(doc) > (processing_date, code)
+
+
+class Corpus:
+    """Acervo sintético com ``documents`` documentos distribuídos entre
+    ``journals`` periódicos, ordenados por ``processing_date`` e ``code``.
+    """
+    def __init__(self, documents=1000, journals=10):
+        self.journals = [make_journal(i) for i in range(journals)]
+        self.documents = sorted((make_document(i, self.journals[i % journals])
+                                 for i in range(documents)), key=document_key)
+        self.documents_by_code = {d['code']: d for d in self.documents}
+        self.journals_by_code = {j['code']: j for j in self.journals}
+
+    def select_documents(self, issn, from_date, until_date, extra_filter):
+        term = json.loads(extra_filter) if extra_filter else {}
+        code_title = term.get('code_title') or issn
+        keyset_term = term.get('$or')
+
+        for doc in self.documents:
+            if code_title and doc['title']['code'] != code_title:
+                continue
+            if 'code' in term and doc['code'] != term['code']:
+                continue
+            if keyset_term and not is_after(doc, keyset_term):
+                continue
+            if from_date and doc['processing_date'] < from_date:
+                continue
+            if until_date and doc['processing_date'] > until_date:
+                continue
+            yield doc
+
+
+class ArticleMetaHandler:
+    """Implementa as chamadas do serviço ArticleMeta sob ``corpus``.
+
+    :param latency: segundos de espera acrescentados a cada chamada.
+    :param bulk: se a chamada ``get_articles`` está disponível.
+    """
+    def __init__(self, corpus, latency=0.0, bulk=True):
+        self.corpus = corpus
+        self.latency = latency
+        self.bulk = bulk
+        self.calls = collections.Counter()
+        self._lock = threading.Lock()
+
+    def _call(self, name):
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+
+    def get_article_identifiers(self, collection, issn, from_date, until_date,
+            limit, offset, extra_filter):
+        self._call('get_article_identifiers')
+        docs = list(self.corpus.select_documents(issn, from_date, until_date,
+                extra_filter))[offset:offset+limit]
+        return [THRIFT.article_identifiers(code=d['code'],
+                    collection=d['collection'],
+                    processing_date=d['processing_date'])
+                for d in docs]
+
+    def get_article(self, code, collection, replace_journal_metadata, fmt,
+            body):
+        self._call('get_article')
+        doc = self.corpus.documents_by_code.get(code)
+        return json.dumps(doc) if doc else ''
+
+    def get_articles(self, collection, issn, from_date, until_date, limit,
+            offset, extra_filter, replace_journal_metadata, body):
+        self._call('get_articles')
+        if not self.bulk:
+            raise TApplicationException(TApplicationException.UNKNOWN_METHOD)
+        docs = list(self.corpus.select_documents(issn, from_date, until_date,
+                extra_filter))[offset:offset+limit]
+        return json.dumps({'objects': docs})
+
+    def get_journal_identifiers(self, collection, issn, limit, offset,
+            extra_filter):
+        self._call('get_journal_identifiers')
+        journals = self.corpus.journals[offset:offset+limit]
+        return [THRIFT.journal_identifiers(code=j['code'],
+                    collection=j['collection'],
+                    processing_date=j['processing_date'])
+                for j in journals]
+
+    def get_journal(self, code, collection):
+        self._call('get_journal')
+        journal = self.corpus.journals_by_code.get(code)
+        return json.dumps(journal) if journal else ''
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start(handler, host='127.0.0.1', port=None):
+    """Inicia o servidor em uma thread daemon e retorna o endereço no
+    formato ``host:port``, aceito por ``ThriftClient(domain=...)``.
+    """
+    port = port or get_free_port()
+    server = make_server(THRIFT.ArticleMeta, handler, host, port)
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.01)
+
+    return '%s:%s' % (host, port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11621)
+    parser.add_argument('--documents', type=int, default=1000)
+    parser.add_argument('--journals', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0,
+            help='latência por chamada, em milissegundos')
+    parser.add_argument('--no-bulk', action='store_true',
+            help='responde ``get_articles`` como chamada desconhecida')
+    args = parser.parse_args()
+
+    handler = ArticleMetaHandler(Corpus(args.documents, args.journals),
+            latency=args.latency / 1000, bulk=not args.no_bulk)
+    server = make_server(THRIFT.ArticleMeta, handler, args.host, args.port)
+    print('serving ArticleMeta stub at %s:%s' % (args.host, args.port))
+    server.serve()
+
+
+if __name__ == '__main__':
+    main()
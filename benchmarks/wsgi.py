@@ -0,0 +1,13 @@
+"""Aplicação WSGI de ``oaipmh.main``, configurada apenas por variáveis de
+ambiente, e.g. ``OAIPMH_ARTICLEMETA_DOMAIN``. É executada pelo gunicorn em
+``benchmarks.load``.
+
+Uso::
+
+    OAIPMH_ARTICLEMETA_DOMAIN=127.0.0.1:11621 \\
+        gunicorn benchmarks.wsgi:application
+"""
+import oaipmh
+
+
+application = oaipmh.main({})
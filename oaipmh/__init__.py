@@ -1,7 +1,9 @@
 import os
+import threading
+import functools
 
 from pyramid.config import Configurator
-from pyramid.events import NewRequest
+from pyramid.settings import asbool
 
 from oaipmh import (
         repository,
@@ -10,6 +12,8 @@ from oaipmh import (
         utils,
         articlemeta,
         entities,
+        cache,
+        sqlitestore,
         )
 from oaipmh.formatters import (
         oai_dc,
@@ -58,6 +62,50 @@ DEFAULT_SETTINGS = [
             'scl'),
         ('oaipmh.listslen', 'OAIPMH_LISTSLEN', int,
             20),
+        ('oaipmh.articlemeta.domain', 'OAIPMH_ARTICLEMETA_DOMAIN', str, ''),
+        ('oaipmh.articlemeta.fetchworkers', 'OAIPMH_ARTICLEMETA_FETCHWORKERS',
+            int, 8),
+        ('oaipmh.articlemeta.fetchtimeout', 'OAIPMH_ARTICLEMETA_FETCHTIMEOUT',
+            float, 10),
+        ('oaipmh.articlemeta.poolsize', 'OAIPMH_ARTICLEMETA_POOLSIZE',
+            int, 10),
+        ('oaipmh.articlemeta.poolidletimeout',
+            'OAIPMH_ARTICLEMETA_POOLIDLETIMEOUT', float, 30),
+        ('oaipmh.sqlite.path', 'OAIPMH_SQLITE_PATH', str, ''),
+        ('oaipmh.cache.records.maxsize', 'OAIPMH_CACHE_RECORDS_MAXSIZE',
+            int, 10000),
+        ('oaipmh.cache.records.ttl', 'OAIPMH_CACHE_RECORDS_TTL',
+            float, 3600),
+        ('oaipmh.cache.records.revalidate', 'OAIPMH_CACHE_RECORDS_REVALIDATE',
+            asbool, False),
+        ('oaipmh.cache.fragments.maxsize', 'OAIPMH_CACHE_FRAGMENTS_MAXSIZE',
+            int, 10000),
+        ('oaipmh.cache.fragments.ttl', 'OAIPMH_CACHE_FRAGMENTS_TTL',
+            float, 86400),
+        ('oaipmh.cache.sets.maxsize', 'OAIPMH_CACHE_SETS_MAXSIZE',
+            int, 1000),
+        ('oaipmh.cache.sets.ttl', 'OAIPMH_CACHE_SETS_TTL',
+            float, 600),
+        ('oaipmh.cache.setviews.maxsize', 'OAIPMH_CACHE_SETVIEWS_MAXSIZE',
+            int, 1000),
+        ('oaipmh.cache.setviews.ttl', 'OAIPMH_CACHE_SETVIEWS_TTL',
+            float, 3600),
+        ('oaipmh.cache.missingsets.maxsize',
+            'OAIPMH_CACHE_MISSINGSETS_MAXSIZE', int, 1000),
+        ('oaipmh.cache.missingsets.ttl', 'OAIPMH_CACHE_MISSINGSETS_TTL',
+            float, 300),
+        ('oaipmh.cache.journals.maxsize', 'OAIPMH_CACHE_JOURNALS_MAXSIZE',
+            int, 1000),
+        ('oaipmh.cache.journals.ttl', 'OAIPMH_CACHE_JOURNALS_TTL',
+            float, 3600),
+        ('oaipmh.sets.refreshinterval', 'OAIPMH_SETS_REFRESHINTERVAL',
+            float, 3600),
+        ('oaipmh.keysetpaging', 'OAIPMH_KEYSETPAGING', asbool, False),
+        # com streaming, falhas do datastore no decorrer de uma página
+        # interrompem uma resposta 200 já iniciada, em vez de produzirem um
+        # erro OAI-PMH.
+        ('oaipmh.streaming', 'OAIPMH_STREAMING', asbool, False),
+        ('oaipmh.timing', 'OAIPMH_TIMING', asbool, False),
         ]
 
 
@@ -80,8 +128,30 @@ def parse_settings(settings):
 
 
 def get_datastore(settings):
-    client = articlemeta.get_articlemeta_client(settings['oaipmh.collection'])
-    return articlemeta.ArticleMeta(client)
+    if settings['oaipmh.sqlite.path']:
+        return sqlitestore.SQLite(settings['oaipmh.sqlite.path'])
+
+    client = articlemeta.get_articlemeta_client(settings['oaipmh.collection'],
+            domain=settings['oaipmh.articlemeta.domain'] or None,
+            fetch_workers=settings['oaipmh.articlemeta.fetchworkers'],
+            fetch_timeout=settings['oaipmh.articlemeta.fetchtimeout'],
+            pool_size=settings['oaipmh.articlemeta.poolsize'],
+            pool_idle_timeout=settings['oaipmh.articlemeta.poolidletimeout'])
+
+    if settings['oaipmh.cache.records.maxsize'] > 0:
+        resource_cache = cache.TTLCache(
+                settings['oaipmh.cache.records.maxsize'],
+                ttl=settings['oaipmh.cache.records.ttl'])
+    else:
+        resource_cache = None
+
+    journals = articlemeta.JournalMetadataCache(
+            settings['oaipmh.cache.journals.maxsize'],
+            ttl=settings['oaipmh.cache.journals.ttl'])
+
+    return articlemeta.ArticleMeta(client, resource_cache=resource_cache,
+            revalidate=settings['oaipmh.cache.records.revalidate'],
+            journals=journals)
 
 
 def get_repository_meta(settings):
@@ -96,17 +166,83 @@ def get_repository_meta(settings):
     return repometa
 
 
-def add_oai_repository(event):
-    settings = event.request.registry.settings
+def get_repository(settings):
+    """Produz uma instância de ``repository.Repository`` configurada com os
+    formatos de metadados e sets suportados pela app.
+    """
     ds = get_datastore(settings)
 
-    event.request.repository = repository.Repository(
-            settings['repository_meta'], ds, sets.SetsRegistry(ds, STATIC_SETS),
-            settings['oaipmh.listslen'])
+    if settings['oaipmh.cache.fragments.maxsize'] > 0:
+        records_cache = cache.TTLCache(
+                settings['oaipmh.cache.fragments.maxsize'],
+                ttl=settings['oaipmh.cache.fragments.ttl'])
+    else:
+        records_cache = None
+
+    if settings['oaipmh.cache.sets.maxsize'] > 0:
+        sets_cache = cache.TTLCache(settings['oaipmh.cache.sets.maxsize'],
+                ttl=settings['oaipmh.cache.sets.ttl'])
+    else:
+        sets_cache = None
+
+    if settings['oaipmh.sets.refreshinterval'] > 0:
+        catalogue = sets.JournalCatalogue(ds,
+                settings['oaipmh.sets.refreshinterval'])
+        catalogue.start()
+    else:
+        catalogue = None
+
+    if settings['oaipmh.cache.setviews.maxsize'] > 0:
+        views_cache = cache.TTLCache(settings['oaipmh.cache.setviews.maxsize'],
+                ttl=settings['oaipmh.cache.setviews.ttl'])
+    else:
+        views_cache = None
+
+    if settings['oaipmh.cache.missingsets.maxsize'] > 0:
+        missing_cache = cache.TTLCache(
+                settings['oaipmh.cache.missingsets.maxsize'],
+                ttl=settings['oaipmh.cache.missingsets.ttl'])
+    else:
+        missing_cache = None
+
+    setsreg = sets.SetsRegistry(ds, STATIC_SETS, catalogue=catalogue,
+            views_cache=views_cache, missing_cache=missing_cache)
+
+    repo = repository.Repository(settings['repository_meta'], ds, setsreg,
+            settings['oaipmh.listslen'], records_cache=records_cache,
+            keyset_paging=settings['oaipmh.keysetpaging'],
+            streaming=settings['oaipmh.streaming'], sets_cache=sets_cache)
 
     for metadata, formatter, augmenter in METADATA_FORMATS:
-        event.request.repository.add_metadataformat(metadata, formatter,
-                augmenter)
+        repo.add_metadataformat(metadata, formatter, augmenter)
+
+    return repo
+
+
+class RepositoryProvider:
+    """Mantém uma única instância de ``repository.Repository`` por processo.
+
+    A instância é produzida no primeiro acesso e compartilhada por todas as
+    threads do processo. Se o processo for bifurcado após a produção da
+    instância, e.g. workers do gunicorn com ``preload = true``, uma nova
+    instância é produzida no processo filho.
+
+    :param factory: função sem argumentos que produz o repositório.
+    """
+    def __init__(self, factory):
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._instance = None
+        self._pid = None
+
+    def get(self):
+        pid = os.getpid()
+        if self._instance is None or self._pid != pid:
+            with self._lock:
+                if self._instance is None or self._pid != pid:
+                    self._instance = self.factory()
+                    self._pid = pid
+        return self._instance
 
 
 def main(global_config, **settings):
@@ -117,7 +253,10 @@ def main(global_config, **settings):
     config.registry.settings['repository_meta'] = get_repository_meta(
             config.registry.settings)
 
-    config.add_subscriber(add_oai_repository, NewRequest)
+    provider = RepositoryProvider(functools.partial(get_repository,
+            config.registry.settings))
+    config.add_request_method(lambda request: provider.get(), 'repository',
+            reify=True)
 
     # URL patterns
     config.add_route('root', '/')
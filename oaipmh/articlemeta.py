@@ -2,12 +2,26 @@ from collections import namedtuple
 import datetime
 import functools
 import json
+import logging
+import threading
+from concurrent import futures
 
 from articlemeta import client as articlemeta_client
+from thriftpy.rpc import make_client
+from thriftpy.thrift import TApplicationException
+from xylose.scielodocument import Article
 
-from . import utils
-from .datastores import DataStore
-from .entities import Resource
+from . import utils, cache
+from .thriftpool import ConnectionPool
+from .datastores import (
+        DataStore,
+        DoesNotExistError,
+        identityview,
+        )
+from .entities import Resource, Header, LazyResource
+
+
+LOGGER = logging.getLogger(__name__)
 
 
 Journal = namedtuple('Journal', '''title lead_issn''')
@@ -16,7 +30,83 @@ Journal = namedtuple('Journal', '''title lead_issn''')
 class SliceableResultSetThriftClient(articlemeta_client.ThriftClient):
     """Altera o comportamento do método ``documents`` para que seja possível
     controlar os argumentos ``limit`` e ``offset`` na consulta ao backend.
+
+    Sempre que possível, os documentos de uma página são obtidos em uma única
+    chamada a ``get_articles``. Caso o backend não a implemente, os
+    documentos passam a ser obtidos um a um, por meio de ``document``,
+    concorrentemente em até ``fetch_workers`` threads.
+
+    :param bulk: (opcional) se a obtenção em lote deve ser tentada.
+    :param fetch_workers: (opcional) quantidade máxima de documentos obtidos
+    concorrentemente quando não é possível obtê-los em lote. O valor ``1``
+    faz com que sejam obtidos sequencialmente.
+    :param fetch_timeout: (opcional) tempo máximo, em segundos, de espera
+    por cada documento obtido concorrentemente.
+    :param pool_size: (opcional) quantidade máxima de conexões persistentes
+    com o backend. O valor ``0`` faz com que cada chamada abra e feche a sua
+    própria conexão.
+    :param pool_idle_timeout: (opcional) segundos após os quais uma conexão
+    ociosa é encerrada.
     """
+    def __init__(self, *args, bulk=True, fetch_workers=1, fetch_timeout=None,
+            pool_size=0, pool_idle_timeout=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bulk = bulk
+        self.fetch_workers = fetch_workers
+        self.fetch_timeout = fetch_timeout
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+        if pool_size > 0:
+            thrift = self.ARTICLEMETA_THRIFT
+            self.pool = ConnectionPool(self._connect, maxsize=pool_size,
+                    idle_timeout=pool_idle_timeout,
+                    wait_timeout=fetch_timeout,
+                    reusable_errors=(TApplicationException, thrift.ServerError,
+                                     thrift.ValueError, thrift.Unauthorized))
+        else:
+            self.pool = None
+
+    def _connect(self):
+        return make_client(self.ARTICLEMETA_THRIFT.ArticleMeta, self._address,
+                self._port)
+
+    def client_context(self):
+        """Obtém uma conexão do pool, caso exista.
+        """
+        if self.pool is None:
+            return super().client_context()
+        return self.pool.connection()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = futures.ThreadPoolExecutor(
+                            max_workers=self.fetch_workers,
+                            thread_name_prefix='articlemeta-fetch')
+        return self._executor
+
+    def __fetch_concurrently(self, identifiers, fetch):
+        """Obtém os documentos ou periódicos identificados por ``identifiers``
+        de maneira concorrente, preservando a ordem dos identificadores.
+        """
+        executor = self._get_executor()
+        pending = [(identifier, executor.submit(fetch, identifier.code,
+                                                identifier.collection))
+                   for identifier in identifiers]
+        try:
+            for identifier, future in pending:
+                try:
+                    yield future.result(timeout=self.fetch_timeout)
+                except futures.TimeoutError:
+                    msg = 'Timeout retrieving: %s_%s' % (
+                            identifier.collection, identifier.code)
+                    raise articlemeta_client.ServerError(msg) from None
+        finally:
+            for _, future in pending:
+                future.cancel()
+
     def __documents_ids(self, collection=None, issn=None, from_date=None,
             until_date=None, extra_filter=None, limit=None, offset=None):
         limit = limit or articlemeta_client.LIMIT
@@ -42,24 +132,65 @@ class SliceableResultSetThriftClient(articlemeta_client.ThriftClient):
             yield identifier
 
 
+    def __documents_bulk(self, collection=None, issn=None, from_date=None,
+            until_date=None, extra_filter=None, limit=None, offset=None,
+            body=False):
+        limit = limit or articlemeta_client.LIMIT
+        offset = offset or 0
+        from_date = from_date or articlemeta_client.DEFAULT_FROM_DATE
+        until_date = until_date or datetime.datetime.today().isoformat()[:10]
+
+        try:
+            with self.client_context() as client:
+                articles = client.get_articles(
+                    collection=collection, issn=issn,
+                    from_date=from_date, until_date=until_date,
+                    limit=limit, offset=offset,
+                    extra_filter=extra_filter,
+                    replace_journal_metadata=False, body=body)
+        except self.ARTICLEMETA_THRIFT.ServerError:
+            msg = 'Error retrieving list of articles: %s_%s' % (collection, issn)
+            raise articlemeta_client.ServerError(msg)
+
+        if not articles:
+            return []
+
+        return [Article(article)
+                for article in json.loads(articles).get('objects', [])]
+
     def documents(self, collection=None, issn=None, from_date=None,
                   until_date=None, fmt='xylose', body=False, extra_filter=None,
                   only_identifiers=False, limit=None, offset=None):
+        if self.bulk and fmt == 'xylose' and not only_identifiers:
+            try:
+                documents = self.__documents_bulk(collection=collection,
+                        issn=issn, from_date=from_date, until_date=until_date,
+                        extra_filter=extra_filter, limit=limit, offset=offset,
+                        body=body)
+            except TApplicationException as exc:
+                if exc.type != TApplicationException.UNKNOWN_METHOD:
+                    raise
+                LOGGER.warning('the backend does not implement "get_articles". '
+                        'documents will be retrieved one by one')
+                self.bulk = False
+            else:
+                yield from documents
+                return
+
         identifiers = self.__documents_ids(collection=collection, issn=issn,
                 from_date=from_date, until_date=until_date,
                 extra_filter=extra_filter, limit=limit, offset=offset)
-        for identifier in identifiers:
-            if only_identifiers:
-                yield identifier
-            else:
-                document = self.document(
-                    identifier.code,
-                    identifier.collection,
-                    replace_journal_metadata=False,
-                    fmt=fmt,
-                    body=body
-                )
-                yield document
+        if only_identifiers:
+            yield from identifiers
+            return
+
+        fetch = functools.partial(self.document,
+                replace_journal_metadata=False, fmt=fmt, body=body)
+        if self.fetch_workers > 1:
+            yield from self.__fetch_concurrently(identifiers, fetch)
+        else:
+            for identifier in identifiers:
+                yield fetch(identifier.code, identifier.collection)
 
     def __journals_ids(self, collection=None, issn=None, limit=None,
             offset=None):
@@ -81,19 +212,68 @@ class SliceableResultSetThriftClient(articlemeta_client.ThriftClient):
         for identifier in identifiers:
             yield identifier
 
+    def journal_summary(self, code, collection=None):
+        """Obtém o título e o ISSN do periódico ``code`` sem que seja
+        produzida uma instância de ``xylose.scielodocument.Journal``.
+        Retorna ``None`` caso não exista.
+        """
+        try:
+            with self.client_context() as client:
+                journal = client.get_journal(code, collection)
+        except self.ARTICLEMETA_THRIFT.ServerError:
+            msg = 'Error retrieving journal: %s_%s' % (collection, code)
+            raise articlemeta_client.ServerError(msg)
+
+        if not journal:
+            return None
+
+        return journal_summary_from_json(json.loads(journal))
+
     def journals(self, collection=None, issn=None, only_identifiers=False,
-            limit=None, offset=None):
-        identifiers = self.__journals_ids(collection=collection, issn=issn,
-                limit=limit, offset=offset)
-        for identifier in identifiers:
-            if only_identifiers:
-                yield identifier
-            else:
-                journal = self.journal(
-                    identifier.code,
-                    identifier.collection,
-                )
-                yield journal
+            limit=None, offset=None, summary=False):
+        """Obtém os periódicos da coleção, concorrentemente em até
+        ``fetch_workers`` threads.
+
+        Produz ``None`` no lugar de cada periódico que não pôde ser obtido,
+        de maneira que a quantidade de itens produzidos seja sempre a de
+        identificadores da página. Os chamadores devem basear a paginação
+        nessa quantidade e desprezar os ``None``.
+
+        :param summary: (opcional) se apenas título e ISSN devem ser obtidos,
+        na forma de instâncias de ``Journal``.
+        """
+        identifiers = list(self.__journals_ids(collection=collection,
+                issn=issn, limit=limit, offset=offset))
+        if only_identifiers:
+            yield from identifiers
+            return
+
+        fetch = self.journal_summary if summary else self.journal
+        if self.fetch_workers > 1:
+            journals = self.__fetch_concurrently(identifiers, fetch)
+        else:
+            journals = (fetch(identifier.code, identifier.collection)
+                        for identifier in identifiers)
+
+        for identifier, journal in zip(identifiers, journals):
+            if journal is None:
+                LOGGER.warning('could not retrieve journal: %s_%s',
+                        identifier.collection, identifier.code)
+            yield journal
+
+
+def keyset_filter(after, extra_filter=None):
+    """Acrescenta ao filtro ``extra_filter``, codificado em JSON, a condição
+    para que apenas documentos cuja chave ``(processing_date, code)`` suceda
+    ``after`` sejam retornados.
+    """
+    processing_date, code = after
+    term = json.loads(extra_filter) if extra_filter else {}
+    term['$or'] = [
+            {'processing_date': {'$gt': processing_date}},
+            {'processing_date': processing_date, 'code': {'$gt': code}},
+            ]
+    return json.dumps(term)
 
 
 class BoundArticleMetaClient:
@@ -107,16 +287,52 @@ class BoundArticleMetaClient:
     def document(self, code):
         return self.client.document(code, self.collection)
 
+    def processing_date(self, code):
+        """Obtém a data de processamento do documento ``code`` sem que o
+        documento seja recuperado. Retorna ``None`` caso não exista.
+        """
+        identifiers = self.client.documents(collection=self.collection,
+                extra_filter=json.dumps({'code': code}), limit=1,
+                only_identifiers=True)
+        for identifier in identifiers:
+            return identifier.processing_date
+        return None
+
     def documents(self, issn=None, from_date=None, until_date=None,
-            offset=0, limit=1000, extra_filter=None):
+            offset=0, limit=1000, extra_filter=None, after=None):
+        """Obtém os documentos da coleção.
+
+        :param after: (opcional) tupla ``(processing_date, code)``. Restringe
+        o resultado aos documentos que a sucedem estritamente, o que
+        pressupõe que o ArticleMeta os ordene por ``processing_date`` e
+        ``code``.
+        """
+        if after is not None:
+            extra_filter = keyset_filter(after, extra_filter)
+            from_date = max(filter(None, [from_date, after[0]]))
+
         return self.client.documents(collection=self.collection, issn=issn,
                 from_date=from_date, until_date=until_date, offset=offset,
                 limit=limit, extra_filter=extra_filter)
 
+    def identifiers(self, from_date=None, until_date=None, offset=0,
+            limit=1000, extra_filter=None, after=None):
+        """Obtém os identificadores dos documentos da coleção. Veja
+        ``documents``.
+        """
+        if after is not None:
+            extra_filter = keyset_filter(after, extra_filter)
+            from_date = max(filter(None, [from_date, after[0]]))
+
+        return self.client.documents(collection=self.collection,
+                from_date=from_date, until_date=until_date, offset=offset,
+                limit=limit, extra_filter=extra_filter, only_identifiers=True)
+
     def journals(self, issn=None, only_identifiers=False, limit=None,
-            offset=None):
+            offset=None, summary=False):
         return self.client.journals(collection=self.collection, issn=issn,
-                only_identifiers=only_identifiers, offset=offset, limit=limit)
+                only_identifiers=only_identifiers, offset=offset, limit=limit,
+                summary=summary)
 
     def journal(self, code):
         return self.client.journal(code, self.collection)
@@ -132,8 +348,26 @@ def get_articlemeta_client(collection, **kwargs):
 
 
 class ArticleResourceFacade:
-    def __init__(self, article):
+    """Produz ``Resource`` à partir de ``xylose.scielodocument.Article``.
+
+    Cada atributo de ``Resource`` é produzido pelo método homônimo. Os
+    acessores de ``article`` utilizados por mais de um atributo são
+    memorizados.
+
+    :param journals: (opcional) instância de ``JournalMetadataCache``, da
+    qual são obtidos os metadados do periódico, comuns aos documentos de um
+    mesmo periódico.
+    """
+    def __init__(self, article, journals=None):
         self.article = article
+        self.journals = journals
+        self._original_language = None
+        self._journal = None
+
+    def original_language(self):
+        if self._original_language is None:
+            self._original_language = self.article.original_language()
+        return self._original_language
 
     def ridentifier(self):
         return self.article.publisher_id
@@ -141,14 +375,22 @@ class ArticleResourceFacade:
     def datestamp(self):
         return utils.parse_date(self.article.processing_date)
 
+    def journal(self):
+        """Instância de ``JournalMetadata`` do periódico do documento.
+        """
+        if self._journal is None:
+            if self.journals is None:
+                self._journal = journal_metadata(self.article.journal)
+            else:
+                self._journal = self.journals.article_journal(self.article)
+        return self._journal
+
     def setspec(self):
-        return [issn for issn in [getattr(self.article, attr)
-                  for attr in ['electronic_issn', 'print_issn']]
-                if issn]
+        return list(self.journal().issns)
 
     def title(self):
         art = self.article
-        titles = [(art.original_language(), art.original_title())]
+        titles = [(self.original_language(), art.original_title())]
 
         translated_titles = art.translated_titles()
         if translated_titles:
@@ -176,7 +418,7 @@ class ArticleResourceFacade:
 
     def description(self):
         art = self.article
-        abstracts = [(art.original_language(), art.original_abstract())]
+        abstracts = [(self.original_language(), art.original_abstract())]
 
         translated_abstracts = art.translated_abstracts()
         if translated_abstracts:
@@ -185,7 +427,7 @@ class ArticleResourceFacade:
         return abstracts
 
     def publisher(self):
-        return self.article.journal.publisher_name
+        return self.journal().publisher
 
     def contributor(self):
         return []
@@ -211,7 +453,7 @@ class ArticleResourceFacade:
         return [self.article.bibliographic_legends().get('descriptive_format')]
 
     def language(self):
-        lang = self.article.original_language()
+        lang = self.original_language()
         return [lang]
 
     def relation(self):
@@ -240,6 +482,13 @@ class ArticleResourceFacade:
                         relation=self.relation(),
                         rights=self.rights())
 
+    def to_lazy_resource(self):
+        """Versão de ``to_resource`` em que cada atributo é produzido apenas
+        quando acessado, e.g. ``bibliographic_legends`` e ``html_url`` não
+        são consultados para os registros servidos do cache de registros.
+        """
+        return LazyResource(self)
+
 
 def journal_from_articlemeta(journal):
     """Produz uma instância de ``Journal`` com base em ``journal``.
@@ -250,6 +499,16 @@ def journal_from_articlemeta(journal):
                    lead_issn=journal.scielo_issn)
 
 
+def journal_summary_from_json(journal):
+    """Produz uma instância de ``Journal`` com base no periódico ``journal``
+    decodificado do JSON, conforme ``journal_from_articlemeta``.
+    """
+    def first_value(tag):
+        return journal.get(tag, [{'_': None}])[0]['_']
+
+    return Journal(title=first_value('v100'), lead_issn=first_value('v400'))
+
+
 def is_spurious_doc(doc):
     """Instâncias de ``xylose.scielodocument.Article`` são produzidas pelo
     articlemetaapi mesmo para consultas a documentos que não existem.
@@ -276,18 +535,127 @@ class ArticleMetaFilteredView:
         return functools.partial(query_fn, extra_filter=self.term)
 
 
+def issn_from_pid(pid):
+    """ISSN do periódico, conforme o código do documento ``pid``, e.g.
+    ``S0001-37652000000100001``.
+    """
+    return pid[1:10]
+
+
+JournalMetadata = namedtuple('JournalMetadata', 'title publisher issns')
+
+
+def journal_metadata(journal) -> JournalMetadata:
+    """Metadados de ``journal``, instância de
+    ``xylose.scielodocument.Journal``, utilizados por
+    ``ArticleResourceFacade``.
+    """
+    return JournalMetadata(title=journal.title,
+            publisher=journal.publisher_name,
+            issns=tuple(issn for issn in [journal.electronic_issn,
+                                          journal.print_issn]
+                        if issn))
+
+
+MISSING_JOURNAL = JournalMetadata(title=None, publisher=None, issns=())
+
+
+class JournalMetadataCache:
+    """Metadados dos periódicos, indexados por ISSN. São compartilhados entre
+    os documentos, de maneira que em uma página de ListRecords sejam
+    produzidos uma única vez por periódico.
+
+    Os metadados obtidos dos registros de periódicos incluídos nos
+    documentos e os obtidos do cadastro de periódicos são mantidos em
+    namespaces distintos, de maneira que o conteúdo de cada um não dependa
+    da ordem em que as requisições são atendidas.
+
+    Pode ser compartilhado entre threads.
+
+    :param maxsize: (opcional) quantidade máxima de periódicos.
+    :param ttl: (opcional) tempo de vida dos itens, em segundos.
+    """
+    def __init__(self, maxsize=1000, ttl=3600):
+        self.journals = cache.TTLCache(maxsize, ttl=ttl)
+
+    def journal(self, issn, get_journal,
+            namespace='journal') -> JournalMetadata:
+        """Metadados do periódico ``issn``. Na ausência no cache, são
+        produzidos à partir do retorno de ``get_journal``, função sem
+        argumentos que produz ``xylose.scielodocument.Journal`` ou ``None``.
+
+        :param namespace: (opcional) a fonte dos metadados produzidos por
+        ``get_journal``.
+        """
+        key = (namespace, issn)
+        metadata = self.journals.get(key)
+        if metadata is None:
+            journal = get_journal()
+            if journal is None:
+                metadata = MISSING_JOURNAL
+            else:
+                metadata = journal_metadata(journal)
+            self.journals.put(key, metadata)
+        return metadata
+
+    def article_journal(self, article) -> JournalMetadata:
+        """Metadados do periódico de ``article``, conforme o registro do
+        periódico incluído no documento.
+        """
+        return self.journal(issn_from_pid(article.publisher_id),
+                lambda: article.journal, namespace='article')
+
+
 class ArticleMeta(DataStore):
-    def __init__(self, client: BoundArticleMetaClient):
+    """Acesso aos documentos do ArticleMeta.
+
+    :param client: instância de ``BoundArticleMetaClient``.
+    :param resource_cache: (opcional) cache de objetos ``Resource`` indexado
+    por ``ridentifier``, e.g. ``oaipmh.cache.TTLCache``.
+    :param revalidate: (opcional) se a data de processamento de recursos
+    obtidos do cache deve ser confrontada com a do documento no ArticleMeta.
+    :param journals: (opcional) instância de ``JournalMetadataCache``,
+    compartilhada pelos documentos produzidos.
+    """
+    def __init__(self, client: BoundArticleMetaClient, resource_cache=None,
+            revalidate=False, journals=None):
         self.client = client
+        self.resource_cache = resource_cache
+        self.revalidate = revalidate
+        if journals is None:
+            journals = JournalMetadataCache()
+        self.journals = journals
 
     def add(self, resource):
         return NotImplemented
 
+    def _is_fresh(self, resource):
+        processing_date = self.client.processing_date(resource.ridentifier)
+        if processing_date is None:
+            return False
+        return utils.parse_date(processing_date) == resource.datestamp
+
     def get(self, ridentifier):
+        if self.resource_cache is None:
+            return self._get(ridentifier)
+
+        resource = self.resource_cache.get(ridentifier)
+        if resource is not None and self.revalidate and not self._is_fresh(
+                resource):
+            self.resource_cache.invalidate(ridentifier)
+            resource = None
+
+        if resource is None:
+            resource = self._get(ridentifier)
+            self.resource_cache.put(ridentifier, resource)
+
+        return resource
+
+    def _get(self, ridentifier):
         doc = self.client.document(ridentifier)
         if is_spurious_doc(doc):
             raise DoesNotExistError()
-        return ArticleResourceFacade(doc).to_resource()
+        return ArticleResourceFacade(doc, self.journals).to_resource()
 
     def list(self, offset, count, view=None, _from=None, until=None):
         view_fn = view or identityview
@@ -295,9 +663,48 @@ class ArticleMeta(DataStore):
 
         docs = query_fn(offset=offset, limit=count,
                 from_date=_from, until_date=until)
-        return (ArticleResourceFacade(doc).to_resource()
+        return (ArticleResourceFacade(doc, self.journals).to_lazy_resource()
                 for doc in docs)
 
+    def list_after(self, key, count, view=None, _from=None, until=None):
+        view_fn = view or identityview
+        query_fn = view_fn(self.client.documents)
+
+        docs = query_fn(after=key, limit=count, from_date=_from,
+                until_date=until)
+        return (ArticleResourceFacade(doc, self.journals).to_lazy_resource()
+                for doc in docs)
+
+    def list_headers(self, offset, count, view=None, _from=None, until=None):
+        view_fn = view or identityview
+        query_fn = view_fn(self.client.identifiers)
+
+        identifiers = query_fn(offset=offset, limit=count, from_date=_from,
+                until_date=until)
+        return (self._header(identifier) for identifier in identifiers)
+
+    def list_headers_after(self, key, count, view=None, _from=None,
+            until=None):
+        view_fn = view or identityview
+        query_fn = view_fn(self.client.identifiers)
+
+        identifiers = query_fn(after=key, limit=count, from_date=_from,
+                until_date=until)
+        return (self._header(identifier) for identifier in identifiers)
+
+    def _header(self, identifier):
+        return Header(ridentifier=identifier.code,
+                datestamp=utils.parse_date(identifier.processing_date),
+                setspec=self._setspec(identifier.code))
+
+    def _setspec(self, pid):
+        """Os ISSNs do periódico do documento ``pid``, conforme
+        ``ArticleResourceFacade.setspec``, obtidos uma vez por periódico.
+        """
+        issn = issn_from_pid(pid)
+        return list(self.journals.journal(issn,
+                lambda: self.client.journal(issn)).issns)
+
     def get_journal(self, issn):
         journal = self.client.journal(issn)
         if journal is None:
@@ -305,6 +712,9 @@ class ArticleMeta(DataStore):
         return journal_from_articlemeta(journal)
 
     def list_journals(self, offset=0, count=1000):
-        journals = self.client.journals(offset=offset, limit=count)
-        return (journal_from_articlemeta(j) for j in journals)
+        """Produz ``count`` itens à partir de ``offset``, sendo ``None``
+        aqueles cujos periódicos não puderam ser obtidos. Veja
+        ``SliceableResultSetThriftClient.journals``.
+        """
+        return self.client.journals(offset=offset, limit=count, summary=True)
 
@@ -0,0 +1,100 @@
+"""Caches em memória, limitados em quantidade de itens e em tempo de vida.
+"""
+import collections
+import threading
+import time
+
+
+CacheStats = collections.namedtuple('CacheStats', '''maxsize size hits misses
+        evictions''')
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Cache LRU com no máximo ``maxsize`` itens, cada qual válido por ``ttl``
+    segundos após a sua inclusão.
+
+    Pode ser compartilhado entre threads.
+
+    :param maxsize: quantidade máxima de itens. Ao ser atingida, o item
+    utilizado há mais tempo é descartado.
+    :param ttl: (opcional) tempo de vida dos itens, em segundos. ``None``
+    faz com que os itens sejam mantidos até que sejam descartados por falta
+    de espaço.
+    """
+    def __init__(self, maxsize, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key, default=None):
+        """Obtém o valor associado a ``key`` ou ``default``, caso o item não
+        exista ou tenha expirado.
+        """
+        with self._lock:
+            value, expires = self._data.get(key, (_MISSING, None))
+            if value is _MISSING:
+                self._misses += 1
+                return default
+
+            if expires is not None and expires <= self.clock():
+                del self._data[key]
+                self._evictions += 1
+                self._misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return CacheStats(maxsize=self.maxsize, size=len(self._data),
+                    hits=self._hits, misses=self._misses,
+                    evictions=self._evictions)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CacheNamespace:
+    """Visão de ``cache`` em que as chaves são qualificadas por ``namespace``,
+    de maneira que um mesmo cache possa ser compartilhado por diferentes
+    usuários sem que haja colisão de chaves.
+    """
+    def __init__(self, cache, namespace):
+        self.cache = cache
+        self.namespace = namespace
+
+    def get(self, key, default=None):
+        return self.cache.get((self.namespace, key), default)
+
+    def put(self, key, value):
+        self.cache.put((self.namespace, key), value)
+
+    def invalidate(self, key):
+        self.cache.invalidate((self.namespace, key))
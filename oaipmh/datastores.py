@@ -1,11 +1,18 @@
 import abc
+import bisect
+import datetime
+import functools
+import itertools
+import json
+import weakref
 from typing import (
         Iterable,
         Callable,
         Dict,
+        Tuple,
         )
 
-from .entities import Resource
+from .entities import Resource, Header
 
 
 class DoesNotExistError(Exception):
@@ -50,20 +57,224 @@ class DataStore(metaclass=abc.ABCMeta):
         do resultado da consulta.
         :param view: (opcional) função de ordem superior para a filtragem de 
         registros. caso não informada, a consulta se dará sob todos os registros.
+        :param _from: (opcional) datestamp mínimo dos registros.
+        :param until: (opcional) datestamp máximo dos registros, inclusive,
+        conforme o OAI-PMH.
         """
         return NotImplemented
 
+    @abc.abstractmethod
+    def list_after(self, key: Tuple[str, str], count: int,
+            view: Callable=None, _from: str=None,
+            until: str=None) -> Iterable[Resource]:
+        """Produz uma coleção de até ``count`` objetos ``Resource``,
+        ordenados por ``(datestamp, ridentifier)``, cujas chaves sucedem
+        ``key`` estritamente.
+
+        Diferentemente de ``list``, o custo da consulta independe da
+        posição de ``key`` no resultado, e a inclusão ou alteração de
+        registros durante a paginação não desloca os registros entre as
+        páginas.
+        :param key: tupla ``(datestamp, ridentifier)``, conforme produzida
+        por ``resource_key``, do último registro da página anterior. ``None``
+        para a primeira página.
+        """
+        return NotImplemented
+
+    def list_headers(self, offset: int, count: int, view: Callable=None,
+            _from: str=None, until: str=None) -> Iterable[Header]:
+        """Versão de ``list`` que produz apenas os atributos de ``Header``.
+        Implementações podem evitar a obtenção dos demais atributos.
+        """
+        resources = self.list(offset, count, view=view, _from=_from,
+                until=until)
+        return (to_header(resource) for resource in resources)
+
+    def list_headers_after(self, key: Tuple[str, str], count: int,
+            view: Callable=None, _from: str=None,
+            until: str=None) -> Iterable[Header]:
+        """Versão de ``list_after`` que produz apenas os atributos de
+        ``Header``.
+        """
+        resources = self.list_after(key, count, view=view, _from=_from,
+                until=until)
+        return (to_header(resource) for resource in resources)
+
+
+def to_header(resource: Resource) -> Header:
+    return Header(ridentifier=resource.ridentifier,
+            datestamp=resource.datestamp, setspec=resource.setspec)
+
+
+def datestamp_to_str(datestamp):
+    """Normaliza ``datestamp`` no formato ``YYYY-MM-DD``.
+    """
+    try:
+        return datestamp.strftime('%Y-%m-%d')
+    except AttributeError:
+        return '%04d-%02d-%02d' % datestamp_to_tuple(datestamp[:10])
+
+
+def day_after(datestamp):
+    """O dia seguinte a ``datestamp``, no formato ``YYYY-MM-DD``.
+    """
+    day = datetime.date(*datestamp_to_tuple(datestamp_to_str(datestamp)))
+    return (day + datetime.timedelta(days=1)).isoformat()
+
+
+def resource_key(resource: Resource) -> Tuple[str, str]:
+    """Chave de ordenação ``(datestamp, ridentifier)`` de ``resource``.
+    """
+    return (datestamp_to_str(resource.datestamp), resource.ridentifier)
+
+
+def setspec_from_filter(extra_filter):
+    """Obtém o ``setspec`` do termo ``code_title`` de ``extra_filter``,
+    codificado em JSON, conforme produzido por
+    ``oaipmh.articlemeta.ArticleMetaFilteredView``.
+
+    Levanta ``ValueError`` caso ``extra_filter`` contenha outros termos, que
+    não podem ser respondidos pelos índices das fontes de dados locais.
+    """
+    if not extra_filter:
+        return None
+
+    term = json.loads(extra_filter)
+    unsupported = sorted(set(term) - {'code_title'})
+    if unsupported:
+        raise ValueError('unsupported filter terms: %s'
+                % ', '.join(unsupported))
+    return term.get('code_title')
+
 
 def datestamp_to_tuple(datestamp):
     return tuple(map(int, datestamp.split('-')))
 
 
+class KeyIndex:
+    """Lista ordenada de chaves ``(datestamp, ridentifier)``.
+
+    As chaves incluídas são acumuladas e ordenadas apenas na próxima
+    consulta, o que torna barata a carga de muitos registros. A lista é
+    alterada no próprio lugar, exceto enquanto houver instâncias de
+    ``ResourceRange`` que a referenciem: nesse caso ela é copiada antes da
+    alteração, de maneira que essas instâncias não são afetadas.
+    """
+    # acima deste limite, ou de uma chave pendente para cada 1024 chaves
+    # ordenadas, as chaves pendentes são ordenadas em conjunto com as demais,
+    # em vez de inseridas uma a uma.
+    INSORT_THRESHOLD = 64
+
+    def __init__(self):
+        self._keys = []
+        self._pending = set()
+        self._readers = weakref.WeakSet()
+
+    def __len__(self):
+        return len(self._keys) + len(self._pending)
+
+    def add(self, key):
+        self._pending.add(key)
+
+    def discard(self, key):
+        if key in self._pending:
+            self._pending.discard(key)
+            return
+
+        keys = self._keys
+        i = bisect.bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del self._writable_keys()[i]
+
+    def _writable_keys(self):
+        """A lista ordenada, copiada caso esteja sendo lida.
+        """
+        if self._readers:
+            self._keys = list(self._keys)
+            self._readers = weakref.WeakSet()
+        return self._keys
+
+    def keys(self):
+        pending = self._pending
+        if pending:
+            self._pending = set()
+            if len(pending) <= max(self.INSORT_THRESHOLD,
+                                   len(self._keys) >> 10):
+                keys = self._writable_keys()
+                for key in pending:
+                    bisect.insort(keys, key)
+            else:
+                self._keys = sorted(itertools.chain(self._keys, pending))
+                self._readers = weakref.WeakSet()
+        return self._keys
+
+    def range(self, data, start, stop):
+        """``ResourceRange`` sobre o intervalo ``[start, stop)`` de ``keys``.
+        """
+        return ResourceRange(data, self.keys(), start, stop, self)
+
+
+class ResourceRange:
+    """Os recursos de ``data`` cujas chaves ocupam o intervalo
+    ``[start, stop)`` de ``keys``.
+
+    É produzido pelas consultas a ``InMemory`` e permite que ``offset`` seja
+    aplicado sem que os registros desprezados sejam percorridos.
+    :param index: (opcional) instância de ``KeyIndex`` da qual ``keys`` foi
+    obtida, e que não deve alterá-la enquanto a instância existir.
+    """
+    def __init__(self, data, keys, start, stop, index=None):
+        self.data = data
+        self.keys = keys
+        self.start = start
+        self.stop = stop
+        self.index = index
+        if index is not None:
+            index._readers.add(self)
+
+    def __iter__(self):
+        data, keys = self.data, self.keys
+        return (data[keys[i][1]] for i in range(self.start, self.stop))
+
+    def slice(self, offset, count):
+        start = min(self.start + offset, self.stop)
+        return ResourceRange(self.data, self.keys, start,
+                min(start + count, self.stop), self.index)
+
+
 class InMemory(DataStore):
+    """Mantém os recursos em memória, indexados por ``(datestamp,
+    ridentifier)`` e por ``setspec``.
+
+    Views produzidas por ``oaipmh.articlemeta.ArticleMetaFilteredView`` com
+    o termo ``code_title`` são respondidas pelo índice do ``setspec``
+    correspondente. Demais termos levantam ``ValueError``.
+    """
     def __init__(self):
         self.data = {}
+        self._index = KeyIndex()
+        self._postings = {}
 
     def add(self, resource):
+        previous = self.data.get(resource.ridentifier)
+        if previous is not None:
+            self._unindex(previous)
+
         self.data[resource.ridentifier] = resource
+        key = resource_key(resource)
+        self._index.add(key)
+        for setspec in resource.setspec:
+            postings = self._postings.get(setspec)
+            if postings is None:
+                postings = self._postings[setspec] = KeyIndex()
+            postings.add(key)
+
+    def _unindex(self, resource):
+        key = resource_key(resource)
+        self._index.discard(key)
+        for setspec in resource.setspec:
+            if setspec in self._postings:
+                self._postings[setspec].discard(key)
 
     def get(self, ridentifier):
         try:
@@ -71,18 +282,40 @@ class InMemory(DataStore):
         except KeyError:
             raise DoesNotExistError() from None
 
-    def list(self, offset, count, view=None, _from=None, until=None):
-        ds2tup = datestamp_to_tuple
-        view_fn = view or identityview
-        query_fn = view_fn(self.data.values)
+    def _select(self, extra_filter=None, _from=None, until=None, after=None):
+        index = self._index
+        setspec = setspec_from_filter(extra_filter)
+        if setspec:
+            index = self._postings.get(setspec, KeyIndex())
 
-        ds = query_fn()
+        keys = index.keys()
+        start, stop = 0, len(keys)
+        if after is not None:
+            start = bisect.bisect_right(keys, tuple(after))
         if _from:
-            ds = (res for res in ds if ds2tup(res.datestamp) >= ds2tup(_from))
+            start = max(start,
+                    bisect.bisect_left(keys, (datestamp_to_str(_from),)))
         if until:
-            ds = (res for res in ds if ds2tup(res.datestamp) < ds2tup(until))
+            # ``until`` é inclusivo, conforme o OAI-PMH.
+            stop = bisect.bisect_left(keys, (day_after(until),))
+        return index.range(self.data, start, max(start, stop))
 
-        ds = (res for i, res in enumerate(ds) if i >= offset)
-        ds = (res for i, res in enumerate(ds) if i < count)
-        yield from ds
+    def _query(self, view=None, _from=None, until=None, after=None):
+        view_fn = view or identityview
+        query_fn = view_fn(functools.partial(self._select, _from=_from,
+                until=until, after=after))
+        return query_fn()
+
+    def list(self, offset, count, view=None, _from=None, until=None):
+        ds = self._query(view=view, _from=_from, until=until)
+        if isinstance(ds, ResourceRange):
+            yield from ds.slice(offset, count)
+        else:
+            yield from itertools.islice(ds, offset, offset + count)
 
+    def list_after(self, key, count, view=None, _from=None, until=None):
+        ds = self._query(view=view, _from=_from, until=until, after=key)
+        if isinstance(ds, ResourceRange):
+            yield from ds.slice(0, count)
+        else:
+            yield from itertools.islice(ds, count)
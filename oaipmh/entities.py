@@ -1,4 +1,7 @@
 from collections import namedtuple
+from collections.abc import Mapping
+
+from . import timing
 
 
 RepositoryMeta = namedtuple('RepositoryMeta', '''repositoryName baseURL
@@ -52,5 +55,98 @@ Resource = namedtuple('Resource', '''ridentifier datestamp setspec title
         identifier source language relation rights''')
 
 
+_RESOURCE_FIELDS = frozenset(Resource._fields)
+
+
+class LazyResource:
+    """Representação de ``Resource`` cujos atributos são obtidos de ``source``
+    apenas quando acessados pela primeira vez, e então memorizados.
+
+    ``source`` deve implementar um método sem argumentos para cada atributo
+    de ``Resource``, e.g. ``oaipmh.articlemeta.ArticleResourceFacade``. As
+    operações de namedtuple utilizadas pela aplicação são suportadas, e
+    ``_asdict`` produz um mapeamento igualmente preguiçoso.
+    """
+    __slots__ = ('_source', '_values')
+
+    _fields = Resource._fields
+
+    def __init__(self, source, **values):
+        self._source = source
+        self._values = values
+
+    def __getattr__(self, name):
+        if name not in _RESOURCE_FIELDS:
+            raise AttributeError(name)
+        try:
+            return self._values[name]
+        except KeyError:
+            value = self._values[name] = timing.call('facade',
+                    getattr(self._source, name))
+            return value
+
+    def __iter__(self):
+        return (getattr(self, field) for field in self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self)[index]
+        return getattr(self, self._fields[index])
+
+    def __eq__(self, other):
+        if isinstance(other, (tuple, LazyResource)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'LazyResource(%s)' % ', '.join('%s=%r' % item
+                for item in zip(self._fields, self))
+
+    def _asdict(self):
+        return LazyResourceMapping(self)
+
+    def _replace(self, **values):
+        unknown = set(values) - set(self._fields)
+        if unknown:
+            raise ValueError('Got unexpected field names: %r' %
+                    sorted(unknown))
+        return LazyResource(self._source, **dict(self._values, **values))
+
+    def to_resource(self) -> Resource:
+        return Resource(*self)
+
+
+class LazyResourceMapping(Mapping):
+    """Acesso a ``LazyResource`` como ``dict``, conforme os formatadores de
+    metadados.
+    """
+    __slots__ = ('_resource',)
+
+    def __init__(self, resource: LazyResource):
+        self._resource = resource
+
+    def __getitem__(self, key):
+        if key not in _RESOURCE_FIELDS:
+            raise KeyError(key)
+        return getattr(self._resource, key)
+
+    def __iter__(self):
+        return iter(Resource._fields)
+
+    def __len__(self):
+        return len(Resource._fields)
+
+
+"""
+Projeção de ``Resource`` com apenas os atributos do elemento ``header``.
+"""
+Header = namedtuple('Header', '''ridentifier datestamp setspec''')
+
+
 Set = namedtuple('Set', '''setSpec setName''')
 
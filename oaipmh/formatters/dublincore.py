@@ -0,0 +1,104 @@
+"""Elementos Dublin Core comuns aos formatos ``oai_dc`` e ``oai_dc_openaire``.
+
+Os campos de ``Resource`` são declarados em ``FIELDS``, na ordem em que os
+elementos são produzidos, e compilados por ``compile_metadata_maker`` em uma
+única função que produz o elemento ``metadata``. Os formatos declaram apenas
+o que os difere desta tabela.
+"""
+from collections import namedtuple
+
+from lxml import etree
+
+
+OAIDC = "http://www.openarchives.org/OAI/2.0/oai_dc/"
+DC = "http://purl.org/dc/elements/1.1/"
+XSI = "http://www.w3.org/2001/XMLSchema-instance"
+SCHEMALOCATION = "http://www.openarchives.org/OAI/2.0/oai_dc/"
+SCHEMALOCATION += " http://www.openarchives.org/OAI/2.0/oai_dc.xsd"
+ATTRIB = {"{%s}schemaLocation" % XSI: SCHEMALOCATION}
+NSMAP = {'oai_dc': OAIDC, 'dc': DC, 'xsi': XSI}
+
+
+"""
+Campo de ``Resource`` produzido como elementos ``dc:<name>``, um para cada
+valor, cujo texto é ``tostr(valor)``.
+"""
+Field = namedtuple('Field', 'name tostr')
+
+
+def pair_value(pair):
+    """Valor dos itens de listas associativas, e.g. ``title``.
+    """
+    return pair[1]
+
+
+def format_date(date):
+    return date.strftime('%Y-%m-%d')
+
+
+FIELDS = (
+        Field('title', pair_value),
+        Field('creator', str),
+        Field('contributor', str),
+        Field('description', pair_value),
+        Field('subject', pair_value),
+        Field('publisher', str),
+        Field('date', format_date),
+        Field('type', str),
+        Field('source', str),
+        Field('format', str),
+        Field('identifier', str),
+        Field('rights', str),
+        Field('language', str),
+        )
+
+
+def get_field(name, fields=FIELDS):
+    for field in fields:
+        if field.name == name:
+            return field
+    raise ValueError('unknown field "%s"' % name)
+
+
+def compile_metadata_maker(fields=FIELDS):
+    """Produz a função que, dado o ``dict`` de um recurso, produz o elemento
+    ``metadata`` com os elementos de ``fields``.
+
+    Os nomes qualificados dos elementos são produzidos uma única vez, e os
+    elementos são criados diretamente sob ``oai_dc:dc``.
+    """
+    dc_tag = etree.QName(OAIDC, 'dc')
+    table = tuple((field.name, etree.QName(DC, field.name), field.tostr)
+                  for field in fields)
+    SubElement = etree.SubElement
+
+    def make_metadata(resource):
+        metadata = etree.Element('metadata')
+        oai_rec = SubElement(metadata, dc_tag, nsmap=NSMAP, attrib=ATTRIB)
+
+        get = resource.get
+        for name, tag, tostr in table:
+            for value in get(name, ()):
+                SubElement(oai_rec, tag).text = tostr(value)
+
+        return metadata
+
+    return make_metadata
+
+
+def make_elements_maker(field):
+    """Produz a função que, dado o ``dict`` de um recurso, produz a lista de
+    elementos ``field``, independentes de um elemento pai.
+    """
+    tag = etree.QName(DC, field.name)
+    tostr = field.tostr
+
+    def make_elements(resource):
+        elements = []
+        for value in resource.get(field.name, []):
+            elem = etree.Element(tag)
+            elem.text = tostr(value)
+            elements.append(elem)
+        return elements
+
+    return make_elements
@@ -1,5 +1,8 @@
 import re
+import base64
+import binascii
 import functools
+import itertools
 import operator
 import logging
 from typing import Iterable
@@ -10,21 +13,26 @@ from . import (
         serializers,
         datastores,
         sets,
+        cache,
+        timing,
         )
 from .entities import (
         RepositoryMeta,
         OAIRequest,
         MetadataFormat,
         ResumptionToken,
+        LazyResource,
         )
 
 
 LOGGER = logging.getLogger(__name__)
 
 
+# O offset dos tokens de ListRecords e ListIdentifiers pode ser numérico ou
+# um cursor, conforme ``encode_cursor``.
 RESUMPTION_TOKEN_PATTERNS = {
-        'ListRecords': re.compile(r'^(\w+)?:((\d{4})-(\d{2})-(\d{2}))?:((\d{4})-(\d{2})-(\d{2}))?:\d+:\d+:\w+$'),
-        'ListIdentifiers': re.compile(r'^(\w+)?:((\d{4})-(\d{2})-(\d{2}))?:((\d{4})-(\d{2})-(\d{2}))?:\d+:\d+:$'),
+        'ListRecords': re.compile(r'^(\w+)?:((\d{4})-(\d{2})-(\d{2}))?:((\d{4})-(\d{2})-(\d{2}))?:(\d+|c[\w-]+):\d+:\w+$'),
+        'ListIdentifiers': re.compile(r'^(\w+)?:((\d{4})-(\d{2})-(\d{2}))?:((\d{4})-(\d{2})-(\d{2}))?:(\d+|c[\w-]+):\d+:$'),
         'ListSets': re.compile(r'^:((\d{4})-(\d{2})-(\d{2}))?:((\d{4})-(\d{2})-(\d{2}))?:\d+:\d+:$'),
         }
 
@@ -36,7 +44,12 @@ OAIPMH_LEGAL_ARGS = set(['verb', 'identifier', 'metadataPrefix', 'set',
 def asdict(namedtupl):
     """Produz uma instância de ``dict`` à partir da namedtuple ``namedtupl``.
     Underscores no início ou fim do nome do atributo serão removidos.
+
+    Instâncias de ``LazyResource`` produzem um mapeamento cujos valores são
+    obtidos apenas quando acessados.
     """
+    if isinstance(namedtupl, LazyResource):
+        return namedtupl._asdict()
     return {k.strip('_'):v for k, v in namedtupl._asdict().items()}
 
 
@@ -50,19 +63,22 @@ def serialize_identify(repo: RepositoryMeta, oai_request: OAIRequest) -> bytes:
 
 
 def serialize_get_record(repo: RepositoryMeta, oai_request: OAIRequest,
-        resource: datastores.Resource, *, metadata_formatter) -> bytes:
+        resource: datastores.Resource, *, metadata_formatter,
+        record_cache=None) -> bytes:
     data = {
             'repository': asdict(repo),
             'request': asdict(oai_request),
             'resources': [asdict(resource)],
             }
 
-    return serializers.serialize_get_record(data, metadata_formatter)
+    return serializers.serialize_get_record(data, metadata_formatter,
+            record_cache=record_cache)
 
 
 def serialize_list_records(repo: RepositoryMeta, oai_request: OAIRequest,
         resources: Iterable[datastores.Resource],
-        resumption_token: ResumptionToken, *, metadata_formatter) -> bytes:
+        resumption_token: ResumptionToken, *, metadata_formatter,
+        record_cache=None) -> bytes:
 
     if resumption_token is None:
         encoded_resumption_token = ''
@@ -75,7 +91,43 @@ def serialize_list_records(repo: RepositoryMeta, oai_request: OAIRequest,
             'resources': (asdict(resource) for resource in resources),
             'resumptionToken': encoded_resumption_token,
             }
-    return serializers.serialize_list_records(data, metadata_formatter)
+    return serializers.serialize_list_records(data, metadata_formatter,
+            record_cache=record_cache)
+
+
+def iter_list_records(repo: RepositoryMeta, oai_request: OAIRequest,
+        resources: Iterable[datastores.Resource], get_resumption_token, *,
+        metadata_formatter, record_cache=None) -> Iterable[bytes]:
+    """Versão incremental de ``serialize_list_records``.
+
+    :param get_resumption_token: função sem argumentos que produz o próximo
+    ``ResumptionToken``, ou ``None``, após o consumo de ``resources``.
+    """
+    data = {
+            'repository': asdict(repo),
+            'request': asdict(oai_request),
+            'resources': (asdict(resource) for resource in resources),
+            'resumptionToken': lambda: encode_next_resumption_token(
+                get_resumption_token()),
+            }
+    return serializers.iter_list_records(data, metadata_formatter,
+            record_cache=record_cache)
+
+
+def iter_list_identifiers(repo: RepositoryMeta, oai_request: OAIRequest,
+        resources: Iterable[datastores.Resource],
+        get_resumption_token) -> Iterable[bytes]:
+    """Versão incremental de ``serialize_list_identifiers``. Veja
+    ``iter_list_records``.
+    """
+    data = {
+            'repository': asdict(repo),
+            'request': asdict(oai_request),
+            'resources': (asdict(resource) for resource in resources),
+            'resumptionToken': lambda: encode_next_resumption_token(
+                get_resumption_token()),
+            }
+    return serializers.iter_list_identifiers(data)
 
 
 def serialize_list_identifiers(repo: RepositoryMeta, oai_request: OAIRequest,
@@ -126,6 +178,22 @@ def serialize_list_sets(repo: RepositoryMeta, oai_request: OAIRequest,
     return serializers.serialize_list_sets(data)
 
 
+def make_list_sets_template(sets: Iterable[sets.Set],
+        resumption_token: ResumptionToken):
+    """Template da resposta ListSets, independente de ``responseDate`` e
+    dos argumentos da requisição.
+    """
+    if resumption_token is None:
+        encoded_resumption_token = ''
+    else:
+        encoded_resumption_token = encode_resumption_token(resumption_token)
+
+    return serializers.make_list_sets_template({
+            'sets': [asdict(s) for s in sets],
+            'resumptionToken': encoded_resumption_token,
+            })
+
+
 def serialize_bad_verb(repo: RepositoryMeta, oai_request: OAIRequest) -> bytes:
     data = {
             'repository': asdict(repo),
@@ -288,13 +356,66 @@ def oairequest_from_querystring(parsed_qstr):
             )
 
 
+class StreamedPage:
+    """Página de recursos consumida incrementalmente.
+
+    O primeiro recurso é obtido antecipadamente, de maneira que erros na
+    consulta ao datastore sejam levantados antes do envio da resposta. Dos
+    demais, apenas o último é retido, além da quantidade de itens consumidos,
+    o suficiente para que a página seja tratada como a sequência dos itens
+    consumidos por ``next_resumption_token``.
+    """
+    def __init__(self, resources: Iterable):
+        self._resources = iter(resources)
+        self._first = list(itertools.islice(self._resources, 1))
+        self._count = 0
+        self._last = None
+
+    def __iter__(self):
+        first, self._first = self._first, []
+        for resource in itertools.chain(first, self._resources):
+            self._count += 1
+            self._last = resource
+            yield resource
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index not in (-1, self._count - 1) or self._count == 0:
+            raise IndexError('only the last consumed item is kept')
+        return self._last
+
+
 class Repository:
+    """Repositório OAI-PMH.
+
+    :param records_cache: (opcional) cache dos elementos ``record``
+    serializados, compartilhado entre os formatos de metadados, e.g.
+    ``oaipmh.cache.TTLCache``.
+    :param keyset_paging: (opcional) se as listas de registros devem ser
+    paginadas por meio de cursores, conforme ``DataStore.list_after``, em
+    vez de offsets. Tokens com offsets numéricos continuam aceitos.
+    :param streaming: (opcional) se as respostas de ListRecords e
+    ListIdentifiers devem ser produzidas incrementalmente, à medida em que
+    os recursos são obtidos do datastore. Neste caso, ``handle_request``
+    retorna um iterável de ``bytes``, e falhas do datastore após o início da
+    resposta produzem um documento XML truncado em vez de um erro.
+    :param sets_cache: (opcional) cache das páginas de ListSets já
+    serializadas, e.g. ``oaipmh.cache.TTLCache``. Apenas ``responseDate`` e
+    o elemento ``request`` são produzidos a cada requisição.
+    """
     def __init__(self, metadata: RepositoryMeta, ds: datastores.DataStore,
-            setsreg: sets.SetsRegistry, listslen: int):
+            setsreg: sets.SetsRegistry, listslen: int, records_cache=None,
+            keyset_paging=False, streaming=False, sets_cache=None):
         self.metadata = metadata
         self.ds = ds
         self.setsreg = setsreg
         self.listslen = listslen
+        self.records_cache = records_cache
+        self.keyset_paging = keyset_paging
+        self.streaming = streaming
+        self.sets_cache = sets_cache
         self.formats = {}
         self.verbs = {
                 'Identify': self.identify,
@@ -311,24 +432,41 @@ class Repository:
         :param metadata: descreve o formato.
         :param formatter: função que dado um dicionário, produz uma árvore de 
         elementos XML (etree.Element).
-        :param augmenter: função que dado um dicionário, produz outro dicionário.
-        Este último será o argumento para a função ``formatter``.
+        :param augmenter: função que dado um ``Resource``, produz outro
+        ``Resource``, cujo dicionário será o argumento para a função
+        ``formatter``. Os recursos podem ser compartilhados entre requisições
+        e caches, e por isso não devem ser alterados: o recurso produzido deve
+        ser derivado do original, e.g. por meio de ``_replace``, copiando
+        apenas os atributos modificados.
         """
+        if self.records_cache is None:
+            records_cache = None
+        else:
+            records_cache = cache.CacheNamespace(self.records_cache,
+                    metadata.metadataPrefix)
+
         self.formats[metadata.metadataPrefix] = {
                 'metadata': metadata,
                 'formatter': formatter,
                 'augmenter': augmenter,
+                'records_cache': records_cache,
                 }
 
     def handle_request(self, qstr: str):
         """Trata a requisição ``qstr`` codificada como querystring.
+
+        Retorna ``bytes`` ou, caso ``streaming`` seja verdadeiro, um iterável
+        de ``bytes`` para as respostas de ListRecords e ListIdentifiers.
         """
-        parsed_qstr = urllib.parse.parse_qs(qstr)
-        oairequest = oairequest_from_querystring(parsed_qstr)
+        with timing.stage('parse'):
+            parsed_qstr = urllib.parse.parse_qs(qstr)
+            oairequest = oairequest_from_querystring(parsed_qstr)
+            bad_args = (has_illegal_args(parsed_qstr) or
+                        has_repeated_args(parsed_qstr))
 
         LOGGER.info('handling OAI request: %s', repr(oairequest))
 
-        if has_illegal_args(parsed_qstr) or has_repeated_args(parsed_qstr):
+        if bad_args:
             return serialize_bad_argument(self.metadata, oairequest)
 
         try:
@@ -356,18 +494,56 @@ class Repository:
             return serialize_cannot_disseminate_format(self.metadata, oairequest)
 
         fmt = self.formats[oairequest.metadataPrefix]
-        resource = fmt['augmenter'](self.ds.get(oairequest.identifier))
+        with timing.stage('datastore'):
+            resource = self.ds.get(oairequest.identifier)
+        resource = timing.timed('augment', fmt['augmenter'])(resource)
         return serialize_get_record(self.metadata, oairequest, resource,
-                metadata_formatter=fmt['formatter'])
+                metadata_formatter=timing.timed('format', fmt['formatter']),
+                record_cache=fmt['records_cache'])
+
+    def _uses_keyset(self, token: ResumptionToken) -> bool:
+        """Se os registros de ``token`` devem ser paginados por meio de
+        cursores. A paginação iniciada com offsets numéricos prossegue da
+        mesma forma, já que a ordem dos registros pode ser diferente.
+        """
+        if is_cursor(token.offset):
+            return True
+        return self.keyset_paging and int(token.offset) == 0
 
-    def _filter_records(self, token: ResumptionToken):
-        view = self.setsreg.get_view(token.set)
+    def _filter_records(self, token: ResumptionToken, headers=False):
+        """Obtém os recursos da página representada por ``token``. Caso
+        ``headers`` seja verdadeiro, apenas os atributos de ``Header``.
+        """
+        try:
+            view = self.setsreg.get_view(token.set)
+        except datastores.DoesNotExistError:
+            view = None
         if view is None:
-            raise SetNameError('Cannot find a view for set "%s"', token.set)
+            raise SetNameError('Cannot find a view for set "%s"' % token.set)
 
-        resources = self.ds.list(int(token.offset), int(token.count),
-                view=view, _from=token.from_, until=token.until)
-        return resources
+        if self._uses_keyset(token):
+            if is_cursor(token.offset):
+                key = decode_cursor(token.offset)
+            else:
+                key = None
+            list_after = (self.ds.list_headers_after if headers
+                          else self.ds.list_after)
+            with timing.stage('datastore'):
+                resources = list_after(key, int(token.count), view=view,
+                        _from=token.from_, until=token.until)
+            return timing.iterate('datastore', resources)
+
+        list_ = self.ds.list_headers if headers else self.ds.list
+        with timing.stage('datastore'):
+            resources = list_(int(token.offset), int(token.count), view=view,
+                    _from=token.from_, until=token.until)
+        return timing.iterate('datastore', resources)
+
+    def _next_resumption_token(self, token: ResumptionToken,
+            resources: Iterable) -> ResumptionToken:
+        if self._uses_keyset(token):
+            return next_keyset_resumption_token(token, resources)
+        return next_resumption_token(token, resources)
 
     @check_request_args(check_listrecords_args)
     def list_records(self, oairequest: OAIRequest) -> bytes:
@@ -377,17 +553,34 @@ class Repository:
 
         token = get_resumption_token_from_request(oairequest, self.listslen)
         fmt = self.formats[token.metadataPrefix]
-        resources = list((fmt['augmenter'](r)
-                          for r in self._filter_records(token)))
-        next_token = next_resumption_token(token, resources)
+        augmenter = timing.timed('augment', fmt['augmenter'])
+        formatter = timing.timed('format', fmt['formatter'])
+        resources = (augmenter(r) for r in self._filter_records(token))
+
+        if self.streaming:
+            page = StreamedPage(resources)
+            return iter_list_records(self.metadata, oairequest, page,
+                    lambda: self._next_resumption_token(token, page),
+                    metadata_formatter=formatter,
+                    record_cache=fmt['records_cache'])
+
+        resources = list(resources)
+        next_token = self._next_resumption_token(token, resources)
         return serialize_list_records(self.metadata, oairequest, resources,
-                next_token, metadata_formatter=fmt['formatter'])
+                next_token, metadata_formatter=formatter,
+                record_cache=fmt['records_cache'])
 
     @check_request_args(check_listidentifiers_args)
     def list_identifiers(self, oairequest: OAIRequest) -> bytes:
         token = get_resumption_token_from_request(oairequest, self.listslen)
-        resources = list(self._filter_records(token))
-        next_token = next_resumption_token(token, resources)
+
+        if self.streaming:
+            page = StreamedPage(self._filter_records(token, headers=True))
+            return iter_list_identifiers(self.metadata, oairequest, page,
+                    lambda: self._next_resumption_token(token, page))
+
+        resources = list(self._filter_records(token, headers=True))
+        next_token = self._next_resumption_token(token, resources)
         return serialize_list_identifiers(self.metadata, oairequest, resources,
                 next_token)
 
@@ -399,10 +592,33 @@ class Repository:
     @check_request_args(check_listsets_args)
     def list_sets(self, oairequest: OAIRequest) -> bytes:
         token = get_resumption_token_from_request(oairequest, self.listslen)
-        sets_list = list(self.setsreg.list(int(token.offset), int(token.count)))
+        if self.sets_cache is None:
+            template = self._make_list_sets_template(token)
+        else:
+            # a identidade dos sets compõe a chave para que alterações no
+            # registro não sirvam páginas obsoletas.
+            key = (token, self.setsreg.fingerprint())
+            template = self.sets_cache.get(key)
+            if template is None:
+                template = self._make_list_sets_template(token)
+                self.sets_cache.put(key, template)
+
+        # a validação em modo debug é feita a cada resposta, inclusive às
+        # produzidas à partir de templates em cache.
+        return serializers.render_list_sets(template, {
+                'repository': asdict(self.metadata),
+                'request': asdict(oairequest),
+                })
+
+    def _make_list_sets_template(self, token: ResumptionToken):
+        with timing.stage('datastore'):
+            sets_list = list(self.setsreg.list(int(token.offset),
+                                               int(token.count)))
         next_token = next_resumption_token(token, sets_list)
-        return serialize_list_sets(self.metadata, oairequest, sets_list,
-                next_token)
+        # sets de periódicos que não puderam ser obtidos são considerados
+        # na paginação, mas não são listados.
+        sets_list = [set_ for set_ in sets_list if set_ is not None]
+        return make_list_sets_template(sets_list, next_token)
 
 
 def get_resumption_token_from_request(oairequest: OAIRequest,
@@ -422,6 +638,12 @@ def get_resumption_token_from_request(oairequest: OAIRequest,
         token = decode_resumption_token(oairequest.resumptionToken)
         if int(token.count) != default_count:
             raise BadResumptionTokenError('token count is different than ``oaipmh.listslen``')
+
+        if is_cursor(token.offset):
+            try:
+                decode_cursor(token.offset)
+            except ValueError:
+                raise BadResumptionTokenError('invalid cursor') from None
     else:
         token = ResumptionToken(set=oairequest.set, from_=oairequest.from_,
                 until=oairequest.until, offset='0', count=default_count,
@@ -453,6 +675,15 @@ def encode_resumption_token(token: ResumptionToken) -> str:
     return ':'.join(parts)
 
 
+def encode_next_resumption_token(token: ResumptionToken) -> str:
+    """Codifica ``token`` como ``encode_resumption_token``, ou produz uma
+    string vazia caso seja ``None``, i.e., não haja uma próxima página.
+    """
+    if token is None:
+        return ''
+    return encode_resumption_token(token)
+
+
 def decode_resumption_token(token: str) -> ResumptionToken:
     keys = ResumptionToken._fields
     values = token.split(':')
@@ -489,6 +720,52 @@ def next_resumption_token(token: ResumptionToken, resources: Iterable) -> Resump
         return None
 
 
+def next_keyset_resumption_token(token: ResumptionToken,
+        resources: Iterable) -> ResumptionToken:
+    """Retorna o próximo resumption token, cujo offset é o cursor do último
+    item de ``resources``.
+    """
+    if has_more_resources(resources, token.count):
+        return token._replace(offset=encode_cursor(
+            datastores.resource_key(resources[-1])))
+    else:
+        return None
+
+
+CURSOR_PREFIX = 'c'
+
+
+def encode_cursor(key) -> str:
+    """Codifica a chave ``(datestamp, ridentifier)`` em um cursor que pode
+    ser utilizado como offset de um resumption token.
+    """
+    datestamp, ridentifier = key
+    value = ('%s|%s' % (datestamp, ridentifier)).encode('utf-8')
+    encoded = base64.urlsafe_b64encode(value).rstrip(b'=').decode('ascii')
+    return CURSOR_PREFIX + encoded
+
+
+def decode_cursor(cursor: str):
+    """Decodifica o ``cursor`` produzido por ``encode_cursor``. Levanta
+    ``ValueError`` caso seja inválido.
+    """
+    encoded = cursor[len(CURSOR_PREFIX):]
+    encoded += '=' * (-len(encoded) % 4)
+    try:
+        value = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8')
+    except (binascii.Error, UnicodeError) as exc:
+        raise ValueError('invalid cursor "%s": %s' % (cursor, exc)) from None
+
+    datestamp, sep, ridentifier = value.partition('|')
+    if not sep:
+        raise ValueError('invalid cursor "%s"' % cursor)
+    return (datestamp, ridentifier)
+
+
+def is_cursor(offset: str) -> bool:
+    return str(offset).startswith(CURSOR_PREFIX)
+
+
 def is_valid_resumption_token(token: str, pattern: str) -> bool:
     """Se o valor de ``token`` é válido sintaticamente.
     """
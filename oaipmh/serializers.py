@@ -64,18 +64,20 @@ dela no caso dos sub-pipelines.
         }
 
 """
+import functools
 import logging
+import re
 from datetime import datetime
 
 import plumber
 from lxml import etree
 
-from . import validators
+from . import timing, validators
 
 
 __all__ = ['serialize_identify', 'serialize_list_metadata_formats',
         'serialize_list_identifiers', 'serialize_list_records',
-        'serialize_get_record']
+        'serialize_get_record', 'iter_list_identifiers', 'iter_list_records']
 
 
 LOGGER = logging.getLogger(__name__)
@@ -83,80 +85,92 @@ LOGGER = logging.getLogger(__name__)
 
 @validators.validate_on_debug
 def serialize_identify(data):
-    ppl = plumber.Pipeline(root, responsedate, request, identify, tobytes)
-    output = next(ppl.run(data, rewrap=True))
-    return output
+    template = get_identify_template(tuple(data['repository'].items()))
+    return template.render(data)
 
 
 @validators.validate_on_debug
 def serialize_list_metadata_formats(data):
-    ppl = plumber.Pipeline(root, responsedate, request, listmetadataformats,
-            tobytes)
-    output = next(ppl.run(data, rewrap=True))
-    return output
+    formats = tuple(tuple(sorted(fmt.items())) for fmt in data['formats'])
+    return get_list_metadata_formats_template(formats).render(data)
 
 
 @validators.validate_on_debug
 def serialize_list_identifiers(data):
-    ppl = plumber.Pipeline(root, responsedate, request, listidentifiers,
-            tobytes)
-    output = next(ppl.run(data, rewrap=True))
-    return output
+    return b''.join(iter_list_identifiers(data))
 
 
 @validators.validate_on_debug
-def serialize_list_records(data, metadata_formatter):
-    ppl = plumber.Pipeline(root, responsedate, request,
-            listrecords(metadata_formatter), tobytes)
-    output = next(ppl.run(data, rewrap=True))
-    return output
+def serialize_list_records(data, metadata_formatter, record_cache=None):
+    return b''.join(iter_list_records(data, metadata_formatter, record_cache))
 
 
 @validators.validate_on_debug
-def serialize_get_record(data, metadata_formatter):
-    ppl = plumber.Pipeline(root, responsedate, request, 
-            getrecord(metadata_formatter), tobytes)
-    output = next(ppl.run(data, rewrap=True))
-    return output
+def serialize_get_record(data, metadata_formatter, record_cache=None):
+    records = (make_record_fragment(resource, metadata_formatter, record_cache)
+               for resource in data.get('resources', []))
+    return GETRECORD_TEMPLATE.render(data, records)
+
+
+def iter_list_identifiers(data):
+    """Versão incremental de ``serialize_list_identifiers``. Veja
+    ``ResponseTemplate.iter_render``.
+    """
+    headers = (make_header_fragment(resource)
+               for resource in data.get('resources', []))
+    return LISTIDENTIFIERS_TEMPLATE.iter_render(data, headers)
+
+
+def iter_list_records(data, metadata_formatter, record_cache=None):
+    """Versão incremental de ``serialize_list_records``. Veja
+    ``ResponseTemplate.iter_render``.
+    """
+    records = (make_record_fragment(resource, metadata_formatter, record_cache)
+               for resource in data.get('resources', []))
+    return LISTRECORDS_TEMPLATE.iter_render(data, records)
 
 
-@validators.validate_on_debug
 def serialize_list_sets(data):
-    ppl = plumber.Pipeline(root, responsedate, request, listsets, tobytes)
-    output = next(ppl.run(data, rewrap=True))
-    return output
+    return render_list_sets(make_list_sets_template(data), data)
+
+
+@validators.validate_on_debug
+def render_list_sets(template, data):
+    """Produz a resposta ListSets à partir de ``template``, conforme
+    produzido por ``make_list_sets_template``, possivelmente já utilizado.
+    """
+    return template.render(data)
+
+
+def make_list_sets_template(data):
+    """Template da resposta ListSets para a página de sets ``data['sets']``
+    e o resumption token ``data['resumptionToken']``. Pode ser reutilizado
+    enquanto a página for válida.
+    """
+    return ResponseTemplate(listsets, {
+        'sets': list(data.get('sets', [])),
+        'resumptionToken': data.get('resumptionToken', ''),
+        })
 
 
 def serialize_bad_verb(data):
-    ppl = plumber.Pipeline(root, responsedate, request, badverb, tobytes)
-    output = next(ppl.run(data, rewrap=True))
-    return output
+    return BADVERB_TEMPLATE.render(data)
 
 
 def serialize_bad_argument(data):
-    ppl = plumber.Pipeline(root, responsedate, request, badargument, tobytes)
-    output = next(ppl.run(data, rewrap=True))
-    return output
+    return BADARGUMENT_TEMPLATE.render(data)
 
 
 def serialize_id_does_not_exist(data):
-    ppl = plumber.Pipeline(root, responsedate, request, iddoesnotexist, tobytes)
-    output = next(ppl.run(data, rewrap=True))
-    return output
+    return IDDOESNOTEXIST_TEMPLATE.render(data)
 
 
 def serialize_cannot_disseminate_format(data):
-    ppl = plumber.Pipeline(root, responsedate, request, cannotdisseminateformat,
-            tobytes)
-    output = next(ppl.run(data, rewrap=True))
-    return output
+    return CANNOTDISSEMINATEFORMAT_TEMPLATE.render(data)
 
 
 def serialize_bad_resumption_token(data):
-    ppl = plumber.Pipeline(root, responsedate, request, badresumptiontoken,
-            tobytes)
-    output = next(ppl.run(data, rewrap=True))
-    return output
+    return BADRESUMPTIONTOKEN_TEMPLATE.render(data)
 
 
 #-----------------------------------------------------------------------------
@@ -167,6 +181,12 @@ XSI = "http://www.w3.org/2001/XMLSchema-instance"
 SCHEMALOCATION = ' '.join(['http://www.openarchives.org/OAI/2.0/',
     'http://www.openarchives.org/OAI/2.0/OAI-PMH.xsd'])
 ATTRIB = {"{%s}schemaLocation" % XSI: SCHEMALOCATION}
+NSMAP = {None: XMLNS, 'xsi': XSI}
+RECORDS_PLACEHOLDER = 'records'
+RECORDS_PLACEHOLDER_BYTES = b'<!--records-->'
+EMPTY_RESUMPTION_TOKEN_BYTES = b'<resumptionToken></resumptionToken>'
+HEADER_PLACEHOLDER = 'header'
+HEADER_PLACEHOLDER_BYTES = b'<!--header-->'
 
 
 @plumber.filter
@@ -177,8 +197,7 @@ def root(data):
 
     Deve ser sempre o primeiro filtro do pipeline principal.
     """
-    xml = etree.Element('OAI-PMH', nsmap={None: XMLNS, 'xsi': XSI},
-            attrib=ATTRIB)
+    xml = etree.Element('OAI-PMH', nsmap=NSMAP, attrib=ATTRIB)
     return (xml, data)
 
 
@@ -381,6 +400,19 @@ def listidentifiers(item):
     return item
 
 
+@plumber.filter
+def listidentifiersenvelope(item):
+    """Acrescenta o elemento ``/OAI-PMH/ListIdentifiers``. Os cabeçalhos
+    são incluídos posteriormente, no lugar do marcador produzido por
+    ``make_records_placeholder``.
+    """
+    xml, data = item
+    sub = etree.SubElement(xml, 'ListIdentifiers')
+    sub.append(make_records_placeholder())
+    sub.append(make_resumptiontoken(data.get('resumptionToken', '')))
+    return item
+
+
 def make_set(set_data):
     _set = etree.Element('set')
 
@@ -419,38 +451,73 @@ def make_record(record_data, formatter):
     return xmltree
 
 
-class getrecord(plumber.Filter):
-    def __init__(self, metadata_formatter):
-        self.metadata_formatter = metadata_formatter
+def make_record_fragment(record_data, formatter, cache=None):
+    """Produz os bytes do elemento ``record`` tal como aparecem no documento
+    OAI-PMH.
 
-    def transform(self, item):
-        xml, data = item
-        sub = etree.SubElement(xml, 'GetRecord')
+    O elemento é serializado como filho de um elemento ``OAI-PMH`` com os
+    mesmos namespaces da raíz do documento, de maneira que as declarações de
+    namespace sejam idênticas às produzidas pela serialização da árvore
+    completa.
 
-        records = (make_record(resource, self.metadata_formatter)
-                   for resource in data.get('resources', []))
-        for rec in records:
-            sub.append(rec)
+    :param cache: (opcional) cache dos fragmentos, indexados por
+    ``(ridentifier, datestamp)``. Deve ser exclusivo do ``formatter``, e.g.
+    ``oaipmh.cache.CacheNamespace``.
+    """
+    if cache is not None:
+        key = (record_data.get('ridentifier'), record_data.get('datestamp'))
+        fragment = cache.get(key)
+        if fragment is None:
+            fragment = make_record_fragment(record_data, formatter)
+            cache.put(key, fragment)
+        return fragment
+
+    wrapper = etree.Element('OAI-PMH', nsmap=NSMAP)
+    wrapper.append(make_record(record_data, formatter))
+    return fragment_from_wrapper(wrapper)
+
+
+def make_header_fragment(record_data):
+    """Produz os bytes do elemento ``header`` tal como aparecem no
+    documento OAI-PMH. Veja ``make_record_fragment``.
+    """
+    wrapper = etree.Element('OAI-PMH', nsmap=NSMAP)
+    for _ in plumber.Pipeline(header).run([(wrapper, record_data)]): pass
+    return fragment_from_wrapper(wrapper)
 
-        return item
 
+def fragment_from_wrapper(wrapper):
+    xml = etree.tostring(wrapper, encoding="utf-8", method="xml")
+    return xml[xml.index(b'>') + 1:-len(b'</OAI-PMH>')]
 
-class listrecords(plumber.Filter):
-    def __init__(self, metadata_formatter):
-        self.metadata_formatter = metadata_formatter
 
-    def transform(self, item):
-        xml, data = item
-        sub = etree.SubElement(xml, 'ListRecords')
+def make_records_placeholder():
+    return etree.Comment(RECORDS_PLACEHOLDER)
 
-        records = (make_record(resource, self.metadata_formatter)
-                   for resource in data.get('resources', []))
-        for rec in records:
-            sub.append(rec)
 
-        sub.append(make_resumptiontoken(data.get('resumptionToken', '')))
+@plumber.filter
+def getrecord(item):
+    """Acrescenta o elemento ``/OAI-PMH/GetRecord``. O registro é incluído
+    posteriormente, no lugar do marcador produzido por
+    ``make_records_placeholder``.
+    """
+    xml, data = item
+    sub = etree.SubElement(xml, 'GetRecord')
+    sub.append(make_records_placeholder())
+    return item
 
-        return item
+
+@plumber.filter
+def listrecords(item):
+    """Acrescenta o elemento ``/OAI-PMH/ListRecords``. Os registros são
+    incluídos posteriormente, no lugar do marcador produzido por
+    ``make_records_placeholder``.
+    """
+    xml, data = item
+    sub = etree.SubElement(xml, 'ListRecords')
+    sub.append(make_records_placeholder())
+    sub.append(make_resumptiontoken(data.get('resumptionToken', '')))
+    return item
 
 
 def make_resumptiontoken(token_data):
@@ -508,3 +575,160 @@ def badresumptiontoken(item):
     sub.attrib['code'] = 'badResumptionToken'
     return item
 
+
+#-----------------------------------------------------------------------------
+# Templates das respostas
+#-----------------------------------------------------------------------------
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def check_xml_compatible(value):
+    """Levanta ``ValueError`` caso ``value`` contenha caracteres que não
+    podem ser representados em XML, assim como o lxml.
+    """
+    if INVALID_XML_CHARS.search(value):
+        raise ValueError('All strings must be XML compatible: Unicode or '
+                'ASCII, no NULL bytes or control characters')
+
+
+def escape_text(value):
+    """Escapa ``value`` para uso como conteúdo textual de um elemento, da
+    mesma forma que o lxml.
+    """
+    check_xml_compatible(value)
+    return (value.replace('&', '&amp;').replace('<', '&lt;')
+            .replace('>', '&gt;').replace('\r', '&#13;'))
+
+
+def escape_attribute(value):
+    """Escapa ``value`` para uso como valor de um atributo delimitado por
+    aspas duplas, da mesma forma que o lxml.
+    """
+    return (escape_text(value).replace('"', '&quot;').replace('\n', '&#10;')
+            .replace('\t', '&#9;'))
+
+
+_last_response_date = (None, '')
+
+
+def get_response_date():
+    """Data e hora corrente, em UTC, formatada para o elemento
+    ``responseDate``. A formatação é reaproveitada dentro do mesmo segundo.
+    """
+    global _last_response_date
+    now = datetime.utcnow().replace(microsecond=0)
+    last, formatted = _last_response_date
+    if now != last:
+        formatted = now.strftime('%Y-%m-%dT%H:%M:%SZ')
+        _last_response_date = (now, formatted)
+    return formatted
+
+
+def make_response_header(data):
+    """Produz os bytes dos elementos ``/OAI-PMH/responseDate`` e
+    ``/OAI-PMH/request``, conforme os filtros ``responsedate`` e ``request``.
+    """
+    response_date = get_response_date()
+    attrs = ''.join(' %s="%s"' % (key, escape_attribute(value))
+                    for key, value in data['request'].items()
+                    if value is not None)
+    base_url = data['repository'].get('baseURL')
+    if base_url is None:
+        request_elem = '<request%s/>' % attrs
+    else:
+        request_elem = '<request%s>%s</request>' % (attrs,
+                escape_text(base_url))
+
+    return ('<responseDate>%s</responseDate>%s' % (response_date,
+        request_elem)).encode('utf-8')
+
+
+@plumber.filter
+def headerplaceholder(item):
+    """Acrescenta o marcador substituído pelos elementos produzidos por
+    ``make_response_header``.
+    """
+    xml, data = item
+    xml.append(etree.Comment(HEADER_PLACEHOLDER))
+    return item
+
+
+class ResponseTemplate:
+    """Documento OAI-PMH serializado uma única vez, do qual apenas os
+    elementos ``responseDate`` e ``request`` e, opcionalmente, os registros
+    e o resumption token são produzidos a cada resposta.
+
+    :param body: filtro que acrescenta o corpo da resposta, e.g.
+    ``badverb``. Os registros são incluídos no lugar do marcador produzido
+    por ``make_records_placeholder``, caso exista.
+    :param data: (opcional) dados utilizados por ``body``.
+    """
+    def __init__(self, body, data=None):
+        ppl = plumber.Pipeline(root, headerplaceholder, body, tobytes)
+        output = next(ppl.run(data or {}, rewrap=True))
+        self.head, body = output.split(HEADER_PLACEHOLDER_BYTES, 1)
+        if RECORDS_PLACEHOLDER_BYTES in body:
+            self.body, self.tail = body.split(RECORDS_PLACEHOLDER_BYTES, 1)
+        else:
+            self.body, self.tail = body, None
+
+    def iter_render(self, data, fragments=()):
+        """Produz incrementalmente o documento, intercalando os bytes de
+        ``fragments`` no lugar dos registros.
+
+        O envelope é produzido antes que ``fragments`` seja consumido,
+        enquanto o resumption token é serializado somente depois. Por isso,
+        ``data['resumptionToken']`` pode ser uma função sem argumentos que
+        produz o token.
+        """
+        with timing.stage('serialize'):
+            head = self.head + make_response_header(data) + self.body
+        yield head
+        if self.tail is None:
+            return
+
+        # o tempo de produção dos fragmentos não atribuído às etapas
+        # aninhadas, e.g. ``format``, é o da serialização dos registros.
+        yield from timing.iterate('serialize', fragments)
+
+        with timing.stage('serialize'):
+            token = data.get('resumptionToken', '')
+            if callable(token):
+                token = token()
+            if token:
+                tail = self.tail.replace(EMPTY_RESUMPTION_TOKEN_BYTES,
+                        b'<resumptionToken>%s</resumptionToken>' %
+                        escape_text(token).encode('utf-8'), 1)
+            else:
+                tail = self.tail
+        yield tail
+
+    def render(self, data, fragments=()):
+        return b''.join(self.iter_render(data, fragments))
+
+
+@functools.lru_cache(maxsize=16)
+def get_identify_template(repository_items):
+    """Template da resposta Identify para os metadados do repositório
+    ``repository_items``, uma tupla de pares chave-valor.
+    """
+    return ResponseTemplate(identify, {'repository': dict(repository_items)})
+
+
+@functools.lru_cache(maxsize=16)
+def get_list_metadata_formats_template(formats):
+    """Template da resposta ListMetadataFormats para ``formats``, uma tupla
+    dos pares chave-valor de cada formato.
+    """
+    return ResponseTemplate(listmetadataformats,
+            {'formats': [dict(fmt) for fmt in formats]})
+
+
+GETRECORD_TEMPLATE = ResponseTemplate(getrecord)
+LISTRECORDS_TEMPLATE = ResponseTemplate(listrecords)
+LISTIDENTIFIERS_TEMPLATE = ResponseTemplate(listidentifiersenvelope)
+BADVERB_TEMPLATE = ResponseTemplate(badverb)
+BADARGUMENT_TEMPLATE = ResponseTemplate(badargument)
+IDDOESNOTEXIST_TEMPLATE = ResponseTemplate(iddoesnotexist)
+CANNOTDISSEMINATEFORMAT_TEMPLATE = ResponseTemplate(cannotdisseminateformat)
+BADRESUMPTIONTOKEN_TEMPLATE = ResponseTemplate(badresumptiontoken)
@@ -14,22 +14,53 @@ Deve ser possível:
   
 """
 import itertools
+import logging
+import threading
 from collections import OrderedDict
 
 from .articlemeta import ArticleMetaFilteredView
+from .datastores import identityview, DoesNotExistError
 from .entities import Set
 
 
+LOGGER = logging.getLogger(__name__)
+
+
 class SetsRegistry:
     """O registro de ``Set``s da aplicação.
 
     :param ds: instância de ``oaipmh.datastores.DataStore``.
     :param static_defs: lista associativa de objetos ``Set`` e funções ``view``.
+    :param catalogue: (opcional) instância de ``JournalCatalogue``. Enquanto
+    estiver carregado, os sets dos periódicos são obtidos do catálogo, sem
+    acesso a ``ds``.
+    :param views_cache: (opcional) cache das views dos sets de periódicos,
+    indexado por ``setSpec``, e.g. ``oaipmh.cache.TTLCache``.
+    :param missing_cache: (opcional) cache dos ``setSpec`` inexistentes,
+    mantido à parte de ``views_cache`` para que requisições a sets
+    arbitrários não descartem as views dos sets existentes.
     """
-    def __init__(self, ds, static_defs):
+    def __init__(self, ds, static_defs, catalogue=None, views_cache=None,
+            missing_cache=None):
         self.ds = ds
         self.static_sets = [s for s, _ in static_defs]
         self.static_views = {s.setSpec: v for s, v in static_defs}
+        self.catalogue = catalogue
+        self.views_cache = views_cache
+        self.missing_cache = missing_cache
+
+    def _uses_catalogue(self):
+        return self.catalogue is not None and self.catalogue.is_loaded()
+
+    def fingerprint(self):
+        """Valor que se altera sempre que o conjunto de sets listados pode
+        ter sido alterado.
+        """
+        if self._uses_catalogue():
+            generation = self.catalogue.generation
+        else:
+            generation = None
+        return (tuple(self.static_sets), generation)
 
     def list(self, offset, count):
         """Retorna sequência com ``count`` instâncias de ``Set`` à partir de
@@ -37,21 +68,149 @@ class SetsRegistry:
         """
         static_part = self.static_sets[offset:offset+count]
         if len(static_part) < count:
-            dynamic_part = get_sets_from_journals(self.ds,
-                    translate_virtual_offset(len(self.static_sets), offset),
-                    count - len(static_part))
+            dynamic_offset = translate_virtual_offset(len(self.static_sets),
+                    offset)
+            dynamic_count = count - len(static_part)
+            if self._uses_catalogue():
+                dynamic_part = self.catalogue.list(dynamic_offset,
+                        dynamic_count)
+            else:
+                dynamic_part = get_sets_from_journals(self.ds, dynamic_offset,
+                        dynamic_count)
         else:
             dynamic_part = []
 
         return itertools.chain(static_part, dynamic_part)
 
     def get_view(self, setspec):
-        """Retorna a ``view`` associada ao ``setspec``.
+        """Retorna a ``view`` associada ao ``setspec``. A ausência de
+        ``setspec`` corresponde a todos os registros.
+
+        Levanta ``DoesNotExistError`` caso o set não exista.
         """
+        if not setspec:
+            return identityview
+
         try:
             return self.static_views[setspec]
         except KeyError:
-            return get_view_for_journal_set(get_set_from_journal(self.ds, setspec))
+            pass
+
+        if self.views_cache is not None:
+            view = self.views_cache.get(setspec)
+            if view is not None:
+                return view
+
+        if self.missing_cache is not None and self.missing_cache.get(setspec):
+            raise DoesNotExistError()
+
+        try:
+            view = self._get_journal_view(setspec)
+        except DoesNotExistError:
+            if self.missing_cache is not None:
+                self.missing_cache.put(setspec, True)
+            raise
+
+        if self.views_cache is not None:
+            self.views_cache.put(setspec, view)
+        return view
+
+    def _get_journal_view(self, setspec):
+        if self._uses_catalogue():
+            try:
+                return get_view_for_journal_set(self.catalogue.get(setspec))
+            except DoesNotExistError:
+                # periódicos incluídos após a última atualização do catálogo.
+                pass
+
+        return get_view_for_journal_set(get_set_from_journal(self.ds, setspec))
+
+
+class JournalCatalogue:
+    """Catálogo em memória dos sets correspondentes aos periódicos da fonte
+    de dados ``ds``.
+
+    O catálogo é produzido por ``refresh`` e pode ser atualizado
+    periodicamente por uma thread em segundo plano, iniciada por ``start``.
+    Falhas na atualização são registradas e o catálogo anterior é mantido.
+
+    :param ds: instância de ``oaipmh.datastores.DataStore``.
+    :param interval: intervalo, em segundos, entre as atualizações.
+    :param batch_size: (opcional) quantidade de periódicos obtidos por
+    consulta a ``ds.list_journals``.
+    """
+    def __init__(self, ds, interval, batch_size=1000):
+        self.ds = ds
+        self.interval = interval
+        self.batch_size = batch_size
+        self.generation = 0
+        # tupla ``(sets, index)``, substituída por inteiro a cada atualização.
+        self._catalogue = ((), {})
+        self._loaded = False
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def is_loaded(self):
+        return self._loaded
+
+    def refresh(self):
+        """Obtém todos os periódicos de ``ds`` e substitui o catálogo.
+        """
+        sets_list = []
+        offset = 0
+        while True:
+            # a paginação considera também os periódicos que não puderam ser
+            # obtidos, representados por ``None``.
+            batch = list(self.ds.list_journals(offset, self.batch_size))
+            sets_list.extend(map_journal_to_set(j) for j in batch
+                             if j is not None)
+            if len(batch) < self.batch_size:
+                break
+            offset += self.batch_size
+
+        index = {s.setSpec: s for s in sets_list}
+        # a lista e o índice são publicados em uma única atribuição para que
+        # leituras concorrentes não observem uma lista nova com um índice
+        # antigo, ou vice-versa.
+        self._catalogue = (tuple(sets_list), index)
+        self.generation += 1
+        self._loaded = True
+        LOGGER.info('journal catalogue refreshed with %d sets', len(sets_list))
+
+    def list(self, offset, count):
+        sets_list, _ = self._catalogue
+        return list(sets_list[offset:offset+count])
+
+    def get(self, setspec):
+        _, index = self._catalogue
+        try:
+            return index[setspec]
+        except KeyError:
+            raise DoesNotExistError() from None
+
+    def start(self):
+        """Produz o catálogo e inicia a thread de atualização.
+        """
+        try:
+            self.refresh()
+        except Exception:
+            LOGGER.exception('could not load the journal catalogue')
+
+        self._thread = threading.Thread(target=self._run,
+                name='journal-catalogue', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                LOGGER.exception('could not refresh the journal catalogue')
 
 
 def translate_virtual_offset(size, offset):
@@ -68,9 +227,11 @@ def translate_virtual_offset(size, offset):
 
 def get_sets_from_journals(ds, offset, count):
     """Sequência de ``Set`` à partir de periódicos da fonte de dados ``ds``.
+    Periódicos que não puderam ser obtidos são representados por ``None``,
+    para que a quantidade de itens possa ser utilizada na paginação.
     """
     journals = ds.list_journals(offset, count)
-    return (map_journal_to_set(j) for j in journals)
+    return (None if j is None else map_journal_to_set(j) for j in journals)
 
 
 def get_set_from_journal(ds, issn):
@@ -0,0 +1,294 @@
+"""DataStore mantido em um banco de dados SQLite local, e.g. um espelho do
+ArticleMeta.
+
+Os recursos são armazenados como JSON comprimido, acompanhados das colunas
+necessárias à ordenação por ``(datestamp, ridentifier)`` e à filtragem por
+``setspec``. Cada thread utiliza a sua própria conexão com o banco, que opera
+no modo WAL, permitindo leituras concorrentes à escrita.
+"""
+import datetime
+import itertools
+import json
+import sqlite3
+import threading
+import zlib
+
+from .articlemeta import Journal
+from .datastores import (
+        DataStore,
+        DoesNotExistError,
+        identityview,
+        datestamp_to_str,
+        resource_key,
+        setspec_from_filter,
+        )
+from .entities import Resource
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS resources (
+    ridentifier TEXT PRIMARY KEY,
+    datestamp TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS resources_key
+    ON resources (datestamp, ridentifier);
+CREATE TABLE IF NOT EXISTS resource_sets (
+    setspec TEXT NOT NULL,
+    datestamp TEXT NOT NULL,
+    ridentifier TEXT NOT NULL,
+    PRIMARY KEY (setspec, datestamp, ridentifier)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS resource_sets_ridentifier
+    ON resource_sets (ridentifier);
+CREATE TABLE IF NOT EXISTS journals (
+    lead_issn TEXT PRIMARY KEY,
+    title TEXT
+);
+'''
+
+
+DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return {'$dt': value.strftime(DATETIME_FORMAT)}
+    raise TypeError('cannot encode %r' % value)
+
+
+def _decode_object(obj):
+    if '$dt' in obj:
+        return datetime.datetime.strptime(obj['$dt'], DATETIME_FORMAT)
+    return obj
+
+
+def _decode_field(value):
+    # os pares das listas associativas, e.g. ``title``, são decodificados
+    # como listas.
+    if isinstance(value, list):
+        return [tuple(item) if isinstance(item, list) else item
+                for item in value]
+    return value
+
+
+def encode_resource(resource: Resource) -> bytes:
+    """Codifica ``resource`` como JSON comprimido, com os atributos na ordem
+    em que são definidos em ``Resource``.
+    """
+    data = json.dumps(list(resource), default=_encode_value,
+            separators=(',', ':'), ensure_ascii=False)
+    return zlib.compress(data.encode('utf-8'))
+
+
+def decode_resource(data: bytes) -> Resource:
+    """Operação inversa a ``encode_resource``.
+    """
+    values = json.loads(zlib.decompress(data).decode('utf-8'),
+            object_hook=_decode_object)
+    return Resource(*(_decode_field(value) for value in values))
+
+
+class SQLiteQuery:
+    """Consulta aos recursos de ``store``, ordenados por ``(datestamp,
+    ridentifier)``, executada apenas quando iterada.
+
+    É produzida pelas consultas a ``SQLite`` e permite que ``offset`` e
+    ``count`` sejam aplicados pelo próprio SQLite.
+    """
+    def __init__(self, store, setspec=None, _from=None, until=None,
+            after=None, offset=0, limit=-1):
+        self.store = store
+        self.setspec = setspec
+        self._from = _from
+        self.until = until
+        self.after = after
+        self.offset = offset
+        self.limit = limit
+
+    def slice(self, offset, count):
+        if self.limit >= 0:
+            count = max(0, min(count, self.limit - offset))
+        return SQLiteQuery(self.store, setspec=self.setspec,
+                _from=self._from, until=self.until, after=self.after,
+                offset=self.offset + offset, limit=count)
+
+    def _where(self):
+        """Tabela, coluna de dados, condições e parâmetros da consulta.
+        """
+        if self.setspec:
+            table = ('resource_sets AS k JOIN resources AS r '
+                     'ON r.ridentifier = k.ridentifier')
+            column = 'r.data'
+            conditions, params = ['k.setspec = ?'], [self.setspec]
+        else:
+            table, column = 'resources AS k', 'k.data'
+            conditions, params = [], []
+
+        if self.after is not None:
+            datestamp, ridentifier = self.after
+            conditions.append('(k.datestamp > ? OR '
+                              '(k.datestamp = ? AND k.ridentifier > ?))')
+            params += [datestamp, datestamp, ridentifier]
+        if self._from:
+            conditions.append('k.datestamp >= ?')
+            params.append(datestamp_to_str(self._from))
+        if self.until:
+            conditions.append('k.datestamp <= ?')
+            params.append(datestamp_to_str(self.until))
+        return table, column, conditions, params
+
+    def to_sql(self):
+        table, column, conditions, params = self._where()
+        sql = 'SELECT %s FROM %s' % (column, table)
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY k.datestamp, k.ridentifier LIMIT ? OFFSET ?'
+        return sql, params + [self.limit, self.offset]
+
+    def count(self):
+        """Quantidade de recursos da consulta, desconsiderando ``offset`` e
+        ``limit``.
+        """
+        table, _, conditions, params = self._where()
+        sql = 'SELECT COUNT(*) FROM %s' % table
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        return self.store.connection().execute(sql, params).fetchone()[0]
+
+    def __iter__(self):
+        sql, params = self.to_sql()
+        cursor = self.store.connection().execute(sql, params)
+        return (decode_resource(data) for data, in cursor)
+
+
+class SQLite(DataStore):
+    """Acesso aos recursos e periódicos mantidos no banco SQLite ``path``.
+
+    Views produzidas por ``oaipmh.articlemeta.ArticleMetaFilteredView`` com
+    o termo ``code_title`` são respondidas pelo índice de ``setspec``. Demais
+    termos levantam ``ValueError``.
+
+    :param path: caminho do arquivo do banco de dados. Note que cada conexão
+    com ``:memory:`` produz um banco distinto.
+    :param timeout: (opcional) segundos de espera pela liberação do banco
+    por outras conexões.
+    """
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self.connection().executescript(SCHEMA)
+
+    def connection(self):
+        """Conexão exclusiva da thread corrente.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Encerra a conexão da thread corrente.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def add(self, resource):
+        self.add_many([resource])
+
+    def add_many(self, resources, batch_size=1000):
+        """Inclui ou substitui ``resources`` em transações de até
+        ``batch_size`` recursos.
+        """
+        conn = self.connection()
+        resources = iter(resources)
+        while True:
+            batch = list(itertools.islice(resources, batch_size))
+            if not batch:
+                return
+
+            rows, sets_rows = [], []
+            for resource in batch:
+                datestamp, ridentifier = resource_key(resource)
+                rows.append((ridentifier, datestamp,
+                             encode_resource(resource)))
+                sets_rows.extend((setspec, datestamp, ridentifier)
+                                 for setspec in resource.setspec)
+
+            with conn:
+                conn.executemany(
+                        'DELETE FROM resource_sets WHERE ridentifier = ?',
+                        [(row[0],) for row in rows])
+                conn.executemany('INSERT OR REPLACE INTO resources '
+                        '(ridentifier, datestamp, data) VALUES (?, ?, ?)',
+                        rows)
+                conn.executemany('INSERT OR IGNORE INTO resource_sets '
+                        '(setspec, datestamp, ridentifier) VALUES (?, ?, ?)',
+                        sets_rows)
+
+    def get(self, ridentifier):
+        row = self.connection().execute(
+                'SELECT data FROM resources WHERE ridentifier = ?',
+                (ridentifier,)).fetchone()
+        if row is None:
+            raise DoesNotExistError()
+        return decode_resource(row[0])
+
+    def count(self, _from=None, until=None):
+        """Quantidade de recursos cujo ``datestamp`` pertence ao intervalo
+        ``[_from, until]``, conforme ``list``.
+        """
+        return SQLiteQuery(self, _from=_from, until=until).count()
+
+    def _select(self, extra_filter=None, _from=None, until=None, after=None):
+        setspec = setspec_from_filter(extra_filter)
+        return SQLiteQuery(self, setspec=setspec, _from=_from, until=until,
+                after=after)
+
+    def _query(self, view=None, _from=None, until=None, after=None):
+        view_fn = view or identityview
+
+        def query_fn(extra_filter=None):
+            return self._select(extra_filter=extra_filter, _from=_from,
+                    until=until, after=after)
+
+        return view_fn(query_fn)()
+
+    def list(self, offset, count, view=None, _from=None, until=None):
+        ds = self._query(view=view, _from=_from, until=until)
+        if isinstance(ds, SQLiteQuery):
+            yield from ds.slice(offset, count)
+        else:
+            yield from itertools.islice(ds, offset, offset + count)
+
+    def list_after(self, key, count, view=None, _from=None, until=None):
+        ds = self._query(view=view, _from=_from, until=until, after=key)
+        if isinstance(ds, SQLiteQuery):
+            yield from ds.slice(0, count)
+        else:
+            yield from itertools.islice(ds, count)
+
+    def add_journal(self, journal: Journal):
+        with self.connection() as conn:
+            conn.execute('INSERT OR REPLACE INTO journals (lead_issn, title) '
+                    'VALUES (?, ?)', (journal.lead_issn, journal.title))
+
+    def get_journal(self, issn):
+        row = self.connection().execute(
+                'SELECT title, lead_issn FROM journals WHERE lead_issn = ?',
+                (issn,)).fetchone()
+        if row is None:
+            raise DoesNotExistError()
+        return Journal(*row)
+
+    def list_journals(self, offset=0, count=1000):
+        rows = self.connection().execute(
+                'SELECT title, lead_issn FROM journals ORDER BY lead_issn '
+                'LIMIT ? OFFSET ?', (count, offset))
+        return [Journal(*row) for row in rows]
@@ -0,0 +1,521 @@
+"""Sincronização incremental de um DataStore local com o ArticleMeta.
+
+Apenas os documentos processados a partir da marca d'água -- a
+``processing_date`` do último documento gravado -- são obtidos, por meio de
+``BoundArticleMetaClient.documents(from_date=...)``, em páginas consecutivas
+por ``offset``. A obtenção das páginas, a conversão dos documentos em
+``Resource`` e a gravação ocorrem concorrentemente, em um pipeline limitado.
+A marca d'água é persistida após a gravação de cada página, de maneira que
+uma sincronização interrompida é retomada a partir do dia da última página
+gravada. Os documentos desse dia são obtidos novamente e substituídos, uma
+vez que ``add`` não duplica recursos.
+
+A carga inicial do espelho, ``BulkImporter``, divide o acervo em partições
+por intervalos de ``processing_date`` ou por periódico, obtidas
+concorrentemente.
+
+Uso::
+
+    python -m oaipmh.sync --sqlite oai.db --checkpoint oai.sync.json
+    python -m oaipmh.sync --sqlite oai.db --checkpoint oai.sync.json \\
+        --bulk date --days 90 --workers 8
+"""
+import argparse
+import collections
+import datetime
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent import futures
+
+from articlemeta import client as articlemeta_client
+
+import oaipmh
+from . import articlemeta, sqlitestore
+from .datastores import identityview
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+SyncStats = collections.namedtuple('SyncStats', 'documents elapsed')
+
+
+def documents_per_second(stats: SyncStats) -> float:
+    if not stats.elapsed:
+        return 0.0
+    return stats.documents / stats.elapsed
+
+
+class Checkpoint:
+    """Marca d'água persistida como JSON no arquivo ``path``.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Retorna a ``processing_date`` gravada, no formato ``YYYY-MM-DD``,
+        ou ``None``.
+        """
+        try:
+            with open(self.path, encoding='utf-8') as fp:
+                data = json.load(fp)
+        except FileNotFoundError:
+            return None
+        return data['from_date']
+
+    def save(self, from_date):
+        # a substituição atômica do arquivo impede que uma interrupção
+        # durante a gravação corrompa a marca d'água.
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as fp:
+            json.dump({'from_date': from_date}, fp)
+        os.replace(tmp_path, self.path)
+
+
+def fetch_pages(client, page_size=1000, from_date=None, until=None,
+        view=None, offset=0):
+    """Páginas de documentos de ``client`` processados no intervalo
+    ``[from_date, until]``, à partir de ``offset``.
+
+    :param view: (opcional) função ``view`` aplicada a ``client.documents``,
+    e.g. ``articlemeta.ArticleMetaFilteredView``.
+    """
+    query_fn = (view or identityview)(client.documents)
+    while True:
+        docs = list(query_fn(offset=offset, limit=page_size,
+                from_date=from_date, until_date=until))
+        if not docs:
+            return
+        yield docs
+        if len(docs) < page_size:
+            return
+        offset += len(docs)
+
+
+def put(items, item, stopped):
+    """Inclui ``item`` na fila ``items`` enquanto ``stopped`` não for
+    sinalizado. Retorna falso caso contrário.
+    """
+    while not stopped.is_set():
+        try:
+            items.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def prefetch(iterable, maxsize):
+    """Consome ``iterable`` em uma thread, mantendo até ``maxsize`` itens
+    à frente do consumidor. Exceções são propagadas ao consumidor.
+    """
+    items = queue.Queue(maxsize)
+    stopped = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(items, (item, None), stopped):
+                    return
+        except Exception as exc:
+            put(items, (done, exc), stopped)
+        else:
+            put(items, (done, None), stopped)
+
+    thread = threading.Thread(target=produce, name='sync-fetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, exc = items.get()
+            if exc is not None:
+                raise exc
+            if item is done:
+                return
+            yield item
+    finally:
+        stopped.set()
+
+
+def convert_page(docs, journals=None):
+    """Converte os documentos da página ``docs`` em ``Resource``. Retorna
+    também a maior ``processing_date`` da página, ou ``None`` caso nenhum
+    documento tenha sido obtido.
+
+    Documentos removidos entre a listagem e a obtenção são representados
+    por ``None`` e desprezados.
+
+    :param journals: (opcional) instância de
+    ``articlemeta.JournalMetadataCache``.
+    """
+    docs = [doc for doc in docs if doc is not None]
+    resources = [articlemeta.ArticleResourceFacade(doc, journals).to_resource()
+                 for doc in docs if not articlemeta.is_spurious_doc(doc)]
+    processing_date = max((doc.processing_date for doc in docs), default=None)
+    return resources, processing_date
+
+
+def write(ds, resources):
+    add_many = getattr(ds, 'add_many', None)
+    if add_many is not None:
+        add_many(resources)
+    else:
+        for resource in resources:
+            ds.add(resource)
+
+
+class Synchronizer:
+    """Mantém o DataStore ``ds`` atualizado em relação a ``client``.
+
+    Pressupõe que o ArticleMeta retorne os documentos ordenados por
+    ``processing_date``, de maneira que a maior data de cada página seja a
+    marca d'água.
+
+    :param client: instância de ``articlemeta.BoundArticleMetaClient``.
+    :param ds: DataStore que implementa ``add`` e, opcionalmente,
+    ``add_many``.
+    :param checkpoint: instância de ``Checkpoint``.
+    :param page_size: (opcional) quantidade de documentos por página.
+    :param workers: (opcional) quantidade de páginas convertidas
+    concorrentemente.
+    :param prefetch_pages: (opcional) quantidade de páginas obtidas à frente
+    da conversão.
+    """
+    def __init__(self, client, ds, checkpoint, page_size=1000, workers=4,
+            prefetch_pages=2, clock=time.monotonic):
+        self.client = client
+        self.ds = ds
+        self.checkpoint = checkpoint
+        self.page_size = page_size
+        self.workers = workers
+        self.prefetch_pages = prefetch_pages
+        self.clock = clock
+        self.journals = articlemeta.JournalMetadataCache()
+
+    def run(self, until=None) -> SyncStats:
+        start = self.clock()
+        documents = 0
+        pages = prefetch(fetch_pages(self.client, self.page_size,
+                from_date=self.checkpoint.load(), until=until),
+                self.prefetch_pages)
+
+        pending = collections.deque()
+        with futures.ThreadPoolExecutor(max_workers=self.workers,
+                thread_name_prefix='sync-convert') as executor:
+            try:
+                while True:
+                    try:
+                        docs = next(pages)
+                    except StopIteration:
+                        break
+                    except Exception:
+                        # as páginas já obtidas são gravadas, para que não
+                        # sejam obtidas novamente na retomada.
+                        documents += self._write_all(pending, start, documents)
+                        raise
+
+                    pending.append(executor.submit(convert_page, docs,
+                            self.journals))
+                    if len(pending) >= self.workers:
+                        documents += self._write(pending.popleft().result())
+                        self._report(documents, start)
+
+                documents += self._write_all(pending, start, documents)
+            finally:
+                for future in pending:
+                    future.cancel()
+                pages.close()
+
+        return SyncStats(documents=documents, elapsed=self.clock() - start)
+
+    def _write(self, converted):
+        resources, processing_date = converted
+        write(self.ds, resources)
+        # páginas sem documentos obtidos mantêm a marca d'água anterior.
+        if processing_date is not None:
+            self.checkpoint.save(processing_date)
+        return len(resources)
+
+    def _write_all(self, pending, start, documents):
+        written = 0
+        while pending:
+            written += self._write(pending.popleft().result())
+            self._report(documents + written, start)
+        return written
+
+    def _report(self, documents, start):
+        stats = SyncStats(documents=documents, elapsed=self.clock() - start)
+        LOGGER.info('%d documents synchronized (%.1f documents/s)',
+                documents, documents_per_second(stats))
+
+
+def sync_journals(client, ds, page_size=1000):
+    """Substitui os periódicos de ``ds`` pelos de ``client``, caso ``ds``
+    implemente ``add_journal``.
+    """
+    offset = 0
+    while True:
+        journals = list(client.journals(offset=offset, limit=page_size,
+                summary=True))
+        for journal in journals:
+            if journal is not None:
+                ds.add_journal(journal)
+        if len(journals) < page_size:
+            return
+        offset += page_size
+
+
+Partition = collections.namedtuple('Partition', 'name view from_date until')
+
+
+ImportReport = collections.namedtuple('ImportReport', '''documents elapsed
+        failed expected stored''')
+
+
+def date_partitions(from_date, until, days):
+    """Partições de ``days`` dias de ``processing_date`` no intervalo
+    fechado ``[from_date, until]``, ambos no formato ``YYYY-MM-DD``.
+    """
+    start = datetime.datetime.strptime(from_date, '%Y-%m-%d').date()
+    end = datetime.datetime.strptime(until, '%Y-%m-%d').date()
+    step = datetime.timedelta(days=days)
+    partitions = []
+    while start <= end:
+        stop = min(start + step - datetime.timedelta(days=1), end)
+        partitions.append(Partition(name='%s:%s' % (start, stop),
+            view=identityview, from_date=start.isoformat(),
+            until=stop.isoformat()))
+        start = stop + datetime.timedelta(days=1)
+    return partitions
+
+
+def journal_partitions(issns, from_date=None, until=None):
+    """Uma partição para cada periódico de ``issns``.
+    """
+    return [Partition(name=issn,
+                view=articlemeta.ArticleMetaFilteredView({'code_title': issn}),
+                from_date=from_date, until=until)
+            for issn in issns]
+
+
+def count_identifiers(client, from_date=None, until=None, page_size=1000):
+    """Quantidade de documentos de ``client`` no intervalo de datas.
+    """
+    count = offset = 0
+    while True:
+        page = len(list(client.identifiers(from_date=from_date,
+                until_date=until, offset=offset, limit=page_size)))
+        count += page
+        if page < page_size:
+            return count
+        offset += page_size
+
+
+def date_range(partitions):
+    """Intervalo de datas que compreende todas as ``partitions``. ``None``
+    representa um intervalo aberto.
+    """
+    from_dates = [p.from_date for p in partitions]
+    untils = [p.until for p in partitions]
+    return (None if None in from_dates else min(from_dates),
+            None if None in untils else max(untils))
+
+
+def count_resources(ds, from_date=None, until=None, page_size=1000):
+    """Quantidade de recursos de ``ds`` cujo ``datestamp`` pertence ao
+    intervalo fechado ``[from_date, until]``, conforme ``count_identifiers``.
+    Utiliza ``ds.count``, caso exista, ou ``ds.list_headers``.
+    """
+    count = getattr(ds, 'count', None)
+    if count is not None:
+        return count(_from=from_date, until=until)
+
+    total = offset = 0
+    while True:
+        page = len(list(ds.list_headers(offset, page_size, _from=from_date,
+                until=until)))
+        total += page
+        if page < page_size:
+            return total
+        offset += page_size
+
+
+_PAGE = 'page'
+_DONE = 'done'
+
+
+class BulkImporter:
+    """Carga inicial do DataStore ``ds`` à partir de ``client``, com as
+    partições obtidas concorrentemente e gravadas em uma única thread.
+
+    :param client: instância de ``articlemeta.BoundArticleMetaClient``.
+    :param ds: DataStore que implementa ``add`` e, opcionalmente,
+    ``add_many``.
+    :param workers: (opcional) quantidade de partições obtidas e convertidas
+    concorrentemente.
+    :param retries: (opcional) quantidade de novas tentativas de cada
+    partição. As tentativas são retomadas a partir da página seguinte à
+    última obtida.
+    :param queue_size: (opcional) quantidade de páginas convertidas à
+    espera da gravação.
+    """
+    def __init__(self, client, ds, workers=8, page_size=1000, retries=3,
+            retry_delay=1.0, queue_size=16, clock=time.monotonic):
+        self.client = client
+        self.ds = ds
+        self.workers = workers
+        self.page_size = page_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.queue_size = queue_size
+        self.clock = clock
+        self.journals = articlemeta.JournalMetadataCache()
+
+    def run(self, partitions, reconcile=True) -> ImportReport:
+        start = self.clock()
+        results = queue.Queue(self.queue_size)
+        stopped = threading.Event()
+        documents = 0
+        failed = []
+
+        with futures.ThreadPoolExecutor(max_workers=self.workers,
+                thread_name_prefix='bulk-import') as executor:
+            for partition in partitions:
+                executor.submit(self._import_partition, partition, results,
+                        stopped)
+            try:
+                remaining = len(partitions)
+                while remaining:
+                    kind, partition, value = results.get()
+                    if kind == _PAGE:
+                        write(self.ds, value)
+                        documents += len(value)
+                        continue
+
+                    remaining -= 1
+                    if value is not None:
+                        failed.append(partition)
+                    LOGGER.info('%d of %d partitions imported, %d documents '
+                            '(%.1f documents/s)',
+                            len(partitions) - remaining, len(partitions),
+                            documents, documents_per_second(SyncStats(
+                                documents, self.clock() - start)))
+            finally:
+                stopped.set()
+
+        if reconcile:
+            from_date, until = date_range(partitions)
+            expected = count_identifiers(self.client, from_date, until)
+            stored = count_resources(self.ds, from_date, until)
+            if expected != stored:
+                LOGGER.warning('%d documents expected, %d stored', expected,
+                        stored)
+        else:
+            expected = stored = None
+
+        return ImportReport(documents=documents,
+                elapsed=self.clock() - start, failed=failed,
+                expected=expected, stored=stored)
+
+    def _import_partition(self, partition, results, stopped):
+        offset = 0
+        attempts = 0
+        while True:
+            try:
+                for docs in fetch_pages(self.client, self.page_size,
+                        from_date=partition.from_date, until=partition.until,
+                        view=partition.view, offset=offset):
+                    resources, _ = convert_page(docs, self.journals)
+                    if not put(results, (_PAGE, partition, resources),
+                            stopped):
+                        return
+                    offset += len(docs)
+            except Exception as exc:
+                attempts += 1
+                if attempts > self.retries or stopped.is_set():
+                    LOGGER.exception('could not import partition %s',
+                            partition.name)
+                    put(results, (_DONE, partition, exc), stopped)
+                    return
+                LOGGER.warning('retrying partition %s (%s)', partition.name,
+                        exc)
+                stopped.wait(self.retry_delay * attempts)
+            else:
+                put(results, (_DONE, partition, None), stopped)
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description='Sincroniza um espelho SQLite com o ArticleMeta.')
+    parser.add_argument('--sqlite', required=True,
+            help='caminho do banco de dados do espelho')
+    parser.add_argument('--checkpoint', required=True,
+            help="arquivo em que a marca d'água é mantida")
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--until', help='data limite, no formato YYYY-MM-DD')
+    parser.add_argument('--no-journals', action='store_true',
+            help='não sincroniza os periódicos')
+    parser.add_argument('--bulk', choices=['date', 'journal'],
+            help='realiza a carga inicial, particionada por intervalos de '
+                 'datas ou por periódicos')
+    parser.add_argument('--from', dest='from_date',
+            default=articlemeta_client.DEFAULT_FROM_DATE,
+            help='data inicial da carga, no formato YYYY-MM-DD')
+    parser.add_argument('--days', type=int, default=365,
+            help='dias de cada partição da carga por datas')
+    parser.add_argument('--retries', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    settings = oaipmh.parse_settings({})
+    client = articlemeta.get_articlemeta_client(settings['oaipmh.collection'],
+            domain=settings['oaipmh.articlemeta.domain'] or None,
+            fetch_workers=settings['oaipmh.articlemeta.fetchworkers'],
+            fetch_timeout=settings['oaipmh.articlemeta.fetchtimeout'],
+            pool_size=max(args.workers,
+                          settings['oaipmh.articlemeta.poolsize']),
+            pool_idle_timeout=settings['oaipmh.articlemeta.poolidletimeout'])
+    ds = sqlitestore.SQLite(args.sqlite)
+
+    if not args.no_journals or args.bulk == 'journal':
+        sync_journals(client, ds)
+
+    if args.bulk:
+        until = args.until or datetime.date.today().isoformat()
+        if args.bulk == 'date':
+            partitions = date_partitions(args.from_date, until, args.days)
+        else:
+            partitions = journal_partitions(
+                    [j.lead_issn for j in ds.list_journals(0, 1000000)],
+                    from_date=args.from_date, until=until)
+
+        report = BulkImporter(client, ds, workers=args.workers,
+                page_size=args.page_size, retries=args.retries).run(
+                        partitions)
+        print('%d documents imported in %.1fs (%.1f documents/s); '
+              '%d expected, %d stored; %d failed partitions' % (
+            report.documents, report.elapsed,
+            documents_per_second(SyncStats(report.documents, report.elapsed)),
+            report.expected, report.stored, len(report.failed)))
+        if report.failed:
+            raise SystemExit(1)
+        # a sincronização incremental prossegue a partir do último dia da
+        # carga, cujos documentos são obtidos novamente.
+        Checkpoint(args.checkpoint).save(until)
+        return
+
+    stats = Synchronizer(client, ds, Checkpoint(args.checkpoint),
+            page_size=args.page_size, workers=args.workers).run(
+                    until=args.until)
+    print('%d documents synchronized in %.1fs (%.1f documents/s)' % (
+        stats.documents, stats.elapsed, documents_per_second(stats)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""Pool de conexões persistentes para clientes Thrift.
+
+Cada conexão é uma instância de ``thriftpy.thrift.TClient`` produzida pela
+função ``connect``. As conexões ociosas são reutilizadas na ordem inversa
+em que foram devolvidas, de maneira que as menos utilizadas tendem a
+permanecer ociosas até que sejam recicladas.
+"""
+import collections
+import contextlib
+import logging
+import socket
+import threading
+import time
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+PoolStats = collections.namedtuple('PoolStats', '''maxsize in_use idle
+        created destroyed waits wait_time''')
+
+
+class PoolTimeoutError(Exception):
+    """Quando não há conexão disponível no pool dentro do tempo de espera.
+    """
+
+
+def get_socket(client):
+    """Obtém o socket subjacente ao ``client``, ou ``None``.
+
+    O socket é encapsulado por um ou mais transportes, cujos atributos variam
+    conforme a implementação (Python ou Cython) utilizada.
+    """
+    obj = client._iprot.trans
+    for _ in range(3):
+        if obj is None or isinstance(obj, socket.socket):
+            return obj
+        obj = getattr(obj, 'sock', None) or getattr(obj, '_trans', None)
+    return None
+
+
+def is_connection_alive(client):
+    """Verifica, sem bloquear, se a conexão do ``client`` continua aberta.
+
+    Uma conexão encerrada pelo servidor é sinalizada pela leitura de 0 bytes.
+    Bytes pendentes também invalidam a conexão, pois não pertencem a nenhuma
+    chamada em andamento.
+    """
+    sock = get_socket(client)
+    if sock is None:
+        return False
+
+    timeout = sock.gettimeout()
+    try:
+        sock.setblocking(False)
+        sock.recv(1, socket.MSG_PEEK)
+    except (BlockingIOError, InterruptedError):
+        return True
+    except OSError:
+        return False
+    else:
+        return False
+    finally:
+        try:
+            sock.settimeout(timeout)
+        except OSError:
+            pass
+
+
+class ConnectionPool:
+    """Pool de conexões limitado a ``maxsize`` conexões simultâneas.
+
+    :param connect: função sem argumentos que produz uma nova conexão.
+    :param maxsize: quantidade máxima de conexões, em uso ou ociosas.
+    :param idle_timeout: (opcional) segundos após os quais uma conexão ociosa
+    é encerrada.
+    :param wait_timeout: (opcional) segundos de espera por uma conexão
+    quando todas estão em uso. ``None`` aguarda indefinidamente.
+    :param reusable_errors: (opcional) exceções que não invalidam a conexão
+    em uso, e.g. exceções declaradas na IDL do serviço.
+    :param is_alive: (opcional) função que verifica a saúde da conexão antes
+    que seja entregue.
+    """
+    def __init__(self, connect, maxsize=10, idle_timeout=None,
+            wait_timeout=None, reusable_errors=(),
+            is_alive=is_connection_alive, clock=time.monotonic):
+        self.connect = connect
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self.reusable_errors = reusable_errors
+        self.is_alive = is_alive
+        self.clock = clock
+        self._idle = collections.deque()
+        self._in_use = 0
+        self._created = 0
+        self._destroyed = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._cond = threading.Condition()
+
+    def _is_expired(self, last_used, now):
+        return (self.idle_timeout is not None and
+                now - last_used > self.idle_timeout)
+
+    def _destroy(self, conn):
+        self._destroyed += 1
+        try:
+            conn.close()
+        except Exception as exc:
+            LOGGER.debug('error while closing a pooled connection: %s', exc)
+
+    def _prune(self, now):
+        """Encerra as conexões ociosas há mais de ``idle_timeout`` segundos.
+        As mais antigas estão sempre à esquerda.
+        """
+        while self._idle and self._is_expired(self._idle[0][1], now):
+            conn, _ = self._idle.popleft()
+            self._destroy(conn)
+
+    def acquire(self):
+        """Obtém uma conexão do pool, produzindo uma nova caso nenhuma
+        conexão ociosa esteja disponível e o limite não tenha sido atingido.
+        """
+        start = self.clock()
+        with self._cond:
+            while True:
+                now = self.clock()
+                self._prune(now)
+                while self._idle:
+                    conn, _ = self._idle.pop()
+                    if self.is_alive(conn):
+                        self._in_use += 1
+                        return conn
+                    self._destroy(conn)
+
+                if self._in_use < self.maxsize:
+                    self._in_use += 1
+                    break
+
+                if self.wait_timeout is None:
+                    remaining = None
+                else:
+                    remaining = self.wait_timeout - (now - start)
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                                'no connection available after %s seconds' %
+                                self.wait_timeout)
+
+                self._waits += 1
+                waiting_since = self.clock()
+                self._cond.wait(remaining)
+                self._wait_time += self.clock() - waiting_since
+
+        try:
+            conn = self.connect()
+        except BaseException:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def release(self, conn, discard=False):
+        """Devolve ``conn`` ao pool, ou a encerra caso ``discard`` seja
+        verdadeiro.
+        """
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._destroy(conn)
+            else:
+                now = self.clock()
+                self._idle.append((conn, now))
+                self._prune(now)
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Gerenciador de contexto que obtém e devolve uma conexão. A conexão
+        é descartada caso uma exceção não listada em ``reusable_errors`` seja
+        levantada durante o seu uso.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        except self.reusable_errors:
+            self.release(conn)
+            raise
+        except BaseException:
+            self.release(conn, discard=True)
+            raise
+        else:
+            self.release(conn)
+
+    def close(self):
+        """Encerra todas as conexões ociosas.
+        """
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._destroy(conn)
+
+    def stats(self):
+        with self._cond:
+            return PoolStats(maxsize=self.maxsize, in_use=self._in_use,
+                    idle=len(self._idle), created=self._created,
+                    destroyed=self._destroyed, waits=self._waits,
+                    wait_time=self._wait_time)
@@ -0,0 +1,210 @@
+"""Medição do tempo gasto em cada etapa do tratamento de uma requisição.
+
+As etapas são registradas em uma instância de ``Timings`` ativa na thread
+corrente, por meio de ``Timings.activate``. Na ausência de uma instância
+ativa, ``stage`` produz um gerenciador de contexto inócuo, enquanto
+``timed`` e ``iterate`` retornam a função e o iterável recebidos, de maneira
+que o custo da instrumentação seja desprezível quando desabilitada.
+
+O tempo de cada etapa exclui o das etapas aninhadas, e.g. o tempo de
+``format`` é descontado do de ``serialize`` quando os metadados do registro
+são produzidos durante a serialização.
+"""
+import collections
+import threading
+import time
+
+
+__all__ = ['Timings', 'current', 'stage', 'call', 'timed', 'iterate']
+
+
+class _Local(threading.local):
+    # o valor padrão evita o custo de ``AttributeError`` na consulta, feita
+    # em cada etapa instrumentada.
+    timings = None
+
+
+_local = _Local()
+
+
+class _Stage:
+    __slots__ = ('timings', 'name')
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.timings.enter(self.name)
+
+    def __exit__(self, *exc_info):
+        self.timings.exit()
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Timings:
+    """Tempos, em segundos, acumulados por etapa durante uma requisição.
+    """
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started = clock()
+        self.durations = collections.OrderedDict()
+        self._stack = []
+
+    def enter(self, name):
+        self._stack.append([name, self.clock(), 0.0])
+
+    def exit(self):
+        name, start, nested = self._stack.pop()
+        elapsed = self.clock() - start
+        self.durations[name] = self.durations.get(name, 0.0) + elapsed - nested
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def iterate(self, name, iterable):
+        """Itera ``iterable`` registrando o tempo de obtenção de cada item
+        como da etapa ``name``.
+        """
+        with self.stage(name):
+            iterator = iter(iterable)
+        while True:
+            self.enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.exit()
+            yield item
+
+    def activate(self):
+        """Gerenciador de contexto que torna esta a instância ativa na
+        thread corrente.
+        """
+        return _Activation(self)
+
+    def iter_active(self, iterable):
+        """Itera ``iterable`` com esta instância ativa durante a obtenção de
+        cada item, e.g. o corpo de respostas produzidas incrementalmente.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.activate():
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def elapsed(self):
+        return self.clock() - self.started
+
+    def server_timing(self, total=None):
+        """Valor do cabeçalho HTTP ``Server-Timing``, com as durações em
+        milissegundos.
+        """
+        metrics = ['%s;dur=%.2f' % (name, duration * 1000)
+                   for name, duration in self.durations.items()]
+        metrics.append('total;dur=%.2f' % (
+            (self.elapsed() if total is None else total) * 1000))
+        return ', '.join(metrics)
+
+    def asdict(self, total=None):
+        """Durações em milissegundos, incluindo ``total`` e ``other``, o
+        tempo não atribuído a nenhuma etapa.
+        """
+        total = self.elapsed() if total is None else total
+        data = collections.OrderedDict(
+                (name, round(duration * 1000, 3))
+                for name, duration in self.durations.items())
+        data['other'] = round(
+                (total - sum(self.durations.values())) * 1000, 3)
+        data['total'] = round(total * 1000, 3)
+        return data
+
+
+class _Activation:
+    __slots__ = ('timings', 'previous')
+
+    def __init__(self, timings):
+        self.timings = timings
+        self.previous = None
+
+    def __enter__(self):
+        self.previous = _local.timings
+        _local.timings = self.timings
+        return self.timings
+
+    def __exit__(self, *exc_info):
+        _local.timings = self.previous
+        return False
+
+
+def current():
+    """Instância de ``Timings`` ativa na thread corrente, ou ``None``.
+    """
+    return _local.timings
+
+
+def stage(name):
+    """Gerenciador de contexto que registra o tempo do bloco como da etapa
+    ``name``.
+    """
+    timings = _local.timings
+    if timings is None:
+        return _NULL_STAGE
+    return _Stage(timings, name)
+
+
+def call(name, fn):
+    """Chama ``fn``, sem argumentos, registrando o tempo como da etapa
+    ``name``. Mais barata que ``stage`` quando não há uma instância ativa,
+    e por isso adequada a etapas executadas para cada atributo de cada
+    registro.
+    """
+    timings = _local.timings
+    if timings is None:
+        return fn()
+    with _Stage(timings, name):
+        return fn()
+
+
+def timed(name, fn):
+    """Produz a função que registra o tempo de cada chamada a ``fn`` como
+    da etapa ``name``. Retorna ``fn`` caso não haja uma instância ativa.
+    """
+    timings = _local.timings
+    if timings is None:
+        return fn
+
+    def wrapper(*args, **kwargs):
+        with _Stage(timings, name):
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def iterate(name, iterable):
+    """Veja ``Timings.iterate``. Retorna ``iterable`` caso não haja uma
+    instância ativa.
+    """
+    timings = _local.timings
+    if timings is None:
+        return iterable
+    return timings.iterate(name, iterable)
@@ -1,16 +1,71 @@
+import json
+import logging
+
 from pyramid.view import view_config
 from pyramid.response import Response
 from pyramid import httpexceptions
 
-from oaipmh import repository
+from oaipmh import repository, timing
+
+
+LOGGER = logging.getLogger(__name__)
 
 
 def xml_response(body):
-    return Response(body=body, charset='utf-8', content_type='application/xml')
+    """Produz a resposta HTTP à partir de ``body``, que pode ser ``bytes``
+    ou um iterável de ``bytes``. Neste último caso, o corpo da resposta é
+    enviado incrementalmente.
+    """
+    if isinstance(body, bytes):
+        return Response(body=body, charset='utf-8',
+                content_type='application/xml')
+    return Response(app_iter=body, charset='utf-8',
+            content_type='application/xml')
+
+
+def log_timings(verb, timings, total=None):
+    data = timings.asdict(total)
+    LOGGER.info('OAI request timings: %s',
+            json.dumps(dict(verb=verb, **data)),
+            extra={'verb': verb, 'timings': data})
+
+
+def iter_timed_body(verb, timings, body):
+    """Produz ``body`` com ``timings`` ativa, registrando os tempos após o
+    envio do último fragmento ou a interrupção da resposta.
+    """
+    try:
+        yield from timings.iter_active(body)
+    finally:
+        log_timings(verb, timings)
+
+
+def timed_response(request):
+    """Trata a requisição com os tempos de cada etapa registrados no
+    cabeçalho ``Server-Timing`` e em uma linha de log.
+
+    Nas respostas produzidas incrementalmente o cabeçalho contém apenas as
+    etapas anteriores ao início da resposta, enquanto a linha de log, emitida
+    ao seu término, contém todas.
+    """
+    verb = request.GET.get('verb')
+    timings = timing.Timings()
+    with timings.activate():
+        body = request.repository.handle_request(request.query_string)
+
+    total = timings.elapsed()
+    if isinstance(body, bytes):
+        response = xml_response(body)
+        log_timings(verb, timings, total)
+    else:
+        response = xml_response(iter_timed_body(verb, timings, body))
+    response.headers['Server-Timing'] = timings.server_timing(total)
+    return response
 
 
 @view_config(route_name='root')
 def root(request):
+    if request.registry.settings.get('oaipmh.timing'):
+        return timed_response(request)
     body = request.repository.handle_request(request.query_string)
     return xml_response(body)
-
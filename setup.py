@@ -48,6 +48,9 @@ setup(
         'paste.app_factory': [
             'main = oaipmh:main',
         ],
+        'console_scripts': [
+            'oaipmh-sync = oaipmh.sync:main',
+        ],
     },
 )
 
@@ -1,5 +1,7 @@
 from datetime import datetime
 
+from xylose.scielodocument import Article
+
 from oaipmh.datastores import Resource
 from oaipmh.repository import RepositoryMeta, OAIRequest
 
@@ -64,3 +66,36 @@ def get_sample_request(**kwargs):
     data.update(**kwargs)
     return OAIRequest(**data)
 
+
+
+def get_sample_article(code='S0001-37652000000100001',
+        processing_date='2017-06-14', issn='0001-3765'):
+    """Instância de ``xylose.scielodocument.Article`` com os metadados
+    necessários a ``articlemeta.ArticleResourceFacade``.
+    """
+    return Article({
+        'code': code,
+        'collection': 'scl',
+        'processing_date': processing_date,
+        'license': 'by/4.0',
+        'title': {
+            'v100': [{'_': 'Anais da Academia Brasileira de Ciências'}],
+            'v400': [{'_': issn}],
+            'v435': [{'_': issn, 't': 'PRINT'}],
+            'v480': [{'_': 'Academia Brasileira de Ciências'}],
+        },
+        'issue': {
+            'issue': {
+                'v31': [{'_': '72'}],
+                'v32': [{'_': '1'}],
+                'v65': [{'_': '20000301'}],
+            },
+        },
+        'article': {
+            'v880': [{'_': code}],
+            'v40': [{'_': 'en'}],
+            'v12': [{'_': 'Title', 'l': 'en'}],
+            'v65': [{'_': '20000301'}],
+            'v71': [{'_': 'oa'}],
+        },
+    })
@@ -0,0 +1,106 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+from pyramid import testing
+
+import oaipmh
+from oaipmh import views, timing
+
+
+class RepositoryProviderTests(unittest.TestCase):
+    def test_instance_is_built_lazily(self):
+        calls = []
+        provider = oaipmh.RepositoryProvider(lambda: calls.append(1))
+        self.assertEqual(calls, [])
+
+        provider.get()
+        self.assertEqual(calls, [1])
+
+    def test_instance_is_reused(self):
+        provider = oaipmh.RepositoryProvider(object)
+        self.assertIs(provider.get(), provider.get())
+
+    def test_instance_is_rebuilt_after_fork(self):
+        provider = oaipmh.RepositoryProvider(object)
+        first = provider.get()
+
+        with patch('oaipmh.os.getpid', return_value=-1):
+            second = provider.get()
+
+        self.assertIsNot(first, second)
+
+    def test_concurrent_access_builds_a_single_instance(self):
+        calls = []
+        barrier = threading.Barrier(8)
+
+        def factory():
+            calls.append(1)
+            return object()
+
+        provider = oaipmh.RepositoryProvider(factory)
+
+        def worker():
+            barrier.wait()
+            provider.get()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+
+
+class XMLResponseTests(unittest.TestCase):
+    def test_bytes(self):
+        response = views.xml_response(b'<OAI-PMH/>')
+        self.assertEqual(response.body, b'<OAI-PMH/>')
+        self.assertEqual(response.content_type, 'application/xml')
+
+    def test_iterables_are_streamed(self):
+        chunks = iter([b'<OAI-PMH>', b'</OAI-PMH>'])
+        response = views.xml_response(chunks)
+        self.assertIs(response.app_iter, chunks)
+        self.assertEqual(response.charset, 'utf-8')
+
+
+class RepositoryStub:
+    def __init__(self, body):
+        self.body = body
+
+    def handle_request(self, qstr):
+        with timing.stage('parse'):
+            pass
+        return self.body
+
+
+class TimedResponseTests(unittest.TestCase):
+    def make_request(self, body):
+        request = testing.DummyRequest(params={'verb': 'Identify'})
+        request.repository = RepositoryStub(body)
+        return request
+
+    def test_bytes(self):
+        with self.assertLogs('oaipmh.views', 'INFO') as logs:
+            response = views.timed_response(self.make_request(b'<OAI-PMH/>'))
+
+        self.assertEqual(response.body, b'<OAI-PMH/>')
+        self.assertRegex(response.headers['Server-Timing'],
+                r'^parse;dur=[\d.]+, total;dur=[\d.]+$')
+        self.assertIn('"verb": "Identify"', logs.output[0])
+
+    def test_timings_are_logged_after_streamed_body(self):
+        def body():
+            yield b'<OAI-PMH>'
+            with timing.stage('serialize'):
+                yield b'</OAI-PMH>'
+
+        response = views.timed_response(self.make_request(body()))
+        self.assertNotIn('serialize', response.headers['Server-Timing'])
+
+        with self.assertLogs('oaipmh.views', 'INFO') as logs:
+            self.assertEqual(b''.join(response.app_iter),
+                    b'<OAI-PMH></OAI-PMH>')
+        self.assertIn('"serialize"', logs.output[0])
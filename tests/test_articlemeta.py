@@ -1,8 +1,19 @@
 import os
+import json
+import time
 import unittest
+import threading
+import contextlib
+from collections import namedtuple
 from datetime import datetime
 
-from oaipmh import articlemeta, entities
+from articlemeta import client as articlemeta_client
+from thriftpy.thrift import TApplicationException
+from xylose.scielodocument import Article, Journal
+
+from .fixtures import factories
+from oaipmh import articlemeta, entities, cache
+from oaipmh.formatters import oai_dc_openaire
 
 
 class ArticleMetaStub:
@@ -33,9 +44,26 @@ class ArticleMetaStub:
     @property
     def journal(self):
         class JournalStub:
+            title = 'Acta Limnologica Brasiliensia'
             publisher_name = 'Editora Foo'
+            abbreviated_title = 'Acta Limnol. Bras.'
+            electronic_issn = None
+            print_issn = None
         return JournalStub()
 
+    @property
+    def issue(self):
+        class IssueStub:
+            volume = '23'
+            number = '3'
+            supplement_volume = None
+            supplement_number = None
+        return IssueStub()
+
+    start_page = '245'
+    end_page = '248'
+    elocation = None
+
     publication_date = '2012-02-16'
     document_type = 'research-article'
     def html_url(self):
@@ -129,6 +157,66 @@ class ResourceFacadeTests(unittest.TestCase):
         self.assertIsInstance(resource, entities.Resource)
 
 
+class CountingArticleStub(ArticleMetaStub):
+    def __init__(self):
+        self.calls = []
+
+    def original_language(self):
+        self.calls.append('original_language')
+        return super().original_language()
+
+    def html_url(self):
+        self.calls.append('html_url')
+        return super().html_url()
+
+    def bibliographic_legends(self):
+        self.calls.append('bibliographic_legends')
+        return super().bibliographic_legends()
+
+
+class LazyResourceTests(unittest.TestCase):
+    def setUp(self):
+        self.article = CountingArticleStub()
+        self.resource = articlemeta.ArticleResourceFacade(
+                self.article).to_lazy_resource()
+
+    def test_equals_the_eager_resource(self):
+        expected = articlemeta.ArticleResourceFacade(
+                ArticleMetaStub()).to_resource()
+        self.assertEqual(self.resource, expected)
+        self.assertEqual(self.resource.to_resource(), expected)
+
+    def test_fields_are_produced_on_access(self):
+        self.assertEqual(self.resource.ridentifier, 'S2179-975X2011000300002')
+        self.assertEqual(self.article.calls, [])
+
+    def test_fields_are_memoized(self):
+        self.resource.identifier
+        self.resource.identifier
+        self.assertEqual(self.article.calls, ['html_url'])
+
+    def test_original_language_is_shared(self):
+        self.resource.to_resource()
+        self.assertEqual(self.article.calls.count('original_language'), 1)
+
+    def test_dict_style_access(self):
+        data = self.resource._asdict()
+        self.assertEqual(data['language'], ['en'])
+        self.assertEqual(data.get('missing', []), [])
+        self.assertEqual(sorted(data), sorted(entities.Resource._fields))
+        self.assertNotIn('bibliographic_legends', self.article.calls)
+
+    def test_replace(self):
+        resource = self.resource._replace(rights=['foo'])
+        self.assertEqual(resource.rights, ['foo'])
+        self.assertEqual(self.resource.rights,
+                ['http://creativecommons.org/licenses/by-nc/4.0/'])
+        self.assertRaises(ValueError, lambda: self.resource._replace(foo=1))
+
+    def test_unknown_attributes(self):
+        self.assertRaises(AttributeError, lambda: self.resource.foo)
+
+
 class ArticleMetaTests(unittest.TestCase):
     def test_get_known_resource_returns_namedtuple_resource(self):
         class ClientStub:
@@ -138,3 +226,399 @@ class ArticleMetaTests(unittest.TestCase):
         am = articlemeta.ArticleMeta(ClientStub())
         self.assertIsInstance(am.get('validID'), entities.Resource)
 
+
+class CachingClientStub:
+    def __init__(self, processing_date='2012-04-19'):
+        self.processing_date_value = processing_date
+        self.calls = 0
+
+    def document(self, ridentifier):
+        self.calls += 1
+        return ArticleMetaStub()
+
+    def processing_date(self, code):
+        return self.processing_date_value
+
+
+class ArticleMetaCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.cache = cache.TTLCache(10)
+
+    def test_resources_are_cached(self):
+        client = CachingClientStub()
+        am = articlemeta.ArticleMeta(client, resource_cache=self.cache)
+
+        self.assertEqual(am.get('validID'), am.get('validID'))
+        self.assertEqual(client.calls, 1)
+        self.assertEqual(self.cache.stats().hits, 1)
+
+    def test_cached_resources_are_not_mutated(self):
+        client = CachingClientStub()
+        am = articlemeta.ArticleMeta(client, resource_cache=self.cache)
+
+        oai_dc_openaire.augment_metadata(am.get('validID'))
+        self.assertEqual(am.get('validID').rights,
+                ['http://creativecommons.org/licenses/by-nc/4.0/'])
+
+    def test_cached_resources_are_shared(self):
+        client = CachingClientStub()
+        am = articlemeta.ArticleMeta(client, resource_cache=self.cache)
+
+        self.assertIs(am.get('validID'), am.get('validID'))
+
+    def test_fresh_resources_are_kept(self):
+        client = CachingClientStub()
+        am = articlemeta.ArticleMeta(client, resource_cache=self.cache,
+                revalidate=True)
+
+        am.get('validID')
+        am.get('validID')
+        self.assertEqual(client.calls, 1)
+
+    def test_stale_resources_are_retrieved_again(self):
+        client = CachingClientStub()
+        am = articlemeta.ArticleMeta(client, resource_cache=self.cache,
+                revalidate=True)
+
+        am.get('validID')
+        client.processing_date_value = '2013-01-01'
+        am.get('validID')
+        self.assertEqual(client.calls, 2)
+
+
+
+class ThriftClientStub:
+    """Imita o cliente produzido por ``client_context``.
+    """
+    def __init__(self, bulk=True):
+        self.bulk = bulk
+        self.calls = []
+
+    def get_articles(self, **kwargs):
+        self.calls.append('get_articles')
+        if not self.bulk:
+            raise TApplicationException(TApplicationException.UNKNOWN_METHOD)
+        return json.dumps({'objects': [
+            {'article': {'v880': [{'_': 'S0001-37652000000100001'}]}},
+            {'article': {'v880': [{'_': 'S0001-37652000000100002'}]}},
+            ]})
+
+    def get_article_identifiers(self, **kwargs):
+        self.calls.append('get_article_identifiers')
+        return [IdentifierStub('S0001-37652000000100001', 'scl'),
+                IdentifierStub('S0001-37652000000100002', 'scl')]
+
+
+IdentifierStub = namedtuple('IdentifierStub', 'code collection')
+
+
+@contextlib.contextmanager
+def client_context_stub(stub):
+    yield stub
+
+
+def make_sliceable_client(stub, **kwargs):
+    client = articlemeta.SliceableResultSetThriftClient(**kwargs)
+    client.client_context = lambda: client_context_stub(stub)
+    client.document = lambda code, collection, **kwargs: Article(
+            {'article': {'v880': [{'_': code}]}})
+    return client
+
+
+class SliceableResultSetThriftClientTests(unittest.TestCase):
+    def test_documents_are_retrieved_in_bulk(self):
+        stub = ThriftClientStub()
+        client = make_sliceable_client(stub)
+
+        docs = list(client.documents(collection='scl', limit=2))
+
+        self.assertEqual([doc.publisher_id for doc in docs],
+                ['S0001-37652000000100001', 'S0001-37652000000100002'])
+        self.assertEqual(stub.calls, ['get_articles'])
+
+    def test_fallback_when_bulk_is_not_implemented(self):
+        stub = ThriftClientStub(bulk=False)
+        client = make_sliceable_client(stub)
+
+        docs = list(client.documents(collection='scl', limit=2))
+
+        self.assertEqual([doc.publisher_id for doc in docs],
+                ['S0001-37652000000100001', 'S0001-37652000000100002'])
+        self.assertEqual(stub.calls,
+                ['get_articles', 'get_article_identifiers'])
+
+    def test_bulk_is_not_retried_after_fallback(self):
+        stub = ThriftClientStub(bulk=False)
+        client = make_sliceable_client(stub)
+
+        list(client.documents(collection='scl', limit=2))
+        list(client.documents(collection='scl', limit=2))
+
+        self.assertEqual(stub.calls.count('get_articles'), 1)
+
+    def test_bulk_can_be_disabled(self):
+        stub = ThriftClientStub()
+        client = make_sliceable_client(stub, bulk=False)
+
+        list(client.documents(collection='scl', limit=2))
+
+        self.assertEqual(stub.calls, ['get_article_identifiers'])
+
+    def test_only_identifiers_skips_bulk(self):
+        stub = ThriftClientStub()
+        client = make_sliceable_client(stub)
+
+        ids = list(client.documents(collection='scl', limit=2,
+            only_identifiers=True))
+
+        self.assertEqual([i.code for i in ids],
+                ['S0001-37652000000100001', 'S0001-37652000000100002'])
+        self.assertEqual(stub.calls, ['get_article_identifiers'])
+
+
+class ConcurrentFetchTests(unittest.TestCase):
+    def make_client(self, delays, on_fetch=None, **kwargs):
+        stub = ThriftClientStub(bulk=False)
+        stub.get_article_identifiers = lambda **kwargs: [
+                IdentifierStub(code, 'scl') for code in sorted(delays)]
+        client = make_sliceable_client(stub, fetch_workers=4, **kwargs)
+
+        def document(code, collection, **kwargs):
+            if on_fetch:
+                on_fetch()
+            time.sleep(delays[code])
+            return Article({'article': {'v880': [{'_': code}]}})
+
+        client.document = document
+        return client
+
+    def test_identifiers_order_is_preserved(self):
+        delays = {'S0001-3765200000010000%s' % i: 0.05 - i * 0.01
+                  for i in range(5)}
+        client = self.make_client(delays)
+
+        docs = list(client.documents(collection='scl', limit=5))
+
+        self.assertEqual([doc.publisher_id for doc in docs], sorted(delays))
+
+    def test_documents_are_retrieved_concurrently(self):
+        # as 4 chamadas só ultrapassam a barreira se estiverem em curso
+        # simultaneamente; caso contrário a barreira é rompida.
+        barrier = threading.Barrier(4, timeout=5)
+        delays = {'S0001-3765200000010000%s' % i: 0 for i in range(4)}
+        client = self.make_client(delays, on_fetch=barrier.wait)
+
+        docs = list(client.documents(collection='scl', limit=4))
+
+        self.assertEqual(len(docs), 4)
+        self.assertFalse(barrier.broken)
+
+    def test_timeouts_raise_servererror(self):
+        delays = {'S0001-37652000000100001': 0.5}
+        client = self.make_client(delays, fetch_timeout=0.01)
+
+        with self.assertRaises(articlemeta_client.ServerError):
+            list(client.documents(collection='scl', limit=1))
+
+
+class JournalsFetchTests(unittest.TestCase):
+    def make_client(self, delays, **kwargs):
+        stub = ThriftClientStub()
+        stub.get_journal_identifiers = lambda **kwargs: [
+                IdentifierStub(code, 'scl') for code in sorted(delays)]
+
+        def get_journal(code, collection):
+            time.sleep(delays[code])
+            if code == 'missing':
+                return ''
+            return json.dumps({'v100': [{'_': 'Journal %s' % code}],
+                               'v400': [{'_': code}]})
+
+        stub.get_journal = get_journal
+        return make_sliceable_client(stub, **kwargs)
+
+    def test_summaries(self):
+        client = self.make_client({'0001-3765': 0, '0002-3765': 0})
+        journals = list(client.journals(collection='scl', summary=True))
+        self.assertEqual(journals, [
+            articlemeta.Journal(title='Journal 0001-3765',
+                lead_issn='0001-3765'),
+            articlemeta.Journal(title='Journal 0002-3765',
+                lead_issn='0002-3765'),
+            ])
+
+    def test_missing_journals_are_yielded_as_none(self):
+        client = self.make_client({'0001-3765': 0, 'missing': 0})
+        with self.assertLogs('oaipmh.articlemeta', level='WARNING'):
+            journals = list(client.journals(collection='scl', summary=True))
+        self.assertEqual(journals, [
+            articlemeta.Journal(title='Journal 0001-3765',
+                lead_issn='0001-3765'),
+            None,
+            ])
+
+    def test_journals_are_retrieved_concurrently(self):
+        delays = {'000%s-3765' % i: 0.1 for i in range(4)}
+        client = self.make_client(delays, fetch_workers=4)
+
+        start = time.monotonic()
+        journals = list(client.journals(collection='scl', summary=True))
+        self.assertLess(time.monotonic() - start, 0.3)
+        self.assertEqual([j.lead_issn for j in journals], sorted(delays))
+
+    def test_summary_matches_journal_from_articlemeta(self):
+        data = {'v100': [{'_': 'Revista'}], 'v400': [{'_': '0001-3765'}],
+                'v435': [{'_': '0001-3765', 't': 'PRINT'}]}
+        self.assertEqual(articlemeta.journal_summary_from_json(data),
+                articlemeta.journal_from_articlemeta(Journal(data)))
+
+
+class KeysetFilterTests(unittest.TestCase):
+    def test_view_terms_are_kept(self):
+        term = json.loads(articlemeta.keyset_filter(
+            ('2017-06-14', 'S0001-37652000000100001'),
+            json.dumps({'code_title': '0001-3765'})))
+
+        self.assertEqual(term['code_title'], '0001-3765')
+        self.assertEqual(term['$or'], [
+            {'processing_date': {'$gt': '2017-06-14'}},
+            {'processing_date': '2017-06-14',
+             'code': {'$gt': 'S0001-37652000000100001'}},
+            ])
+
+    def test_documents_after_key(self):
+        class ClientStub:
+            def documents(self, **kwargs):
+                self.kwargs = kwargs
+                return []
+
+        client = articlemeta.BoundArticleMetaClient(ClientStub(), 'scl')
+        client.documents(from_date='2010-01-01', limit=10,
+                after=('2017-06-14', 'S0001-37652000000100001'))
+
+        self.assertEqual(client.client.kwargs['from_date'], '2017-06-14')
+        self.assertIn('$or', json.loads(client.client.kwargs['extra_filter']))
+
+
+DatedIdentifierStub = namedtuple('DatedIdentifierStub',
+        'code collection processing_date')
+
+
+class HeadersClientStub:
+    def __init__(self, count):
+        self.identifiers_list = [DatedIdentifierStub(
+            code='S0001-3765200000010%04d' % i, collection='scl',
+            processing_date='2017-06-14') for i in range(count)]
+        self.identifiers_calls = []
+        self.journal_calls = 0
+
+    def identifiers(self, from_date=None, until_date=None, offset=0,
+            limit=1000, extra_filter=None, after=None):
+        self.identifiers_calls.append(after)
+        return iter(self.identifiers_list[offset:offset + limit])
+
+    def journal(self, issn):
+        self.journal_calls += 1
+        return Journal({'v35': [{'_': 'PRINT'}], 'v935': [{'_': issn}],
+                        'v400': [{'_': issn}]})
+
+    def document(self, ridentifier):
+        raise AssertionError('documents must not be retrieved')
+
+
+class ArticleMetaHeadersTests(unittest.TestCase):
+    def test_one_backend_call_per_page(self):
+        client = HeadersClientStub(50)
+        am = articlemeta.ArticleMeta(client)
+
+        headers = list(am.list_headers(0, 50))
+        self.assertEqual(len(headers), 50)
+        self.assertEqual(len(client.identifiers_calls), 1)
+
+    def test_headers(self):
+        am = articlemeta.ArticleMeta(HeadersClientStub(1))
+
+        header = list(am.list_headers(0, 1))[0]
+        self.assertIsInstance(header, entities.Header)
+        self.assertEqual(header.ridentifier, 'S0001-37652000000100000')
+        self.assertEqual(header.datestamp, datetime(2017, 6, 14))
+        self.assertEqual(header.setspec, ['0001-3765'])
+
+    def test_journals_are_retrieved_once(self):
+        client = HeadersClientStub(50)
+        am = articlemeta.ArticleMeta(client)
+
+        list(am.list_headers(0, 50))
+        list(am.list_headers(0, 50))
+        self.assertEqual(client.journal_calls, 1)
+
+    def test_headers_after_key(self):
+        client = HeadersClientStub(5)
+        am = articlemeta.ArticleMeta(client)
+
+        list(am.list_headers_after(('2017-06-14', 'S0001'), 5))
+        self.assertEqual(client.identifiers_calls, [('2017-06-14', 'S0001')])
+
+    def test_bound_client_identifiers_after_key(self):
+        class ClientStub:
+            def documents(self, **kwargs):
+                self.kwargs = kwargs
+                return []
+
+        client = articlemeta.BoundArticleMetaClient(ClientStub(), 'scl')
+        client.identifiers(limit=10,
+                after=('2017-06-14', 'S0001-37652000000100001'))
+
+        self.assertEqual(client.client.kwargs['from_date'], '2017-06-14')
+        self.assertTrue(client.client.kwargs['only_identifiers'])
+        self.assertIn('$or', json.loads(client.client.kwargs['extra_filter']))
+
+
+class JournalMetadataCacheTests(unittest.TestCase):
+    def get_article(self, code='S0001-37652000000100001', issue=None,
+            pages=None):
+        article = factories.get_sample_article(code=code)
+        article.data['issue']['issue'].update(issue or {})
+        if pages is not None:
+            article.data['article']['v14'] = pages
+        return article
+
+    def test_source_is_the_xylose_legend(self):
+        article = self.get_article(pages=[{'f': '10', 'l': '20'}])
+        facade = articlemeta.ArticleResourceFacade(article,
+                articlemeta.JournalMetadataCache())
+        self.assertEqual(facade.source(),
+                [article.bibliographic_legends()['descriptive_format']])
+
+    def test_journal_metadata_is_shared(self):
+        journals = articlemeta.JournalMetadataCache()
+        for i in range(10):
+            facade = articlemeta.ArticleResourceFacade(self.get_article(
+                code='S0001-3765200000010%04d' % i), journals)
+            self.assertEqual(facade.publisher(),
+                    ['Academia Brasileira de Ciências'])
+            self.assertEqual(facade.setspec(), ['0001-3765'])
+
+        self.assertEqual(journals.journals.stats().misses, 1)
+        self.assertEqual(journals.journals.stats().hits, 9)
+
+    def test_resources_are_equal_to_the_uncached(self):
+        article = self.get_article(pages=[{'f': '10', 'l': '20'}])
+        self.assertEqual(
+                articlemeta.ArticleResourceFacade(article,
+                    articlemeta.JournalMetadataCache()).to_resource(),
+                articlemeta.ArticleResourceFacade(article).to_resource())
+
+    def test_missing_journals(self):
+        journals = articlemeta.JournalMetadataCache()
+        self.assertEqual(journals.journal('0001-3765', lambda: None),
+                articlemeta.MISSING_JOURNAL)
+
+    def test_sources_do_not_share_entries(self):
+        journals = articlemeta.JournalMetadataCache()
+        journals.journal('0001-3765', lambda: None)
+        facade = articlemeta.ArticleResourceFacade(self.get_article(),
+                journals)
+        self.assertEqual(facade.setspec(), ['0001-3765'])
+        self.assertEqual(journals.journal('0001-3765', lambda: None),
+                articlemeta.MISSING_JOURNAL)
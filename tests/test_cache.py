@@ -0,0 +1,82 @@
+import unittest
+
+from oaipmh import cache
+
+
+class ClockStub:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TTLCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = ClockStub()
+        self.cache = cache.TTLCache(2, ttl=10, clock=self.clock)
+
+    def test_missing_keys_return_default(self):
+        self.assertIsNone(self.cache.get('foo'))
+        self.assertEqual(self.cache.get('foo', 'bar'), 'bar')
+
+    def test_put_and_get(self):
+        self.cache.put('foo', 1)
+        self.assertEqual(self.cache.get('foo'), 1)
+
+    def test_items_expire_after_ttl(self):
+        self.cache.put('foo', 1)
+        self.clock.now = 10
+        self.assertIsNone(self.cache.get('foo'))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_items_without_ttl_never_expire(self):
+        c = cache.TTLCache(2, clock=self.clock)
+        c.put('foo', 1)
+        self.clock.now = 10**9
+        self.assertEqual(c.get('foo'), 1)
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.put('foo', 1)
+        self.cache.put('bar', 2)
+        self.cache.get('foo')
+        self.cache.put('baz', 3)
+        self.assertIsNone(self.cache.get('bar'))
+        self.assertEqual(self.cache.get('foo'), 1)
+        self.assertEqual(self.cache.get('baz'), 3)
+
+    def test_invalidate(self):
+        self.cache.put('foo', 1)
+        self.cache.invalidate('foo')
+        self.cache.invalidate('missing')
+        self.assertIsNone(self.cache.get('foo'))
+
+    def test_stats(self):
+        self.cache.put('foo', 1)
+        self.cache.get('foo')
+        self.cache.get('bar')
+        self.cache.put('bar', 2)
+        self.cache.put('baz', 3)
+        self.clock.now = 10
+        self.cache.get('baz')
+
+        self.assertEqual(self.cache.stats(), cache.CacheStats(maxsize=2,
+            size=1, hits=1, misses=2, evictions=2))
+
+
+class CacheNamespaceTests(unittest.TestCase):
+    def test_keys_do_not_collide(self):
+        shared = cache.TTLCache(10)
+        foo = cache.CacheNamespace(shared, 'foo')
+        bar = cache.CacheNamespace(shared, 'bar')
+        foo.put('key', 1)
+        bar.put('key', 2)
+
+        self.assertEqual(foo.get('key'), 1)
+        self.assertEqual(bar.get('key'), 2)
+
+    def test_invalidate(self):
+        foo = cache.CacheNamespace(cache.TTLCache(10), 'foo')
+        foo.put('key', 1)
+        foo.invalidate('key')
+        self.assertIsNone(foo.get('key'))
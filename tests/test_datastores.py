@@ -2,7 +2,7 @@ import os
 import unittest
 
 from .fixtures import factories
-from oaipmh import datastores
+from oaipmh import datastores, articlemeta, entities
 
 
 FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
@@ -39,7 +39,8 @@ class InMemoryTests(unittest.TestCase):
             self.store.add(resource)
 
         retrieved_factories = list(self.store.list(0, 1000))
-        self.assertEqual(sample_factories, retrieved_factories)
+        self.assertEqual(sorted(sample_factories, key=datastores.resource_key),
+                retrieved_factories)
 
     def test_list_single_set(self):
         def set1_view(f):
@@ -132,7 +133,104 @@ class InMemoryTests(unittest.TestCase):
             self.store.add(resource)
 
         set_factories = list(self.store.list(0, 1000, until='2017-06-05'))
-        self.assertEqual(len(set_factories), 5)
+        self.assertEqual(len(set_factories), 6)
+
+
+class InMemoryIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.store = datastores.InMemory()
+        for i in range(30):
+            self.store.add(factories.get_sample_resource(
+                ridentifier='rid%02d' % i, datestamp='2017-06-%02d' % (30 - i),
+                setspec=['set%s' % (i % 3)]))
+
+    def test_resources_are_sorted_by_key(self):
+        resources = list(self.store.list(0, 5))
+        self.assertEqual([r.ridentifier for r in resources],
+                ['rid29', 'rid28', 'rid27', 'rid26', 'rid25'])
+
+    def test_offsets(self):
+        resources = list(self.store.list(28, 5))
+        self.assertEqual([r.ridentifier for r in resources], ['rid01', 'rid00'])
+
+    def test_set_views_use_posting_lists(self):
+        view = articlemeta.ArticleMetaFilteredView({'code_title': 'set1'})
+        resources = list(self.store.list(0, 100, view=view))
+        self.assertEqual(len(resources), 10)
+        self.assertTrue(all(r.setspec == ['set1'] for r in resources))
+
+    def test_set_views_with_dates(self):
+        view = articlemeta.ArticleMetaFilteredView({'code_title': 'set1'})
+        resources = list(self.store.list(0, 100, view=view,
+            _from='2017-06-10', until='2017-06-20'))
+        self.assertEqual([r.datestamp for r in resources],
+                ['2017-06-11', '2017-06-14', '2017-06-17', '2017-06-20'])
+
+    def test_missing_sets(self):
+        view = articlemeta.ArticleMetaFilteredView({'code_title': 'missing'})
+        self.assertEqual(list(self.store.list(0, 100, view=view)), [])
+
+    def test_unsupported_filter_terms(self):
+        view = articlemeta.ArticleMetaFilteredView({'code_title': 'set1',
+            'collection': 'scl'})
+        with self.assertRaises(ValueError):
+            list(self.store.list(0, 100, view=view))
+
+    def test_replaced_resources_are_reindexed(self):
+        self.store.add(factories.get_sample_resource(ridentifier='rid29',
+            datestamp='2017-07-01', setspec=['set9']))
+
+        self.assertEqual(len(list(self.store.list(0, 100))), 30)
+        self.assertEqual(list(self.store.list(29, 1))[0].datestamp,
+                '2017-07-01')
+        view = articlemeta.ArticleMetaFilteredView({'code_title': 'set2'})
+        self.assertEqual(len(list(self.store.list(0, 100, view=view))), 9)
+
+    def test_dates_are_normalized(self):
+        resources = list(self.store.list(0, 100, _from='2017-6-28'))
+        self.assertEqual(len(resources), 3)
+
+
+class KeyIndexTests(unittest.TestCase):
+    def test_keys_are_sorted(self):
+        index = datastores.KeyIndex()
+        for key in [('b', '1'), ('a', '2'), ('a', '1')]:
+            index.add(key)
+        self.assertEqual(index.keys(), [('a', '1'), ('a', '2'), ('b', '1')])
+
+    def test_many_pending_keys(self):
+        index = datastores.KeyIndex()
+        keys = [('2017', '%03d' % i) for i in range(200)]
+        for key in reversed(keys):
+            index.add(key)
+        self.assertEqual(index.keys(), keys)
+
+    def test_discard_pending_key(self):
+        index = datastores.KeyIndex()
+        index.add(('a', '1'))
+        index.add(('a', '2'))
+        index.discard(('a', '1'))
+        self.assertEqual(index.keys(), [('a', '2')])
+
+    def test_keys_are_changed_in_place(self):
+        index = datastores.KeyIndex()
+        index.add(('a', '1'))
+        index.add(('a', '2'))
+        keys = index.keys()
+        index.discard(('a', '1'))
+        index.add(('a', '0'))
+        self.assertIs(index.keys(), keys)
+        self.assertEqual(keys, [('a', '0'), ('a', '2')])
+
+    def test_live_ranges_are_not_changed(self):
+        index = datastores.KeyIndex()
+        index.add(('a', '1'))
+        data = {'1': 'r1', '0': 'r0'}
+        resources = index.range(data, 0, 1).slice(0, 1)
+        index.add(('a', '0'))
+        index.discard(('a', '1'))
+        self.assertEqual(list(resources), ['r1'])
+        self.assertEqual(index.keys(), [('a', '0')])
 
 
 class DatestampToTupleTests(unittest.TestCase):
@@ -144,3 +242,81 @@ class DatestampToTupleTests(unittest.TestCase):
         self.assertRaises(ValueError,
                 lambda: datastores.datestamp_to_tuple('2017-06-X'))
 
+
+
+class InMemoryListAfterTests(unittest.TestCase):
+    def setUp(self):
+        self.store = datastores.InMemory()
+        data = [{'ridentifier': 'rid%02d' % i,
+                 'datestamp': '2017-06-0%s' % (i % 3 + 1)}
+                for i in range(30)]
+        for d in data:
+            self.store.add(factories.get_sample_resource(**d))
+
+    def test_resources_are_sorted_by_key(self):
+        keys = [datastores.resource_key(res)
+                for res in self.store.list_after(None, 1000)]
+        self.assertEqual(len(keys), 30)
+        self.assertEqual(keys, sorted(keys))
+
+    def test_pages_resume_after_the_key(self):
+        first = list(self.store.list_after(None, 10))
+        second = list(self.store.list_after(
+            datastores.resource_key(first[-1]), 10))
+
+        self.assertEqual(first + second,
+                list(self.store.list_after(None, 20)))
+
+    def test_new_resources_do_not_shift_pages(self):
+        first = list(self.store.list_after(None, 10))
+        self.store.add(factories.get_sample_resource(ridentifier='rid00a',
+            datestamp='2017-06-01'))
+        second = list(self.store.list_after(
+            datastores.resource_key(first[-1]), 10))
+
+        self.assertEqual(first[-1].ridentifier, 'rid27')
+        self.assertEqual(second[0].ridentifier, 'rid01')
+
+    def test_from_datestamp(self):
+        resources = list(self.store.list_after(None, 1000,
+            _from='2017-06-03'))
+        self.assertEqual(len(resources), 10)
+
+
+class ListHeadersTests(unittest.TestCase):
+    def setUp(self):
+        self.store = datastores.InMemory()
+        for i in range(10):
+            self.store.add(factories.get_sample_resource(
+                ridentifier='rid%02d' % i, setspec=['set%s' % (i % 2)]))
+
+    def test_headers_are_projected(self):
+        headers = list(self.store.list_headers(0, 1))
+        resource = self.store.get('rid00')
+        self.assertEqual(headers, [entities.Header(ridentifier='rid00',
+            datestamp=resource.datestamp, setspec=['set0'])])
+
+    def test_views(self):
+        view = articlemeta.ArticleMetaFilteredView({'code_title': 'set1'})
+        headers = list(self.store.list_headers(0, 100, view=view))
+        self.assertEqual(len(headers), 5)
+
+    def test_headers_after_key(self):
+        first = list(self.store.list_headers_after(None, 5))
+        second = list(self.store.list_headers_after(
+            datastores.resource_key(first[-1]), 5))
+        self.assertEqual([h.ridentifier for h in first + second],
+                ['rid%02d' % i for i in range(10)])
+
+
+class ResourceKeyTests(unittest.TestCase):
+    def test_datetimes_are_normalized(self):
+        resource = factories.get_sample_resource(ridentifier='foo')
+        self.assertEqual(datastores.resource_key(resource),
+                ('2017-06-14', 'foo'))
+
+    def test_strings_are_kept(self):
+        resource = factories.get_sample_resource(ridentifier='foo',
+                datestamp='2017-06-14')
+        self.assertEqual(datastores.resource_key(resource),
+                ('2017-06-14', 'foo'))
@@ -1,7 +1,11 @@
 import unittest
 from datetime import datetime
 
-from oaipmh.formatters import oai_dc
+from lxml import etree
+
+from .fixtures import factories
+from oaipmh import repository
+from oaipmh.formatters import oai_dc, oai_dc_openaire
 
 
 class MakeTitleTests(unittest.TestCase):
@@ -356,3 +360,55 @@ class MakeSubjectTests(unittest.TestCase):
             self.assertEqual(element.tag,
                     '{http://purl.org/dc/elements/1.1/}subject')
 
+
+
+def make_metadata_by_element(module, resource):
+    """Produz o elemento ``metadata`` como os produtores de elementos
+    registrados individualmente, anteriores a ``dublincore``.
+    """
+    metadata = etree.Element('metadata')
+    oai_rec = etree.SubElement(metadata, '{%s}dc' % oai_dc.OAIDC,
+        nsmap={'oai_dc': oai_dc.OAIDC, 'dc': oai_dc.DC, 'xsi': oai_dc.XSI},
+        attrib=oai_dc.ATTRIB
+    )
+    makers = [module.make_title, module.make_creator, module.make_contributor,
+              module.make_description, module.make_subject,
+              module.make_publisher, module.make_date, module.make_type,
+              module.make_source, module.make_format, module.make_identifier,
+              module.make_rights, module.make_language]
+    for maker in makers:
+        for element in maker(resource):
+            oai_rec.append(element)
+    return metadata
+
+
+class CompiledMakeMetadataTests(unittest.TestCase):
+    def assertSameBytes(self, module, resource):
+        self.assertEqual(etree.tostring(module.make_metadata(resource)),
+                etree.tostring(make_metadata_by_element(module, resource)))
+
+    def test_sample_resource(self):
+        resource = repository.asdict(factories.get_sample_resource())
+        self.assertSameBytes(oai_dc, resource)
+
+    def test_openaire_shares_the_maker(self):
+        self.assertIs(oai_dc_openaire.make_metadata, oai_dc.make_metadata)
+
+    def test_missing_and_empty_fields(self):
+        resource = repository.asdict(factories.get_sample_resource(
+            creator=[], rights=[]))
+        del resource['subject']
+        self.assertSameBytes(oai_dc, resource)
+
+    def test_special_characters(self):
+        resource = repository.asdict(factories.get_sample_resource(
+            title=[('pt', 'Ácaros & <fungos>')], creator=['Évora, J.']))
+        self.assertSameBytes(oai_dc, resource)
+
+    def test_fields_are_ordered(self):
+        metadata = oai_dc.make_metadata(repository.asdict(
+            factories.get_sample_resource()))
+        names = [etree.QName(elem).localname for elem in metadata[0]]
+        self.assertEqual(names, ['title', 'creator', 'contributor',
+            'description', 'subject', 'subject', 'publisher', 'date', 'type',
+            'source', 'format', 'identifier', 'rights', 'language'])
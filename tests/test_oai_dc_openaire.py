@@ -1,7 +1,8 @@
 import unittest
 from datetime import datetime
 
-from oaipmh.formatters import oai_dc_openaire
+from .fixtures import factories
+from oaipmh.formatters import oai_dc, oai_dc_openaire
 
 
 class FetchPubTypeFromVocabularyTests(unittest.TestCase):
@@ -75,21 +76,21 @@ class MakeTitleTests(unittest.TestCase):
         self.resource = {'title': [('en', 'foo'), ('en', 'bar')]}
 
     def test_titles_are_multivalued(self):
-        title_elements = oai_dc_openaire.make_title(self.resource)
+        title_elements = oai_dc.make_title(self.resource)
         self.assertEqual(len(title_elements), 2)
 
     def test_titles_are_ordered(self):
-        title_elements = oai_dc_openaire.make_title(self.resource)
+        title_elements = oai_dc.make_title(self.resource)
         self.assertEqual(title_elements[0].text, 'foo')
         self.assertEqual(title_elements[1].text, 'bar')
 
     def test_titles_have_no_attrs(self):
-        title_elements = oai_dc_openaire.make_title(self.resource)
+        title_elements = oai_dc.make_title(self.resource)
         for element in title_elements:
             self.assertEqual(element.attrib, {})
 
     def test_dc_namespace(self):
-        title_elements = oai_dc_openaire.make_title(self.resource)
+        title_elements = oai_dc.make_title(self.resource)
         for element in title_elements:
             self.assertEqual(element.tag,
                     '{http://purl.org/dc/elements/1.1/}title')
@@ -100,21 +101,21 @@ class MakeCreatorTests(unittest.TestCase):
         self.resource = {'creator': ['foo', 'bar']}
 
     def test_creators_are_multivalued(self):
-        creator_elements = oai_dc_openaire.make_creator(self.resource)
+        creator_elements = oai_dc.make_creator(self.resource)
         self.assertEqual(len(creator_elements), 2)
 
     def test_creators_are_ordered(self):
-        creator_elements = oai_dc_openaire.make_creator(self.resource)
+        creator_elements = oai_dc.make_creator(self.resource)
         self.assertEqual(creator_elements[0].text, 'foo')
         self.assertEqual(creator_elements[1].text, 'bar')
 
     def test_creators_have_no_attrs(self):
-        creator_elements = oai_dc_openaire.make_creator(self.resource)
+        creator_elements = oai_dc.make_creator(self.resource)
         for element in creator_elements:
             self.assertEqual(element.attrib, {})
 
     def test_dc_namespace(self):
-        creator_elements = oai_dc_openaire.make_creator(self.resource)
+        creator_elements = oai_dc.make_creator(self.resource)
         for element in creator_elements:
             self.assertEqual(element.tag,
                     '{http://purl.org/dc/elements/1.1/}creator')
@@ -125,21 +126,21 @@ class MakeContributorTests(unittest.TestCase):
         self.resource = {'contributor': ['foo', 'bar']}
 
     def test_contributors_are_multivalued(self):
-        contributor_elements = oai_dc_openaire.make_contributor(self.resource)
+        contributor_elements = oai_dc.make_contributor(self.resource)
         self.assertEqual(len(contributor_elements), 2)
 
     def test_contributors_are_ordered(self):
-        contributor_elements = oai_dc_openaire.make_contributor(self.resource)
+        contributor_elements = oai_dc.make_contributor(self.resource)
         self.assertEqual(contributor_elements[0].text, 'foo')
         self.assertEqual(contributor_elements[1].text, 'bar')
 
     def test_contributors_have_no_attrs(self):
-        contributor_elements = oai_dc_openaire.make_contributor(self.resource)
+        contributor_elements = oai_dc.make_contributor(self.resource)
         for element in contributor_elements:
             self.assertEqual(element.attrib, {})
 
     def test_dc_namespace(self):
-        contributor_elements = oai_dc_openaire.make_contributor(self.resource)
+        contributor_elements = oai_dc.make_contributor(self.resource)
         for element in contributor_elements:
             self.assertEqual(element.tag,
                     '{http://purl.org/dc/elements/1.1/}contributor')
@@ -150,21 +151,21 @@ class MakeDescriptionTests(unittest.TestCase):
         self.resource = {'description': [('en', 'foo'), ('en', 'bar')]}
         
     def test_descriptions_are_multivalued(self):
-        description_elements = oai_dc_openaire.make_description(self.resource)
+        description_elements = oai_dc.make_description(self.resource)
         self.assertEqual(len(description_elements), 2)
 
     def test_contributors_are_ordered(self):
-        description_elements = oai_dc_openaire.make_description(self.resource)
+        description_elements = oai_dc.make_description(self.resource)
         self.assertEqual(description_elements[0].text, 'foo')
         self.assertEqual(description_elements[1].text, 'bar')
 
     def test_contributors_have_no_attrs(self):
-        description_elements = oai_dc_openaire.make_description(self.resource)
+        description_elements = oai_dc.make_description(self.resource)
         for element in description_elements:
             self.assertEqual(element.attrib, {})
 
     def test_dc_namespace(self):
-        description_elements = oai_dc_openaire.make_description(self.resource)
+        description_elements = oai_dc.make_description(self.resource)
         for element in description_elements:
             self.assertEqual(element.tag,
                     '{http://purl.org/dc/elements/1.1/}description')
@@ -175,21 +176,21 @@ class MakePublisherTests(unittest.TestCase):
         self.resource = {'publisher': ['foo', 'bar']}
 
     def test_publishers_are_multivalued(self):
-        publisher_elements = oai_dc_openaire.make_publisher(self.resource)
+        publisher_elements = oai_dc.make_publisher(self.resource)
         self.assertEqual(len(publisher_elements), 2)
 
     def test_publishers_are_ordered(self):
-        publisher_elements = oai_dc_openaire.make_publisher(self.resource)
+        publisher_elements = oai_dc.make_publisher(self.resource)
         self.assertEqual(publisher_elements[0].text, 'foo')
         self.assertEqual(publisher_elements[1].text, 'bar')
 
     def test_publishers_have_no_attrs(self):
-        publisher_elements = oai_dc_openaire.make_publisher(self.resource)
+        publisher_elements = oai_dc.make_publisher(self.resource)
         for element in publisher_elements:
             self.assertEqual(element.attrib, {})
 
     def test_dc_namespace(self):
-        publisher_elements = oai_dc_openaire.make_publisher(self.resource)
+        publisher_elements = oai_dc.make_publisher(self.resource)
         for element in publisher_elements:
             self.assertEqual(element.tag,
                     '{http://purl.org/dc/elements/1.1/}publisher')
@@ -200,21 +201,21 @@ class MakeDateTests(unittest.TestCase):
         self.resource = {'date': [datetime(2017, 6, 29), datetime(2016, 6, 1)]}
 
     def test_dates_are_multivalued(self):
-        date_elements = oai_dc_openaire.make_date(self.resource)
+        date_elements = oai_dc.make_date(self.resource)
         self.assertEqual(len(date_elements), 2)
 
     def test_dates_are_ordered(self):
-        date_elements = oai_dc_openaire.make_date(self.resource)
+        date_elements = oai_dc.make_date(self.resource)
         self.assertEqual(date_elements[0].text, '2017-06-29')
         self.assertEqual(date_elements[1].text, '2016-06-01')
 
     def test_publishers_have_no_attrs(self):
-        date_elements = oai_dc_openaire.make_date(self.resource)
+        date_elements = oai_dc.make_date(self.resource)
         for element in date_elements:
             self.assertEqual(element.attrib, {})
 
     def test_dc_namespace(self):
-        date_elements = oai_dc_openaire.make_date(self.resource)
+        date_elements = oai_dc.make_date(self.resource)
         for element in date_elements:
             self.assertEqual(element.tag,
                     '{http://purl.org/dc/elements/1.1/}date')
@@ -225,21 +226,21 @@ class MakeTypeTests(unittest.TestCase):
         self.resource = {'type': ['foo', 'bar']}
 
     def test_type_are_multivalued(self):
-        type_elements = oai_dc_openaire.make_type(self.resource)
+        type_elements = oai_dc.make_type(self.resource)
         self.assertEqual(len(type_elements), 2)
 
     def test_dates_are_ordered(self):
-        type_elements = oai_dc_openaire.make_type(self.resource)
+        type_elements = oai_dc.make_type(self.resource)
         self.assertEqual(type_elements[0].text, 'foo')
         self.assertEqual(type_elements[1].text, 'bar')
 
     def test_publishers_have_no_attrs(self):
-        type_elements = oai_dc_openaire.make_type(self.resource)
+        type_elements = oai_dc.make_type(self.resource)
         for element in type_elements:
             self.assertEqual(element.attrib, {})
 
     def test_dc_namespace(self):
-        type_elements = oai_dc_openaire.make_type(self.resource)
+        type_elements = oai_dc.make_type(self.resource)
         for element in type_elements:
             self.assertEqual(element.tag,
                     '{http://purl.org/dc/elements/1.1/}type')
@@ -250,21 +251,21 @@ class MakeFormatTests(unittest.TestCase):
         self.resource = {'format': ['foo', 'bar']}
 
     def test_formats_are_multivalued(self):
-        format_elements = oai_dc_openaire.make_format(self.resource)
+        format_elements = oai_dc.make_format(self.resource)
         self.assertEqual(len(format_elements), 2)
 
     def test_formats_are_ordered(self):
-        format_elements = oai_dc_openaire.make_format(self.resource)
+        format_elements = oai_dc.make_format(self.resource)
         self.assertEqual(format_elements[0].text, 'foo')
         self.assertEqual(format_elements[1].text, 'bar')
 
     def test_formats_have_no_attrs(self):
-        format_elements = oai_dc_openaire.make_format(self.resource)
+        format_elements = oai_dc.make_format(self.resource)
         for element in format_elements:
             self.assertEqual(element.attrib, {})
 
     def test_dc_namespace(self):
-        format_elements = oai_dc_openaire.make_format(self.resource)
+        format_elements = oai_dc.make_format(self.resource)
         for element in format_elements:
             self.assertEqual(element.tag,
                     '{http://purl.org/dc/elements/1.1/}format')
@@ -275,21 +276,21 @@ class MakeIdentifierTests(unittest.TestCase):
         self.resource = {'identifier': ['foo', 'bar']}
 
     def test_identifiers_are_multivalued(self):
-        identifier_elements = oai_dc_openaire.make_identifier(self.resource)
+        identifier_elements = oai_dc.make_identifier(self.resource)
         self.assertEqual(len(identifier_elements), 2)
 
     def test_identifiers_are_ordered(self):
-        identifier_elements = oai_dc_openaire.make_identifier(self.resource)
+        identifier_elements = oai_dc.make_identifier(self.resource)
         self.assertEqual(identifier_elements[0].text, 'foo')
         self.assertEqual(identifier_elements[1].text, 'bar')
 
     def test_identifiers_have_no_attrs(self):
-        identifier_elements = oai_dc_openaire.make_identifier(self.resource)
+        identifier_elements = oai_dc.make_identifier(self.resource)
         for element in identifier_elements:
             self.assertEqual(element.attrib, {})
 
     def test_dc_namespace(self):
-        identifier_elements = oai_dc_openaire.make_identifier(self.resource)
+        identifier_elements = oai_dc.make_identifier(self.resource)
         for element in identifier_elements:
             self.assertEqual(element.tag,
                     '{http://purl.org/dc/elements/1.1/}identifier')
@@ -300,21 +301,21 @@ class MakeLanguageTests(unittest.TestCase):
         self.resource = {'language': ['foo', 'bar']}
 
     def test_languages_are_multivalued(self):
-        language_elements = oai_dc_openaire.make_language(self.resource)
+        language_elements = oai_dc.make_language(self.resource)
         self.assertEqual(len(language_elements), 2)
 
     def test_languages_are_ordered(self):
-        language_elements = oai_dc_openaire.make_language(self.resource)
+        language_elements = oai_dc.make_language(self.resource)
         self.assertEqual(language_elements[0].text, 'foo')
         self.assertEqual(language_elements[1].text, 'bar')
 
     def test_languages_have_no_attrs(self):
-        language_elements = oai_dc_openaire.make_language(self.resource)
+        language_elements = oai_dc.make_language(self.resource)
         for element in language_elements:
             self.assertEqual(element.attrib, {})
 
     def test_dc_namespace(self):
-        language_elements = oai_dc_openaire.make_language(self.resource)
+        language_elements = oai_dc.make_language(self.resource)
         for element in language_elements:
             self.assertEqual(element.tag,
                     '{http://purl.org/dc/elements/1.1/}language')
@@ -353,21 +354,21 @@ class MakeSourceTests(unittest.TestCase):
         self.resource = {'source': ['foo', 'bar']}
 
     def test_sources_are_multivalued(self):
-        source_elements = oai_dc_openaire.make_source(self.resource)
+        source_elements = oai_dc.make_source(self.resource)
         self.assertEqual(len(source_elements), 2)
 
     def test_sources_are_ordered(self):
-        source_elements = oai_dc_openaire.make_source(self.resource)
+        source_elements = oai_dc.make_source(self.resource)
         self.assertEqual(source_elements[0].text, 'foo')
         self.assertEqual(source_elements[1].text, 'bar')
 
     def test_sources_have_no_attrs(self):
-        source_elements = oai_dc_openaire.make_source(self.resource)
+        source_elements = oai_dc.make_source(self.resource)
         for element in source_elements:
             self.assertEqual(element.attrib, {})
 
     def test_dc_namespace(self):
-        source_elements = oai_dc_openaire.make_source(self.resource)
+        source_elements = oai_dc.make_source(self.resource)
         for element in source_elements:
             self.assertEqual(element.tag,
                     '{http://purl.org/dc/elements/1.1/}source')
@@ -378,21 +379,21 @@ class MakeRightsTests(unittest.TestCase):
         self.resource = {'rights': ['foo', 'bar']}
 
     def test_rights_are_multivalued(self):
-        rights_elements = oai_dc_openaire.make_rights(self.resource)
+        rights_elements = oai_dc.make_rights(self.resource)
         self.assertEqual(len(rights_elements), 2)
 
     def test_rights_are_ordered(self):
-        rights_elements = oai_dc_openaire.make_rights(self.resource)
+        rights_elements = oai_dc.make_rights(self.resource)
         self.assertEqual(rights_elements[0].text, 'foo')
         self.assertEqual(rights_elements[1].text, 'bar')
 
     def test_rights_have_no_attrs(self):
-        rights_elements = oai_dc_openaire.make_rights(self.resource)
+        rights_elements = oai_dc.make_rights(self.resource)
         for element in rights_elements:
             self.assertEqual(element.attrib, {})
 
     def test_dc_namespace(self):
-        rights_elements = oai_dc_openaire.make_rights(self.resource)
+        rights_elements = oai_dc.make_rights(self.resource)
         for element in rights_elements:
             self.assertEqual(element.tag,
                     '{http://purl.org/dc/elements/1.1/}rights')
@@ -403,22 +404,46 @@ class MakeSubjectTests(unittest.TestCase):
         self.resource = {'subject': [('en', 'foo'), ('en', 'bar')]}
 
     def test_subjects_are_multivalued(self):
-        subjects_elements = oai_dc_openaire.make_subject(self.resource)
+        subjects_elements = oai_dc.make_subject(self.resource)
         self.assertEqual(len(subjects_elements), 2)
 
     def test_subjects_are_ordered(self):
-        subjects_elements = oai_dc_openaire.make_subject(self.resource)
+        subjects_elements = oai_dc.make_subject(self.resource)
         self.assertEqual(subjects_elements[0].text, 'foo')
         self.assertEqual(subjects_elements[1].text, 'bar')
 
     def test_subjects_have_no_attrs(self):
-        subjects_elements = oai_dc_openaire.make_subject(self.resource)
+        subjects_elements = oai_dc.make_subject(self.resource)
         for element in subjects_elements:
             self.assertEqual(element.attrib, {})
 
     def test_dc_namespace(self):
-        subjects_elements = oai_dc_openaire.make_subject(self.resource)
+        subjects_elements = oai_dc.make_subject(self.resource)
         for element in subjects_elements:
             self.assertEqual(element.tag,
                     '{http://purl.org/dc/elements/1.1/}subject')
 
+
+
+class AugmentMetadataTests(unittest.TestCase):
+    def setUp(self):
+        self.resource = factories.get_sample_resource()
+
+    def test_rights_and_types(self):
+        augmented = oai_dc_openaire.augment_metadata(self.resource)
+        self.assertEqual(augmented.rights,
+                ['http://creativecommons.org/licenses/by-nc/4.0/',
+                 'info:eu-repo/semantics/openAccess'])
+        self.assertEqual(augmented.type, ['info:eu-repo/semantics/article'])
+
+    def test_resources_are_not_changed(self):
+        rights, types = list(self.resource.rights), list(self.resource.type)
+        oai_dc_openaire.augment_metadata(self.resource)
+        oai_dc_openaire.augment_metadata(self.resource)
+        self.assertEqual(self.resource.rights, rights)
+        self.assertEqual(self.resource.type, types)
+
+    def test_unchanged_fields_are_shared(self):
+        augmented = oai_dc_openaire.augment_metadata(self.resource)
+        self.assertIs(augmented.title, self.resource.title)
+        self.assertIs(augmented.setspec, self.resource.setspec)
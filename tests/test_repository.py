@@ -1,6 +1,8 @@
 import re
 import unittest
 from collections import namedtuple
+from datetime import datetime
+from unittest.mock import patch
 import urllib.parse
 
 from .fixtures import factories
@@ -9,7 +11,11 @@ from oaipmh import (
         datastores,
         sets,
         entities,
+        cache,
+        articlemeta,
+        timing,
         )
+from oaipmh.formatters import oai_dc, oai_dc_openaire
 
 
 RES_TOKEN_RECORDS = repository.RESUMPTION_TOKEN_PATTERNS['ListRecords']
@@ -38,6 +44,20 @@ class asdictTests(unittest.TestCase):
         self.assertEqual(repository.asdict(s),
                 {'foo': 'foo value_', 'bar': '_bar value'})
 
+    def test_lazy_resources_are_not_evaluated(self):
+        resource = factories.get_sample_resource()
+        evaluated = []
+
+        class Source:
+            def __getattr__(self, name):
+                evaluated.append(name)
+                return lambda: getattr(resource, name)
+
+        data = repository.asdict(entities.LazyResource(Source()))
+        self.assertEqual(evaluated, [])
+        self.assertEqual(data['title'], resource.title)
+        self.assertEqual(evaluated, ['title'])
+
 
 class encode_resumption_tokenTests(unittest.TestCase):
     def test_only_str_values(self):
@@ -110,6 +130,45 @@ class inc_resumption_tokenTests(unittest.TestCase):
                     metadataPrefix='oai_dc'))
 
 
+class cursorTests(unittest.TestCase):
+    def test_roundtrip(self):
+        key = ('2017-06-14', 'S0001-37652000000100001')
+        cursor = repository.encode_cursor(key)
+        self.assertTrue(repository.is_cursor(cursor))
+        self.assertEqual(repository.decode_cursor(cursor), key)
+
+    def test_cursors_are_valid_offsets(self):
+        cursor = repository.encode_cursor(('2017-06-14', 'oai:foo/bar:1'))
+        self.assertIsNotNone(re.fullmatch(RES_TOKEN_RECORDS,
+            'setname:1998-01-01::%s:10:oai_dc' % cursor))
+        self.assertIsNotNone(re.fullmatch(RES_TOKEN_IDENTIFIERS,
+            ':::%s:10:' % cursor))
+
+    def test_numeric_offsets_are_not_cursors(self):
+        self.assertFalse(repository.is_cursor('10'))
+
+    def test_invalid_cursors_raise_valueerror(self):
+        self.assertRaises(ValueError, repository.decode_cursor, 'cZm9v')
+
+    def test_next_keyset_token(self):
+        token = repository.ResumptionToken(set='', from_='', until='',
+            offset='0', count='2', metadataPrefix='oai_dc')
+        resources = [factories.get_sample_resource(ridentifier='rid%s' % i)
+                     for i in range(2)]
+        next_token = repository.next_keyset_resumption_token(token, resources)
+
+        self.assertEqual(repository.decode_cursor(next_token.offset),
+                ('2017-06-14', 'rid1'))
+        self.assertEqual(next_token.count, '2')
+
+    def test_last_keyset_token(self):
+        token = repository.ResumptionToken(set='', from_='', until='',
+            offset='0', count='2', metadataPrefix='oai_dc')
+        resources = [factories.get_sample_resource()]
+        self.assertIsNone(
+                repository.next_keyset_resumption_token(token, resources))
+
+
 class ListRecordsResumptionTokenRegexpTests(unittest.TestCase):
 
     def test_case_1(self):
@@ -662,6 +721,292 @@ class RepositoryTests(unittest.TestCase):
         self.assertTrue('<error code="badVerb">'.encode('utf-8') in result)
 
 
+class KeysetPagingTests(unittest.TestCase):
+    def setUp(self):
+        meta = factories.get_sample_repositorymeta()
+        self.ds = datastores.InMemory()
+        for i in range(25):
+            self.ds.add(factories.get_sample_resource(ridentifier='rid%02d' % i))
+        setsreg = sets.SetsRegistry(self.ds, [])
+        self.repository = repository.Repository(meta, self.ds, setsreg, 10,
+                keyset_paging=True)
+
+    def harvest(self, qstr):
+        identifiers = []
+        while True:
+            result = self.repository.handle_request(qstr).decode('utf-8')
+            identifiers += re.findall(r'<identifier>(.*?)</identifier>', result)
+            token = re.search(r'<resumptionToken>(.+?)</resumptionToken>',
+                    result)
+            if token is None:
+                return identifiers
+            qstr = 'verb=ListIdentifiers&resumptionToken=' + token.group(1)
+
+    def test_all_records_are_harvested_once(self):
+        identifiers = self.harvest('verb=ListIdentifiers')
+        self.assertEqual(identifiers, ['rid%02d' % i for i in range(25)])
+
+    def test_tokens_carry_cursors(self):
+        result = self.repository.handle_request('verb=ListIdentifiers')
+        token = re.search(rb'<resumptionToken>(.+?)</resumptionToken>',
+                result).group(1).decode('utf-8')
+        offset = repository.decode_resumption_token(token).offset
+        self.assertEqual(repository.decode_cursor(offset),
+                ('2017-06-14', 'rid09'))
+
+    def test_numeric_offsets_are_still_accepted(self):
+        result = self.repository.handle_request(
+                'verb=ListIdentifiers&resumptionToken=:::11:10:')
+        self.assertIn(b'<identifier>rid11</identifier>', result)
+        self.assertIn(b'<resumptionToken>:::22:10:</resumptionToken>', result)
+
+    def test_invalid_cursors_are_bad_resumption_tokens(self):
+        result = self.repository.handle_request(
+                'verb=ListIdentifiers&resumptionToken=:::cZm9v:10:')
+        self.assertIn(b'<error code="badResumptionToken"/>', result)
+
+
+class StreamedPageTests(unittest.TestCase):
+    def test_first_item_is_prefetched(self):
+        def resources():
+            raise datastores.DoesNotExistError()
+            yield
+
+        self.assertRaises(datastores.DoesNotExistError,
+                repository.StreamedPage, resources())
+
+    def test_consumed_items(self):
+        page = repository.StreamedPage(iter(range(5)))
+        self.assertEqual(len(page), 0)
+
+        self.assertEqual(list(page), [0, 1, 2, 3, 4])
+        self.assertEqual(len(page), 5)
+        self.assertEqual(page[-1], 4)
+
+    def test_only_the_last_item_is_kept(self):
+        page = repository.StreamedPage(iter(range(5)))
+        list(page)
+        self.assertRaises(IndexError, lambda: page[0])
+
+
+class StreamingTests(unittest.TestCase):
+    def make_repository(self, **kwargs):
+        meta = factories.get_sample_repositorymeta()
+        ds = datastores.InMemory()
+        for i in range(15):
+            ds.add(factories.get_sample_resource(ridentifier='rid%02d' % i))
+        repo = repository.Repository(meta, ds, sets.SetsRegistry(ds, []), 10,
+                **kwargs)
+        repo.add_metadataformat(
+                entities.MetadataFormat(metadataPrefix='oai_dc', schema='',
+                    metadataNamespace=''),
+                oai_dc.make_metadata, lambda x: x)
+        return repo
+
+    @patch('oaipmh.serializers.datetime')
+    def assertSameResponse(self, qstr, mock_utc):
+        mock_utc.utcnow.return_value = datetime(2017, 6, 22, 19, 1, 43)
+        expected = self.make_repository().handle_request(qstr)
+        result = self.make_repository(streaming=True).handle_request(qstr)
+
+        self.assertNotIsInstance(result, bytes)
+        self.assertEqual(b''.join(result), expected)
+
+    def test_list_records(self):
+        self.assertSameResponse('verb=ListRecords&metadataPrefix=oai_dc')
+
+    def test_list_records_last_page(self):
+        self.assertSameResponse(
+                'verb=ListRecords&resumptionToken=:::11:10:oai_dc')
+
+    def test_list_identifiers(self):
+        self.assertSameResponse('verb=ListIdentifiers')
+
+    def test_keyset_tokens(self):
+        repo = self.make_repository(streaming=True, keyset_paging=True)
+        result = b''.join(repo.handle_request('verb=ListIdentifiers'))
+        token = re.search(rb'<resumptionToken>(.+?)</resumptionToken>',
+                result).group(1).decode('utf-8')
+        offset = repository.decode_resumption_token(token).offset
+        self.assertEqual(repository.decode_cursor(offset),
+                ('2017-06-14', 'rid09'))
+
+    def test_other_verbs_are_not_streamed(self):
+        repo = self.make_repository(streaming=True)
+        self.assertIsInstance(repo.handle_request('verb=Identify'), bytes)
+
+
+class AugmenterTests(unittest.TestCase):
+    def setUp(self):
+        meta = factories.get_sample_repositorymeta()
+        self.ds = datastores.InMemory()
+        for i in range(3):
+            self.ds.add(factories.get_sample_resource(ridentifier='rid%s' % i))
+        self.repository = repository.Repository(meta, self.ds,
+                sets.SetsRegistry(self.ds, []), 10)
+        self.repository.add_metadataformat(
+                entities.MetadataFormat(metadataPrefix='oai_dc_openaire',
+                    schema='', metadataNamespace=''),
+                oai_dc_openaire.make_metadata,
+                oai_dc_openaire.augment_metadata)
+
+    @patch('oaipmh.serializers.datetime')
+    def assertSameResponses(self, qstr, mock_utc):
+        mock_utc.utcnow.return_value = datetime(2017, 6, 22, 19, 1, 43)
+        first = self.repository.handle_request(qstr)
+        self.assertEqual(self.repository.handle_request(qstr), first)
+
+    def test_get_record_does_not_change_stored_resources(self):
+        self.assertSameResponses('verb=GetRecord&identifier=rid0'
+                '&metadataPrefix=oai_dc_openaire')
+        self.assertEqual(self.ds.get('rid0').rights,
+                factories.get_sample_resource().rights)
+
+    def test_list_records_does_not_change_stored_resources(self):
+        self.assertSameResponses(
+                'verb=ListRecords&metadataPrefix=oai_dc_openaire')
+        self.assertEqual(self.ds.get('rid1').type,
+                factories.get_sample_resource().type)
+
+
+class TimingTests(unittest.TestCase):
+    def setUp(self):
+        meta = factories.get_sample_repositorymeta()
+        ds = datastores.InMemory()
+        for i in range(3):
+            ds.add(factories.get_sample_resource(ridentifier='rid%s' % i))
+        self.repository = repository.Repository(meta, ds,
+                sets.SetsRegistry(ds, []), 10, streaming=True)
+        self.repository.add_metadataformat(
+                entities.MetadataFormat(metadataPrefix='oai_dc_openaire',
+                    schema='', metadataNamespace=''),
+                oai_dc_openaire.make_metadata,
+                oai_dc_openaire.augment_metadata)
+
+    def handle_request(self, qstr):
+        timings = timing.Timings()
+        with timings.activate():
+            body = self.repository.handle_request(qstr)
+        if not isinstance(body, bytes):
+            body = b''.join(timings.iter_active(body))
+        return body, timings
+
+    def test_list_records_stages(self):
+        body, timings = self.handle_request(
+                'verb=ListRecords&metadataPrefix=oai_dc_openaire')
+        self.assertEqual(body.count(b'<record>'), 3)
+        self.assertEqual(set(timings.durations), {'parse', 'datastore',
+            'augment', 'format', 'serialize'})
+
+    def test_get_record_stages(self):
+        _, timings = self.handle_request('verb=GetRecord&identifier=rid0'
+                '&metadataPrefix=oai_dc_openaire')
+        self.assertEqual(set(timings.durations), {'parse', 'datastore',
+            'augment', 'format', 'serialize'})
+
+    def test_responses_are_unchanged(self):
+        qstr = 'verb=ListRecords&metadataPrefix=oai_dc_openaire'
+        with patch('oaipmh.serializers.datetime') as mock_utc:
+            mock_utc.utcnow.return_value = datetime(2017, 6, 22, 19, 1, 43)
+            body, _ = self.handle_request(qstr)
+            self.assertEqual(body,
+                    b''.join(self.repository.handle_request(qstr)))
+
+
+class JournalsStub(datastores.InMemory):
+    def __init__(self, journals):
+        super().__init__()
+        self.journals = journals
+        self.calls = 0
+
+    def list_journals(self, offset=0, count=1000):
+        self.calls += 1
+        return self.journals[offset:offset+count]
+
+    def get_journal(self, issn):
+        self.calls += 1
+        for journal in self.journals:
+            if journal.lead_issn == issn:
+                return journal
+        raise datastores.DoesNotExistError()
+
+
+class ResponseCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.ds = JournalsStub([articlemeta.Journal(title='Journal %s' % i,
+            lead_issn='0000-000%s' % i) for i in range(3)])
+        self.setsreg = sets.SetsRegistry(self.ds, [])
+        self.repository = repository.Repository(
+                factories.get_sample_repositorymeta(), self.ds, self.setsreg,
+                10, sets_cache=cache.TTLCache(10))
+
+    def add_format(self, prefix):
+        self.repository.add_metadataformat(
+                entities.MetadataFormat(metadataPrefix=prefix, schema='',
+                    metadataNamespace=''),
+                oai_dc.make_metadata, lambda x: x)
+
+    def test_list_sets_pages_are_cached(self):
+        first = self.repository.handle_request('verb=ListSets')
+        second = self.repository.handle_request('verb=ListSets')
+        self.assertEqual(self.ds.calls, 1)
+        self.assertIn(b'<setSpec>0000-0002</setSpec>', second)
+        self.assertEqual(first.count(b'<set>'), second.count(b'<set>'))
+
+    def test_missing_journals_do_not_end_list_sets(self):
+        self.ds.journals[0] = None
+        self.repository.listslen = 2
+        result = self.repository.handle_request('verb=ListSets')
+        self.assertEqual(result.count(b'<set>'), 1)
+        self.assertIn(b'<resumptionToken>:::3:2:</resumptionToken>', result)
+
+    def test_cached_list_sets_are_validated(self):
+        with patch('oaipmh.validators.LOGGER') as logger:
+            self.repository.handle_request('verb=ListSets')
+            self.repository.handle_request('verb=ListSets')
+        self.assertEqual(logger.debug.call_count, 2)
+
+    def test_response_date_is_renewed(self):
+        with patch('oaipmh.serializers.datetime') as mock_utc:
+            mock_utc.utcnow.return_value = datetime(2017, 6, 22, 19, 1, 43)
+            self.repository.handle_request('verb=ListSets')
+            mock_utc.utcnow.return_value = datetime(2017, 6, 22, 19, 1, 44)
+            result = self.repository.handle_request('verb=ListSets')
+
+        self.assertIn(b'<responseDate>2017-06-22T19:01:44Z</responseDate>',
+                result)
+
+    def test_changes_to_static_sets_are_served(self):
+        self.repository.handle_request('verb=ListSets')
+        self.setsreg.static_sets.append(entities.Set(setSpec='static',
+            setName='Static'))
+        result = self.repository.handle_request('verb=ListSets')
+        self.assertIn(b'<setSpec>static</setSpec>', result)
+
+    def test_no_cache(self):
+        self.repository.sets_cache = None
+        self.repository.handle_request('verb=ListSets')
+        self.repository.handle_request('verb=ListSets')
+        self.assertEqual(self.ds.calls, 2)
+
+    def test_unknown_sets_are_bad_arguments(self):
+        self.repository.setsreg.missing_cache = cache.TTLCache(10)
+        for _ in range(2):
+            result = self.repository.handle_request(
+                    'verb=ListIdentifiers&set=missing')
+            self.assertIn(b'<error code="badArgument"/>', result)
+        self.assertEqual(self.ds.calls, 1)
+
+    def test_changes_to_metadata_formats_are_served(self):
+        self.add_format('oai_dc')
+        self.repository.handle_request('verb=ListMetadataFormats')
+        self.add_format('oai_dc_openaire')
+        result = self.repository.handle_request('verb=ListMetadataFormats')
+        self.assertIn(b'<metadataPrefix>oai_dc</metadataPrefix>', result)
+        self.assertIn(b'<metadataPrefix>oai_dc_openaire</metadataPrefix>',
+                result)
+
+
 class oairequest_from_querystringTests(unittest.TestCase):
     def test_verb(self):
         qstr = urllib.parse.parse_qs('verb=ListRecords')
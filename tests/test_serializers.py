@@ -2,7 +2,10 @@ import unittest
 from unittest.mock import patch
 from datetime import datetime
 
-from oaipmh import serializers, validators, formatters
+import plumber
+from lxml import etree
+
+from oaipmh import serializers, validators, formatters, cache
 
 
 class SchemaValidatorMixin:
@@ -218,6 +221,118 @@ class MakeGetRecordTests(SchemaValidatorMixin, unittest.TestCase):
                 serializers.serialize_get_record(self.data, formatters.oai_dc.make_metadata))
 
 
+def make_record_data():
+    return {
+        'ridentifier': 'oai:arXiv:cs/0112017',
+        'datestamp': datetime(2017, 6, 14),
+        'setspec': ['set1'],
+        'title': [('en', 'MICROBIAL COUNTS OF DARK RED...')],
+        'creator': ['Vieira, Francisco Cleber Sousa'],
+        'subject': [('pt', 'bactéria')],
+        'description': [],
+        'publisher': [],
+        'contributor': [],
+        'date': [datetime(1998, 9, 1)],
+        'type': ['research-article'],
+        'format': [],
+        'identifier': [],
+        'source': [],
+        'language': ['en'],
+        'relation': [],
+        'rights': [],
+    }
+
+
+def make_list_records_data():
+    return {
+        'repository': {'baseURL': 'https://oai.scielo.br/'},
+        'request': {'verb': 'ListRecords'},
+        'resources': [make_record_data()],
+        'resumptionToken': '',
+    }
+
+
+class RecordFragmentTests(unittest.TestCase):
+    def setUp(self):
+        self.record = make_record_data()
+        self.calls = 0
+
+    def formatter(self, record_data):
+        self.calls += 1
+        return formatters.oai_dc.make_metadata(record_data)
+
+    def test_fragments_are_part_of_the_document(self):
+        data = make_list_records_data()
+        fragment = serializers.make_record_fragment(self.record,
+                self.formatter)
+        self.assertTrue(fragment.startswith(b'<record><header>'))
+        self.assertIn(fragment, serializers.serialize_list_records(data,
+                self.formatter))
+
+    def test_cached_fragments_are_reused(self):
+        record_cache = cache.TTLCache(10)
+        first = serializers.make_record_fragment(self.record, self.formatter,
+                record_cache)
+        second = serializers.make_record_fragment(self.record,
+                self.formatter, record_cache)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.calls, 1)
+
+    def test_fragments_are_keyed_by_datestamp(self):
+        record_cache = cache.TTLCache(10)
+        serializers.make_record_fragment(self.record, self.formatter,
+                record_cache)
+        self.record['datestamp'] = datetime(2018, 1, 1)
+        fragment = serializers.make_record_fragment(self.record,
+                self.formatter, record_cache)
+
+        self.assertIn(b'<datestamp>2018-01-01</datestamp>', fragment)
+        self.assertEqual(self.calls, 2)
+
+    def test_cached_documents_are_identical(self):
+        record_cache = cache.TTLCache(10)
+        expected = serializers.serialize_list_records(
+                make_list_records_data(), self.formatter)
+        for _ in range(2):
+            self.assertEqual(expected, serializers.serialize_list_records(
+                make_list_records_data(), self.formatter,
+                record_cache=record_cache))
+
+
+class IterListRecordsTests(unittest.TestCase):
+    def test_envelope_is_produced_before_resources_are_consumed(self):
+        consumed = []
+
+        def resources():
+            consumed.append(1)
+            yield make_record_data()
+
+        data = dict(make_list_records_data(), resources=resources())
+        chunks = serializers.iter_list_records(data,
+                formatters.oai_dc.make_metadata)
+
+        self.assertTrue(next(chunks).endswith(b'<ListRecords>'))
+        self.assertEqual(consumed, [])
+        self.assertTrue(next(chunks).startswith(b'<record>'))
+
+    def test_resumption_token_is_produced_after_resources(self):
+        consumed = []
+
+        def resources():
+            consumed.append(1)
+            yield make_record_data()
+
+        data = dict(make_list_records_data(), resources=resources(),
+                resumptionToken=lambda: ':::%s:10:oai_dc' % len(consumed))
+        output = b''.join(serializers.iter_list_records(data,
+                formatters.oai_dc.make_metadata))
+
+        self.assertTrue(output.endswith(
+            b'<resumptionToken>:::1:10:oai_dc</resumptionToken>'
+            b'</ListRecords></OAI-PMH>'))
+
+
 class MakeListSetsTests(SchemaValidatorMixin, unittest.TestCase):
     def setUp(self):
         self.data = {
@@ -250,3 +365,77 @@ class MakeListSetsTests(SchemaValidatorMixin, unittest.TestCase):
         self.assertXMLIsValid(
                 serializers.serialize_list_sets(self.data))
 
+
+
+class EscapingTests(unittest.TestCase):
+    values = ['a&b<c>d"e\'f', 'x\ny\rz\tw', 'ção ✓ 𝄞', ']]>', '\x7f\x80']
+
+    def test_text_is_escaped_as_lxml_does(self):
+        for value in self.values:
+            elem = etree.Element('e')
+            elem.text = value
+            self.assertEqual(etree.tostring(elem, encoding='utf-8'),
+                    ('<e>%s</e>' % serializers.escape_text(value)).encode('utf-8'))
+
+    def test_attributes_are_escaped_as_lxml_does(self):
+        for value in self.values:
+            elem = etree.Element('e', attrib={'a': value})
+            self.assertEqual(etree.tostring(elem, encoding='utf-8'),
+                    ('<e a="%s"/>' % serializers.escape_attribute(value)).encode('utf-8'))
+
+    def test_control_characters_are_rejected(self):
+        for value in ['\x00', '\x0b', '￾']:
+            self.assertRaises(ValueError, serializers.escape_text, value)
+
+
+class ResponseTemplateTests(unittest.TestCase):
+    def setUp(self):
+        self.data = {
+            'repository': {'baseURL': 'https://oai.scielo.br/?a=1&b=2'},
+            'request': {'verb': 'List<Records>', 'identifier': '',
+                        'set': None, 'from': '"2017"'},
+        }
+
+    def serialize_with_pipeline(self, body):
+        ppl = plumber.Pipeline(serializers.root, serializers.responsedate,
+                serializers.request, body, serializers.tobytes)
+        return next(ppl.run(self.data, rewrap=True))
+
+    @patch('oaipmh.serializers.datetime')
+    def test_errors_are_identical_to_pipelines(self, mock_utc):
+        mock_utc.utcnow.return_value = datetime(2017, 6, 22, 19, 1, 43)
+        cases = [
+            (serializers.badverb, serializers.serialize_bad_verb),
+            (serializers.badargument, serializers.serialize_bad_argument),
+            (serializers.iddoesnotexist,
+                serializers.serialize_id_does_not_exist),
+            (serializers.cannotdisseminateformat,
+                serializers.serialize_cannot_disseminate_format),
+            (serializers.badresumptiontoken,
+                serializers.serialize_bad_resumption_token),
+        ]
+        for body, serialize in cases:
+            self.assertEqual(serialize(self.data),
+                    self.serialize_with_pipeline(body))
+
+    @patch('oaipmh.serializers.datetime')
+    def test_identify_is_identical_to_pipeline(self, mock_utc):
+        mock_utc.utcnow.return_value = datetime(2017, 6, 22, 19, 1, 43)
+        self.data['repository'].update(repositoryName='SciELO',
+                earliestDatestamp=datetime(1909, 4, 1))
+        self.assertEqual(serializers.serialize_identify(self.data),
+                self.serialize_with_pipeline(serializers.identify))
+
+    @patch('oaipmh.serializers.datetime')
+    def test_response_date_is_updated(self, mock_utc):
+        mock_utc.utcnow.return_value = datetime(2017, 6, 22, 19, 1, 43)
+        serializers.serialize_bad_verb(self.data)
+        mock_utc.utcnow.return_value = datetime(2017, 6, 22, 19, 1, 44)
+        self.assertIn(b'<responseDate>2017-06-22T19:01:44Z</responseDate>',
+                serializers.serialize_bad_verb(self.data))
+
+    def test_request_without_base_url(self):
+        self.data['repository'] = {'baseURL': None}
+        self.assertIn(b'<request verb="List&lt;Records&gt;" identifier="" '
+                b'from="&quot;2017&quot;"/>',
+                serializers.serialize_bad_verb(self.data))
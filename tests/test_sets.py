@@ -1,6 +1,8 @@
+import time
 import unittest
+from unittest.mock import Mock
 
-from oaipmh import sets
+from oaipmh import sets, articlemeta, datastores, entities, cache
 
 
 class VirtualOffsetTranslationTests(unittest.TestCase):
@@ -16,3 +18,152 @@ class VirtualOffsetTranslationTests(unittest.TestCase):
     def test_case_4(self):
         self.assertEqual(sets.translate_virtual_offset(150, 101), 0)
 
+
+
+class JournalsStub:
+    def __init__(self, count):
+        self.journals = [articlemeta.Journal(title='Journal %s' % i,
+            lead_issn='0000-%04d' % i) for i in range(count)]
+        self.calls = 0
+
+    def list_journals(self, offset=0, count=1000):
+        self.calls += 1
+        return self.journals[offset:offset+count]
+
+    def get_journal(self, issn):
+        self.calls += 1
+        for journal in self.journals:
+            if journal.lead_issn == issn:
+                return journal
+        raise datastores.DoesNotExistError()
+
+
+class JournalCatalogueTests(unittest.TestCase):
+    def setUp(self):
+        self.ds = JournalsStub(25)
+        self.catalogue = sets.JournalCatalogue(self.ds, 60, batch_size=10)
+
+    def test_refresh_fetches_all_batches(self):
+        self.catalogue.refresh()
+        self.assertEqual(self.ds.calls, 3)
+        self.assertEqual(len(self.catalogue.list(0, 100)), 25)
+
+    def test_refresh_pages_past_missing_journals(self):
+        self.ds.journals[3] = None
+        self.catalogue.refresh()
+        self.assertEqual(self.ds.calls, 3)
+        self.assertEqual(len(self.catalogue.list(0, 100)), 24)
+
+    def test_refresh_replaces_the_catalogue(self):
+        self.catalogue.refresh()
+        del self.ds.journals[5:]
+        self.catalogue.refresh()
+        self.assertEqual(len(self.catalogue.list(0, 100)), 5)
+        self.assertEqual(self.catalogue.generation, 2)
+
+    def test_get(self):
+        self.catalogue.refresh()
+        self.assertEqual(self.catalogue.get('0000-0003'),
+                entities.Set(setSpec='0000-0003', setName='Journal 3'))
+
+    def test_get_missing_set(self):
+        self.catalogue.refresh()
+        self.assertRaises(datastores.DoesNotExistError, self.catalogue.get,
+                'missing')
+
+    def test_failed_start_keeps_the_catalogue_unloaded(self):
+        self.ds.list_journals = Mock(side_effect=IOError)
+        self.catalogue.start()
+        self.catalogue.stop()
+        self.assertFalse(self.catalogue.is_loaded())
+
+    def test_background_refresh(self):
+        catalogue = sets.JournalCatalogue(self.ds, 0.01, batch_size=10)
+        catalogue.start()
+        try:
+            for _ in range(100):
+                if catalogue.generation > 1:
+                    break
+                time.sleep(0.01)
+        finally:
+            catalogue.stop()
+        self.assertGreater(catalogue.generation, 1)
+
+
+class SetsRegistryCatalogueTests(unittest.TestCase):
+    def setUp(self):
+        self.ds = JournalsStub(25)
+        self.catalogue = sets.JournalCatalogue(self.ds, 60)
+        self.catalogue.refresh()
+        self.ds.calls = 0
+        static = entities.Set(setSpec='static', setName='Static')
+        self.setsreg = sets.SetsRegistry(self.ds, [(static, None)],
+                catalogue=self.catalogue)
+
+    def test_list_is_served_by_the_catalogue(self):
+        result = list(self.setsreg.list(0, 10))
+        self.assertEqual(result[0].setSpec, 'static')
+        self.assertEqual(result[1].setSpec, '0000-0000')
+        self.assertEqual(len(result), 10)
+        self.assertEqual(self.ds.calls, 0)
+
+    def test_list_translates_offsets(self):
+        result = list(self.setsreg.list(10, 10))
+        self.assertEqual(result[0].setSpec, '0000-0009')
+        self.assertEqual(self.ds.calls, 0)
+
+    def test_get_view_is_served_by_the_catalogue(self):
+        self.setsreg.get_view('0000-0003')
+        self.assertEqual(self.ds.calls, 0)
+
+    def test_get_view_of_unknown_sets_falls_back_to_ds(self):
+        self.ds.journals.append(articlemeta.Journal(title='New',
+            lead_issn='9999-9999'))
+        self.setsreg.get_view('9999-9999')
+        self.assertEqual(self.ds.calls, 1)
+
+    def test_unloaded_catalogue_falls_back_to_ds(self):
+        setsreg = sets.SetsRegistry(self.ds, [],
+                catalogue=sets.JournalCatalogue(self.ds, 60))
+        self.assertEqual(len(list(setsreg.list(0, 10))), 10)
+        self.assertEqual(self.ds.calls, 1)
+
+    def test_fingerprint_changes_on_refresh(self):
+        before = self.setsreg.fingerprint()
+        self.catalogue.refresh()
+        self.assertNotEqual(before, self.setsreg.fingerprint())
+
+
+class SetsRegistryViewsCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.ds = JournalsStub(5)
+        self.setsreg = sets.SetsRegistry(self.ds, [],
+                views_cache=cache.TTLCache(10),
+                missing_cache=cache.TTLCache(2))
+
+    def test_views_are_cached(self):
+        view = self.setsreg.get_view('0000-0003')
+        self.assertIs(self.setsreg.get_view('0000-0003'), view)
+        self.assertEqual(self.ds.calls, 1)
+
+    def test_missing_sets_are_cached(self):
+        for _ in range(2):
+            self.assertRaises(datastores.DoesNotExistError,
+                    self.setsreg.get_view, 'missing')
+        self.assertEqual(self.ds.calls, 1)
+
+    def test_missing_sets_do_not_evict_views(self):
+        view = self.setsreg.get_view('0000-0003')
+        for i in range(20):
+            self.assertRaises(datastores.DoesNotExistError,
+                    self.setsreg.get_view, 'missing%s' % i)
+        self.assertIs(self.setsreg.get_view('0000-0003'), view)
+        self.assertEqual(len(self.setsreg.views_cache), 1)
+        self.assertEqual(len(self.setsreg.missing_cache), 2)
+
+    def test_static_sets_are_not_cached(self):
+        static = entities.Set(setSpec='static', setName='Static')
+        setsreg = sets.SetsRegistry(self.ds, [(static, datastores.identityview)],
+                views_cache=cache.TTLCache(10))
+        self.assertIs(setsreg.get_view('static'), datastores.identityview)
+        self.assertEqual(len(setsreg.views_cache), 0)
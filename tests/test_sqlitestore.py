@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+
+from .fixtures import factories
+from oaipmh import articlemeta, datastores, sets, sqlitestore
+
+
+class EncodingTests(unittest.TestCase):
+    def test_resources_are_restored(self):
+        resource = factories.get_sample_resource(
+                date=[datetime(1998, 9, 1)])
+        self.assertEqual(sqlitestore.decode_resource(
+            sqlitestore.encode_resource(resource)), resource)
+
+    def test_string_datestamps_are_kept(self):
+        resource = factories.get_sample_resource(datestamp='2017-06-14')
+        self.assertEqual(sqlitestore.decode_resource(
+            sqlitestore.encode_resource(resource)).datestamp, '2017-06-14')
+
+
+class SQLiteTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = sqlitestore.SQLite(os.path.join(self.tmpdir, 'oai.db'))
+        self.store.add_many(factories.get_sample_resource(
+                ridentifier='rid%02d' % i,
+                datestamp=datetime(2017, 6, 30 - i),
+                setspec=['set%s' % (i % 3)])
+            for i in range(30))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_get(self):
+        resource = self.store.get('rid01')
+        self.assertEqual(resource.datestamp, datetime(2017, 6, 29))
+        self.assertEqual(resource.setspec, ['set1'])
+
+    def test_missing_resource(self):
+        self.assertRaises(datastores.DoesNotExistError, self.store.get,
+                'missing')
+
+    def test_resources_are_replaced(self):
+        self.store.add(factories.get_sample_resource(ridentifier='rid00',
+            datestamp=datetime(2017, 7, 1), setspec=['set9']))
+
+        self.assertEqual(self.store.count(), 30)
+        self.assertEqual(list(self.store.list(29, 1))[0].ridentifier, 'rid00')
+        view = articlemeta.ArticleMetaFilteredView({'code_title': 'set0'})
+        self.assertEqual(len(list(self.store.list(0, 100, view=view))), 9)
+
+    def test_list_is_sorted_by_key(self):
+        resources = list(self.store.list(0, 3))
+        self.assertEqual([r.ridentifier for r in resources],
+                ['rid29', 'rid28', 'rid27'])
+
+    def test_offsets(self):
+        resources = list(self.store.list(28, 5))
+        self.assertEqual([r.ridentifier for r in resources],
+                ['rid01', 'rid00'])
+
+    def test_dates(self):
+        resources = list(self.store.list(0, 100, _from='2017-06-10',
+            until='2017-06-20'))
+        self.assertEqual(len(resources), 11)
+
+    def test_records_dated_on_until_are_included(self):
+        resources = list(self.store.list(0, 100, until='2017-06-01'))
+        self.assertEqual([r.datestamp for r in resources],
+                [datetime(2017, 6, 1)])
+
+    def test_set_views(self):
+        view = articlemeta.ArticleMetaFilteredView({'code_title': 'set1'})
+        resources = list(self.store.list(0, 100, view=view,
+            _from='2017-06-10', until='2017-06-20'))
+        self.assertEqual([r.datestamp.day for r in resources],
+                [11, 14, 17, 20])
+
+    def test_count_by_date(self):
+        self.assertEqual(self.store.count(_from='2017-06-10',
+            until='2017-06-20'), 11)
+
+    def test_unsupported_filter_terms(self):
+        view = articlemeta.ArticleMetaFilteredView({'code_title': 'set1',
+            'collection': 'scl'})
+        with self.assertRaises(ValueError):
+            list(self.store.list(0, 100, view=view))
+
+    def test_custom_views(self):
+        def set1_view(f):
+            def viewfn():
+                return (res for res in f() if 'set1' in res.setspec)
+            return viewfn
+
+        resources = list(self.store.list(2, 3, view=set1_view))
+        self.assertEqual([r.ridentifier for r in resources],
+                ['rid22', 'rid19', 'rid16'])
+
+    def test_list_after(self):
+        first = list(self.store.list_after(None, 10))
+        second = list(self.store.list_after(
+            datastores.resource_key(first[-1]), 10))
+        self.assertEqual(first + second, list(self.store.list(0, 20)))
+
+    def test_connections_are_per_thread(self):
+        connections = []
+        thread = threading.Thread(
+                target=lambda: connections.append(self.store.connection()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(connections[0], self.store.connection())
+
+    def test_wal_mode(self):
+        mode = self.store.connection().execute(
+                'PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(mode, 'wal')
+
+
+class SQLiteJournalsTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = sqlitestore.SQLite(os.path.join(self.tmpdir, 'oai.db'))
+        for i in range(5):
+            self.store.add_journal(articlemeta.Journal(
+                title='Journal %s' % i, lead_issn='0000-000%s' % i))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_get_journal(self):
+        self.assertEqual(self.store.get_journal('0000-0001'),
+                articlemeta.Journal(title='Journal 1', lead_issn='0000-0001'))
+
+    def test_missing_journal(self):
+        self.assertRaises(datastores.DoesNotExistError,
+                self.store.get_journal, 'missing')
+
+    def test_sets_registry(self):
+        setsreg = sets.SetsRegistry(self.store, [])
+        self.assertEqual([s.setSpec for s in setsreg.list(3, 10)],
+                ['0000-0003', '0000-0004'])
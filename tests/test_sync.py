@@ -0,0 +1,239 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from .fixtures import factories
+from oaipmh import datastores, sync
+
+
+class ClientStub:
+    """Imita ``articlemeta.BoundArticleMetaClient``, com documentos ordenados
+    por ``processing_date``.
+    """
+    def __init__(self, count, fail_after=None):
+        self.docs = [factories.get_sample_article(
+                code='S0001-3765200000010%04d' % i,
+                processing_date='2017-06-%02d' % (1 + i // 10),
+                issn='0001-000%s' % (i % 2))
+            for i in range(count)]
+        self.fail_after = fail_after
+        self.calls = []
+
+    def select(self, from_date=None, until_date=None, extra_filter=None):
+        issn = json.loads(extra_filter)['code_title'] if extra_filter else None
+        for doc in self.docs:
+            if from_date and doc.processing_date < from_date:
+                continue
+            if until_date and doc.processing_date > until_date:
+                continue
+            if issn and doc.journal.scielo_issn != issn:
+                continue
+            yield doc
+
+    def documents(self, offset=0, limit=1000, from_date=None,
+            until_date=None, extra_filter=None, **kwargs):
+        self.calls.append((from_date, offset))
+        if self.fail_after is not None and len(self.calls) > self.fail_after:
+            raise IOError('connection reset')
+        docs = list(self.select(from_date, until_date, extra_filter))
+        return iter(docs[offset:offset+limit])
+
+    def identifiers(self, from_date=None, until_date=None, offset=0,
+            limit=1000):
+        docs = list(self.select(from_date=from_date, until_date=until_date))
+        return iter(docs[offset:offset+limit])
+
+
+class CheckpointTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.checkpoint = sync.Checkpoint(os.path.join(self.tmpdir, 'sync'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_missing_file(self):
+        self.assertIsNone(self.checkpoint.load())
+
+    def test_saved_dates_are_loaded(self):
+        self.checkpoint.save('2017-06-14')
+        self.assertEqual(self.checkpoint.load(), '2017-06-14')
+
+
+class PrefetchTests(unittest.TestCase):
+    def test_items_are_kept_in_order(self):
+        self.assertEqual(list(sync.prefetch(iter(range(10)), 2)),
+                list(range(10)))
+
+    def test_exceptions_are_propagated(self):
+        def items():
+            yield 1
+            raise IOError()
+
+        prefetched = sync.prefetch(items(), 2)
+        self.assertEqual(next(prefetched), 1)
+        self.assertRaises(IOError, next, prefetched)
+
+
+class ConvertPageTests(unittest.TestCase):
+    def test_missing_documents_are_skipped(self):
+        docs = [factories.get_sample_article(processing_date='2017-06-15'),
+                None,
+                factories.get_sample_article(code='S0001-37652000000100002',
+                    processing_date='2017-06-14')]
+        resources, processing_date = sync.convert_page(docs)
+        self.assertEqual(len(resources), 2)
+        self.assertEqual(processing_date, '2017-06-15')
+
+    def test_pages_without_documents(self):
+        self.assertEqual(sync.convert_page([None]), ([], None))
+
+
+class SynchronizerTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.checkpoint = sync.Checkpoint(os.path.join(self.tmpdir, 'sync'))
+        self.ds = datastores.InMemory()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def make_synchronizer(self, client):
+        return sync.Synchronizer(client, self.ds, self.checkpoint,
+                page_size=10, workers=2)
+
+    def test_all_documents_are_synchronized(self):
+        stats = self.make_synchronizer(ClientStub(35)).run()
+        self.assertEqual(stats.documents, 35)
+        self.assertEqual(len(self.ds.data), 35)
+        self.assertEqual(self.checkpoint.load(), '2017-06-04')
+
+    def test_only_documents_since_the_last_day_are_fetched(self):
+        client = ClientStub(35)
+        self.make_synchronizer(client).run()
+        client.calls = []
+
+        stats = self.make_synchronizer(client).run()
+        self.assertEqual(stats.documents, 5)
+        self.assertEqual(client.calls, [('2017-06-04', 0)])
+        self.assertEqual(len(self.ds.data), 35)
+
+    def test_pages_are_fetched_by_offset(self):
+        client = ClientStub(25)
+        self.make_synchronizer(client).run()
+        self.assertEqual(client.calls,
+                [(None, 0), (None, 10), (None, 20)])
+
+    def test_interrupted_runs_are_resumed(self):
+        client = ClientStub(35, fail_after=2)
+        with self.assertRaises(IOError):
+            self.make_synchronizer(client).run()
+        self.assertEqual(self.checkpoint.load(), '2017-06-02')
+
+        client.fail_after = None
+        client.calls = []
+        stats = self.make_synchronizer(client).run()
+        self.assertEqual(stats.documents, 25)
+        self.assertEqual(len(self.ds.data), 35)
+
+    def test_missing_documents_keep_the_checkpoint(self):
+        self.checkpoint.save('2017-06-03')
+        client = ClientStub(0)
+        client.documents = lambda **kwargs: iter([None])
+        stats = self.make_synchronizer(client).run()
+        self.assertEqual(stats.documents, 0)
+        self.assertEqual(self.checkpoint.load(), '2017-06-03')
+
+    def test_documents_per_second(self):
+        self.assertEqual(sync.documents_per_second(
+            sync.SyncStats(documents=100, elapsed=2)), 50)
+        self.assertEqual(sync.documents_per_second(
+            sync.SyncStats(documents=0, elapsed=0)), 0)
+
+
+class PartitionsTests(unittest.TestCase):
+    def test_date_partitions(self):
+        partitions = sync.date_partitions('2017-01-01', '2017-01-10', 4)
+        self.assertEqual([(p.from_date, p.until) for p in partitions], [
+            ('2017-01-01', '2017-01-04'),
+            ('2017-01-05', '2017-01-08'),
+            ('2017-01-09', '2017-01-10'),
+            ])
+
+    def test_journal_partitions(self):
+        partitions = sync.journal_partitions(['0001-3765', '0034-8910'])
+        self.assertEqual([p.name for p in partitions],
+                ['0001-3765', '0034-8910'])
+
+    def test_date_range(self):
+        partitions = sync.date_partitions('2017-01-01', '2017-01-10', 4)
+        self.assertEqual(sync.date_range(partitions),
+                ('2017-01-01', '2017-01-10'))
+        self.assertEqual(sync.date_range(sync.journal_partitions(['a'])),
+                (None, None))
+
+
+class BulkImporterTests(unittest.TestCase):
+    def setUp(self):
+        self.ds = datastores.InMemory()
+
+    def make_importer(self, client, **kwargs):
+        return sync.BulkImporter(client, self.ds, workers=3, page_size=4,
+                retry_delay=0, **kwargs)
+
+    def test_date_partitions_are_imported(self):
+        client = ClientStub(35)
+        report = self.make_importer(client).run(
+                sync.date_partitions('2017-06-01', '2017-06-04', 1))
+
+        self.assertEqual(report.documents, 35)
+        self.assertEqual(report.failed, [])
+        self.assertEqual((report.expected, report.stored), (35, 35))
+
+    def test_reconciliation_is_restricted_to_the_partitions_range(self):
+        self.ds.add(factories.get_sample_resource(ridentifier='older',
+            datestamp='2017-05-01'))
+        self.ds.add(factories.get_sample_resource(ridentifier='newer',
+            datestamp='2017-06-04'))
+        client = ClientStub(35)
+        report = self.make_importer(client).run(
+                sync.date_partitions('2017-06-02', '2017-06-03', 1))
+
+        self.assertEqual((report.expected, report.stored), (20, 20))
+
+    def test_journal_partitions_are_imported(self):
+        client = ClientStub(35)
+        report = self.make_importer(client).run(
+                sync.journal_partitions(['0001-0000', '0001-0001']))
+
+        self.assertEqual(report.documents, 35)
+        self.assertEqual((report.expected, report.stored), (35, 35))
+
+    def test_failed_partitions_are_retried(self):
+        client = ClientStub(35, fail_after=3)
+        documents = client.documents
+
+        def flaky_documents(**kwargs):
+            try:
+                return documents(**kwargs)
+            finally:
+                if client.fail_after is not None and \
+                        len(client.calls) > client.fail_after:
+                    client.fail_after = None
+
+        client.documents = flaky_documents
+        report = self.make_importer(client).run(
+                sync.date_partitions('2017-06-01', '2017-06-04', 1))
+
+        self.assertEqual(report.failed, [])
+        self.assertEqual(len(self.ds.data), 35)
+
+    def test_partitions_fail_after_retries(self):
+        client = ClientStub(35, fail_after=0)
+        partitions = sync.date_partitions('2017-06-01', '2017-06-02', 1)
+        report = self.make_importer(client, retries=1).run(partitions)
+
+        self.assertEqual(report.failed, partitions)
+        self.assertEqual(len(client.calls), 4)
@@ -0,0 +1,155 @@
+import socket
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from oaipmh import thriftpool
+
+
+class ConnectionStub:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ClockStub:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_pool(**kwargs):
+    kwargs.setdefault('is_alive', lambda conn: not conn.closed)
+    return thriftpool.ConnectionPool(ConnectionStub, **kwargs)
+
+
+class ConnectionPoolTests(unittest.TestCase):
+    def test_connections_are_reused(self):
+        pool = make_pool()
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+
+        self.assertIs(first, second)
+        self.assertEqual(pool.stats().created, 1)
+
+    def test_connections_are_discarded_on_errors(self):
+        pool = make_pool()
+        with self.assertRaises(OSError):
+            with pool.connection() as conn:
+                raise OSError()
+
+        self.assertTrue(conn.closed)
+        stats = pool.stats()
+        self.assertEqual((stats.in_use, stats.idle, stats.destroyed),
+                (0, 0, 1))
+
+    def test_connections_survive_reusable_errors(self):
+        pool = make_pool(reusable_errors=(KeyError,))
+        with self.assertRaises(KeyError):
+            with pool.connection() as conn:
+                raise KeyError()
+
+        self.assertFalse(conn.closed)
+        self.assertEqual(pool.stats().idle, 1)
+
+    def test_dead_connections_are_not_handed_out(self):
+        pool = make_pool()
+        with pool.connection() as first:
+            pass
+        first.closed = True
+
+        with pool.connection() as second:
+            pass
+
+        self.assertIsNot(first, second)
+        self.assertEqual(pool.stats().destroyed, 1)
+
+    def test_idle_connections_are_recycled(self):
+        clock = ClockStub()
+        pool = make_pool(idle_timeout=10, clock=clock)
+        with pool.connection() as first:
+            pass
+
+        clock.now = 11
+        with pool.connection() as second:
+            pass
+
+        self.assertTrue(first.closed)
+        self.assertIsNot(first, second)
+
+    def test_size_is_capped(self):
+        pool = make_pool(maxsize=1, wait_timeout=0.01)
+        with pool.connection():
+            self.assertRaises(thriftpool.PoolTimeoutError, pool.acquire)
+
+        self.assertEqual(pool.stats().created, 1)
+
+    def test_waiters_get_released_connections(self):
+        pool = make_pool(maxsize=1)
+        conn = pool.acquire()
+        acquired = []
+
+        def waiter():
+            with pool.connection() as c:
+                acquired.append(c)
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        pool.release(conn)
+        thread.join(1)
+
+        self.assertEqual(acquired, [conn])
+        self.assertEqual(pool.stats().created, 1)
+
+    def test_in_use_metric(self):
+        pool = make_pool()
+        with pool.connection():
+            self.assertEqual(pool.stats().in_use, 1)
+        self.assertEqual(pool.stats().in_use, 0)
+
+    def test_failed_connect_frees_the_slot(self):
+        def connect():
+            raise OSError()
+
+        pool = thriftpool.ConnectionPool(connect, maxsize=1)
+        self.assertRaises(OSError, pool.acquire)
+        self.assertEqual(pool.stats().in_use, 0)
+
+
+def make_client(sock):
+    tsocket = SimpleNamespace(sock=sock)
+    return SimpleNamespace(_iprot=SimpleNamespace(
+        trans=SimpleNamespace(_trans=tsocket)))
+
+
+class IsConnectionAliveTests(unittest.TestCase):
+    def setUp(self):
+        self.local, self.remote = socket.socketpair()
+        self.addCleanup(self.local.close)
+
+    def test_open_connection(self):
+        self.addCleanup(self.remote.close)
+        self.assertTrue(thriftpool.is_connection_alive(make_client(self.local)))
+
+    def test_connection_closed_by_peer(self):
+        self.remote.close()
+        self.assertFalse(thriftpool.is_connection_alive(make_client(self.local)))
+
+    def test_sockets_with_timeout_do_not_block(self):
+        self.addCleanup(self.remote.close)
+        self.local.settimeout(5)
+        start = time.monotonic()
+        self.assertTrue(thriftpool.is_connection_alive(make_client(self.local)))
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_unexpected_pending_bytes(self):
+        self.addCleanup(self.remote.close)
+        self.remote.sendall(b'x')
+        self.assertFalse(thriftpool.is_connection_alive(make_client(self.local)))
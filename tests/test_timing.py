@@ -0,0 +1,117 @@
+import unittest
+
+from oaipmh import timing
+
+
+class ClockStub:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TimingsTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = ClockStub()
+        self.timings = timing.Timings(clock=self.clock)
+
+    def test_stages_are_accumulated(self):
+        for _ in range(2):
+            with self.timings.stage('parse'):
+                self.clock.now += 1
+        self.assertEqual(self.timings.durations, {'parse': 2})
+
+    def test_nested_stages_are_discounted(self):
+        with self.timings.stage('serialize'):
+            self.clock.now += 1
+            with self.timings.stage('format'):
+                self.clock.now += 3
+            self.clock.now += 1
+        self.assertEqual(self.timings.durations,
+                {'serialize': 2, 'format': 3})
+
+    def test_iterate(self):
+        def items():
+            self.clock.now += 1
+            yield 'a'
+            self.clock.now += 1
+            yield 'b'
+            self.clock.now += 1
+
+        result = []
+        for item in self.timings.iterate('datastore', items()):
+            self.clock.now += 10
+            result.append(item)
+
+        self.assertEqual(result, ['a', 'b'])
+        self.assertEqual(self.timings.durations, {'datastore': 3})
+
+    def test_server_timing(self):
+        with self.timings.stage('parse'):
+            self.clock.now += 0.0015
+        self.clock.now += 0.001
+        self.assertEqual(self.timings.server_timing(),
+                'parse;dur=1.50, total;dur=2.50')
+
+    def test_asdict(self):
+        with self.timings.stage('parse'):
+            self.clock.now += 0.002
+        self.clock.now += 0.001
+        self.assertEqual(self.timings.asdict(),
+                {'parse': 2.0, 'other': 1.0, 'total': 3.0})
+
+    def test_activate(self):
+        self.assertIsNone(timing.current())
+        with self.timings.activate():
+            self.assertIs(timing.current(), self.timings)
+            with timing.stage('parse'):
+                self.clock.now += 1
+        self.assertIsNone(timing.current())
+        self.assertEqual(self.timings.durations, {'parse': 1})
+
+    def test_iter_active(self):
+        def items():
+            yield timing.current()
+
+        self.assertEqual(list(self.timings.iter_active(items())),
+                [self.timings])
+        self.assertIsNone(timing.current())
+
+
+class InactiveTests(unittest.TestCase):
+    def test_timed_returns_the_function(self):
+        self.assertIs(timing.timed('format', len), len)
+
+    def test_iterate_returns_the_iterable(self):
+        items = iter([1, 2])
+        self.assertIs(timing.iterate('datastore', items), items)
+
+    def test_call(self):
+        self.assertEqual(timing.call('facade', lambda: 1), 1)
+
+    def test_stage(self):
+        with timing.stage('parse'):
+            pass
+
+
+class ActiveTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = ClockStub()
+        self.timings = timing.Timings(clock=self.clock)
+
+    def slow(self, value, seconds=1):
+        self.clock.now += seconds
+        return value
+
+    def test_timed(self):
+        with self.timings.activate():
+            fn = timing.timed('format', self.slow)
+        self.assertEqual(fn('x'), 'x')
+        self.assertEqual(self.timings.durations, {'format': 1})
+
+    def test_call(self):
+        with self.timings.activate():
+            self.assertEqual(timing.call('facade', lambda: self.slow('x')),
+                    'x')
+        self.assertEqual(self.timings.durations, {'facade': 1})